@@ -0,0 +1,58 @@
+"""
+bench.py
+
+times the workloads in workloads.py
+
+Usage:
+    python benchmarks/bench.py [--tree PATH] [--size N] [workload ...]
+
+--tree runs the workloads against another checkout's collegebaseball,
+e.g. one from before an optimization:
+
+    git worktree add /tmp/baseline <commit>
+    python benchmarks/bench.py --tree /tmp/baseline batting_metrics
+"""
+import argparse
+import os
+import sys
+import warnings
+from time import perf_counter
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _use_tree(tree):
+    """
+    A helper function to import collegebaseball from tree, and benchmarks
+    from this checkout
+    """
+    sys.path[:1] = [os.path.abspath(tree), _ROOT] if tree else [_ROOT]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='time the workloads')
+    parser.add_argument('workloads', nargs='*')
+    parser.add_argument('--tree', help='checkout to import collegebaseball '
+                        'from, defaults to this one')
+    parser.add_argument('--size', type=int, help='overrides each '
+                        "workload's benchmark size")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    _use_tree(args.tree)
+    warnings.simplefilter('ignore')
+    from benchmarks.workloads import WORKLOADS
+    import collegebaseball
+    print('collegebaseball from ' + os.path.dirname(collegebaseball.__file__))
+    for name in args.workloads or WORKLOADS:
+        func, _, size = WORKLOADS[name]
+        size = args.size or size
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = perf_counter()
+            func(size)
+            best = min(best, perf_counter() - start)
+        print(f'{name:<24}{size:>10,}  {best:9.3f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+make_baselines.py
+
+stores each workload's output, at its test size, under tests/baselines
+for tests/test_equivalence.py
+
+Usage:
+    python benchmarks/make_baselines.py --tree PATH [workload ...]
+
+PATH is a checkout from before the optimizations (e.g. the first commit
+of the series), so the tests compare the current output with the old
+behaviour.
+"""
+import argparse
+import os
+import pickle
+import warnings
+from bench import _ROOT, _use_tree
+
+
+def _plain(res):
+    """
+    A helper function to turn str subclasses (e.g. BeautifulSoup's
+    NavigableString) in object columns into str, so baselines pickle
+    without the library that made them
+    """
+    if isinstance(res, (list, tuple)):
+        return type(res)(_plain(i) for i in res)
+    if hasattr(res, 'columns'):
+        res = res.copy()
+        for column in res.columns[res.dtypes == object]:
+            res[column] = res[column].map(
+                lambda x: str(x) if isinstance(x, str) else x)
+    return res
+
+
+def main():
+    parser = argparse.ArgumentParser(description='store workload outputs')
+    parser.add_argument('workloads', nargs='*')
+    parser.add_argument('--tree', required=True,
+                        help='checkout to import collegebaseball from')
+    args = parser.parse_args()
+    _use_tree(args.tree)
+    warnings.simplefilter('ignore')
+    from benchmarks.workloads import WORKLOADS
+    import collegebaseball
+    print('collegebaseball from ' + os.path.dirname(collegebaseball.__file__))
+    for name in args.workloads or WORKLOADS:
+        func, size, _ = WORKLOADS[name]
+        path = os.path.join(_ROOT, 'tests', 'baselines', name + '.pkl')
+        with open(path, 'wb') as f:
+            pickle.dump(_plain(func(size)), f)
+        print('wrote ' + path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+"""
+synthetic.py
+
+deterministic synthetic inputs for the benchmarks and the equivalence
+tests: stat frames, stats.ncaa.org pages, and a way to serve those pages
+to the scrapers without the network
+"""
+from contextlib import contextmanager
+import random
+import numpy as np
+import pandas as pd
+import requests
+
+
+def batting_stats(n, seed=0):
+    """
+    Returns:
+        pd.DataFrame of n players' batting counting stats over 2013-2022
+        and divisions 1-3, as add_batting_metrics takes them
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'AB': rng.integers(0, 250, n), 'BB': rng.integers(0, 40, n),
+        'SF': rng.integers(0, 5, n), 'SH': rng.integers(0, 5, n),
+        'HBP': rng.integers(0, 10, n), 'IBB': rng.integers(0, 3, n),
+        'K': rng.integers(0, 60, n)})
+    df['H'] = (df.AB * rng.uniform(0, .4, n)).astype(int)
+    df['2B'] = (df.H * rng.uniform(0, .25, n)).astype(int)
+    df['3B'] = (df.H * rng.uniform(0, .05, n)).astype(int)
+    df['HR'] = (df.H * rng.uniform(0, .15, n)).astype(int)
+    df['season'] = rng.integers(2013, 2023, n)
+    df['division'] = rng.integers(1, 4, n)
+    df = df.astype({column: 'int16' for column in df.columns})
+    df.insert(0, 'name', pd.array(['p' + str(i) for i in range(n)],
+                                  dtype='string'))
+    return df
+
+
+BATTING_HEADERS = ['Jersey', 'Player', 'Yr', 'Pos', 'GP', 'GS', 'BA',
+                   'OBPct', 'SlgPct', 'R', 'AB', 'H', '2B', '3B', 'TB', 'HR',
+                   'RBI', 'BB', 'HBP', 'SF', 'SH', 'K', 'DP', 'CS', 'Picked',
+                   'SB', 'IBB', 'GDP', 'RBI2out']
+_RATES = ('BA', 'OBPct', 'SlgPct')
+
+
+def stat_grid_page(n=40, seed=0, headers=BATTING_HEADERS):
+    """
+    Returns:
+        str, a stats.ncaa.org /team/<school_id>/stats page: n player rows,
+        team and opponent totals, and the null cells, thousands separators
+        and stray whitespace and tags the live pages have
+    """
+    rng = random.Random(seed)
+    out = ['<html><head><title>x</title></head><body><div>'
+           '<table class="dataTable small_font" id="stat_grid">\n'
+           '<thead>\n<tr>']
+    for h in headers:
+        out.append('\n  <th align="left">\n    %s\n  </th>' % h
+                   if rng.random() < .5 else '<th>%s</th>' % h)
+    out.append('\n</tr>\n</thead>\n<tbody>')
+    for i in range(n):
+        out.append('\n<tr class="text">')
+        for h in headers:
+            if h == 'Jersey':
+                cell = str(rng.randint(1, 99))
+            elif h == 'Player':
+                cell = ('<a href="/player/index?id=15860&amp;'
+                        'stats_player_seq=%d">Last%d, First</a>'
+                        % (2400000 + i, i))
+            elif h in ('Yr', 'Pos'):
+                cell = rng.choice(['Fr', 'So', 'Jr', 'Sr', 'OF', 'C', ''])
+            elif h in _RATES:
+                out.append('<td data-order="%.3f">%.3f</td>'
+                           % ((rng.random(),) * 2))
+                continue
+            else:
+                cell = rng.choice(['', '-', str(rng.randint(0, 40)),
+                                   '1,234', ' %d ' % rng.randint(0, 9)])
+                if rng.random() < .2:
+                    cell = '<div>%s</div>' % cell
+            out.append('<td align="right">%s</td>' % cell)
+        out.append('</tr>')
+    out.append('\n</tbody>\n<tfoot>\n<tr><td></td><td>Totals</td>')
+    for h in headers[2:]:
+        out.append('<td data-order="0.300">.300</td>' if h in _RATES
+                   else '<td>%d</td>' % rng.randint(0, 900))
+    out.append('</tr>\n<tr><td></td><td>Opponent Totals</td>')
+    for h in headers[2:]:
+        out.append('<td>%d</td>' % rng.randint(0, 900))
+    out.append('</tr>\n</tfoot>\n</table>\n</div></body></html>')
+    return ''.join(out)
+
+
+def game_log_cells(headers, n, seed=0):
+    """
+    Returns:
+        pd.DataFrame of n raw player game log rows, as the game_by_game
+        parsers hand them to ncaa_utils._transform_stats: the stat cells
+        under headers as page strings, with the NCAA's null cells, stray
+        whitespace and, in pitches, thousands separators, and the game
+        columns alongside
+    """
+    rng = np.random.default_rng(seed)
+    cells = np.array(['', '-', '0', '1', '2', '3', '4', '5', ' 2 '])
+    weights = [.15, .02, .3, .2, .12, .08, .06, .05, .02]
+    df = pd.DataFrame({h: rng.choice(cells, n, p=weights).astype(object)
+                       for h in headers})
+    if 'Pitches' in df.columns:
+        df['Pitches'] = rng.choice(np.array(['', '45', '98', '1,012']), n,
+                                   p=[.2, .4, .38, .02]).astype(object)
+    if 'IP' in df.columns:
+        df['IP'] = pd.Series(rng.integers(0, 10, n)).astype(str) + '.' + \
+            pd.Series(rng.integers(0, 3, n)).astype(str)
+    innings = rng.choice([7, 9, 9, 9, 10, 12], n)
+    runs = rng.integers(0, 16, n)
+    allowed = rng.integers(0, 16, n)
+    df['date'] = pd.Series(rng.integers(1, 29, n)).map('03/{:02d}/2022'.format)
+    df['field'] = rng.choice(['home', 'away', 'neutral'], n).astype(object)
+    df['season_id'] = 15860
+    df['opponent_id'] = rng.integers(100, 1000, n).astype(str).astype(object)
+    df['opponent_name'] = rng.choice(_OPPONENTS, n).astype(object)
+    df['innings_played'] = innings.astype(str).astype(object)
+    df['extras'] = innings > 9
+    df['runs_scored'] = runs.astype(str).astype(object)
+    df['runs_allowed'] = allowed.astype(str).astype(object)
+    df['run_difference'] = (runs - allowed).astype(str).astype(object)
+    df['result'] = np.where(runs > allowed, 'win', 'loss').astype(object)
+    df['game_id'] = (5000000 + np.arange(n)).astype(str).astype(object)
+    df['school_id'] = 736
+    df['stats_player_seq'] = 2400000 + np.arange(n) // 60
+    df['season'] = 2022
+    df['division'] = 1
+    return df
+
+
+_OPPONENTS = ['Florida St.', 'Miami (FL)', 'Texas A&M', "St. John's (NY)",
+              'UC Santa Barbara', 'Wake Forest']
+
+
+def game_by_game_page(headers, n_games=60, seed=0):
+    """
+    Returns:
+        str, a stats.ncaa.org /player/game_by_game page with n_games rows
+        under headers: home, away and neutral site games, opponents with
+        and without links, box score and game links, extra innings, and
+        empty stat cells
+    """
+    rng = random.Random(seed)
+    out = ['<html><head><title>x</title></head><body>']
+    for i in range(3):
+        out.append('<table class="mytable"><tr><td>filler %d</td></tr>'
+                   '</table>' % i)
+    out.append('<table class="mytable" width="100%">')
+    out.append('<tr class="heading"><td colspan="20">Game By Game</td></tr>')
+    out.append('<tr class="grey_heading">'
+               + ''.join('<th>%s</th>' % h
+                         for h in ['Date', 'Opponent', 'Result'] + headers)
+               + '</tr>')
+    out.append('<tr><td>sub</td></tr>')
+    for g in range(n_games):
+        date = '%02d/%02d/2022' % (2 + g // 28, 1 + g % 28)
+        kind = rng.random()
+        opponent = rng.choice(_OPPONENTS)
+        if kind < .4:
+            opponent = ('<a href="/team/%d/15860">@ %s</a>'
+                        % (rng.randint(100, 999), opponent))
+        elif kind < .5:
+            opponent = ('<a href="/team/%d/15860">%s @ Omaha, NE</a>'
+                        % (rng.randint(100, 999), opponent))
+        elif kind >= .55:
+            opponent = ('<a href="/team/%d/15860">%s</a>'
+                        % (rng.randint(100, 999), opponent))
+        runs, allowed = rng.randint(0, 15), rng.randint(0, 15)
+        score = '%s %d - %d' % ('W' if runs > allowed else
+                                'L' if runs < allowed else 'T',
+                                runs, allowed)
+        if rng.random() < .1:
+            score += ' (%d)' % rng.randint(10, 13)
+        game_id = 5000000 + seed * 1000 + g
+        if rng.random() < .03:
+            result = '-'
+        elif rng.random() < .5:
+            result = ('<a href="/contests/%d/box_score" class="skipMask">'
+                      '%s</a>' % (game_id, score))
+        else:
+            result = ('<a href="/game/index/%d?org_id=1">%s</a>'
+                      % (game_id, score))
+        cells = []
+        for h in headers:
+            if h == 'IP':
+                value = '%d.%d' % (rng.randint(0, 9), rng.randint(0, 2))
+            else:
+                value = str(rng.randint(0, 5)) if rng.random() > .2 else ''
+            cells.append('<td align="right" data-order="%s">%s</td>'
+                         % (value, value))
+        out.append('<tr><td>%s</td><td>%s</td><td>%s</td>%s</tr>'
+                   % (date, opponent, result, ''.join(cells)))
+    out.append('<tr id="totals"><td>Totals</td></tr>')
+    out.append('</table></body></html>')
+    return '\n'.join(out)
+
+
+def _response(url, text):
+    r = requests.Response()
+    r.status_code = 200
+    r._content = text.encode('utf-8')
+    r.encoding = 'utf-8'
+    r.url = url
+    return r
+
+
+@contextmanager
+def serve(page):
+    """
+    Answers every requests.Session.get inside the with block with
+    page(url, params), so the scrapers (of this or any earlier version)
+    run offline
+    """
+    get = requests.Session.get
+
+    def fake_get(self, url, params=None, **kwargs):
+        return _response(url, page(url, params or {}))
+    requests.Session.get = fake_get
+    try:
+        yield
+    finally:
+        requests.Session.get = get
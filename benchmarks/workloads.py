@@ -0,0 +1,142 @@
+"""
+workloads.py
+
+the workloads behind the performance claims of the optimization commits.
+Each runs collegebaseball code on synthetic input, through functions every
+version has (public ones, or helpers such as ncaa_utils._transform_stats),
+so it runs the same against this tree or any earlier one: bench.py times
+them, and make_baselines.py stores their output for
+tests/test_equivalence.py.
+
+WORKLOADS maps a name to (function, size for baselines and tests, size
+for benchmarks); function(size) returns the output to compare.
+"""
+import inspect
+from types import SimpleNamespace
+from benchmarks import synthetic
+
+
+def batting_metrics(n):
+    from collegebaseball import metrics
+    return metrics.add_batting_metrics(synthetic.batting_stats(n))
+
+
+def lookups(n):
+    from collegebaseball import guts, lookup
+    schools = guts.get_schools_table()
+    seasons = guts.get_seasons_table()
+    calls = ([(lookup.lookup_school_reverse, x)
+              for x in schools.school_id.tolist() + [999999]]
+             + [(lookup.lookup_school, x)
+                for x in schools.ncaa_name.tolist()
+                + schools.bd_name.tolist() + ['nope']]
+             + [(lookup._lookup_season_info, x)
+                for x in seasons.season.tolist()
+                + seasons.season_id.tolist()]
+             + [(lookup._lookup_season_basic, x)
+                for x in seasons.season.tolist()
+                + seasons.season_id.tolist()])
+    return [func(x) for func, x in (calls[i % len(calls)]
+                                    for i in range(n))]
+
+
+def team_stats(n):
+    """
+    n team stat pages, alternating ncaa_team_stats and ncaa_team_totals
+    over four seasons
+    """
+    from collegebaseball import ncaa_scraper
+    pages = [synthetic.stat_grid_page(40, seed) for seed in range(4)]
+    funcs = [ncaa_scraper.ncaa_team_stats, ncaa_scraper.ncaa_team_totals]
+    res = []
+    for i in range(n):
+        with synthetic.serve(lambda url, params: pages[i % 4]):
+            res.append(funcs[i % 2](167, 2019 + i % 4, 'batting'))
+    return res
+
+
+def _game_logs_page(variant):
+    from collegebaseball import ncaa_utils
+    headers = ncaa_utils.team_gamelog_headers[variant][2022][:-13]
+
+    def page(url, params):
+        return synthetic.game_by_game_page(headers, 60,
+                                           int(params['org_id']) % 97)
+    return page
+
+
+def team_results(n):
+    """
+    download_team_results over the first n division 1 schools, with the
+    old tree's sleeps and the new tree's rate limit taken out
+    """
+    from collegebaseball import download_utils, guts
+    schools = guts.get_schools_table()
+    schools = schools.loc[schools.division == 1].head(n)
+    kwargs = {'save': False}
+    if 'requests_per_second' in inspect.signature(
+            download_utils.download_team_results).parameters:
+        kwargs['requests_per_second'] = None
+    patched = {'guts': SimpleNamespace(get_schools_table=lambda: schools),
+               'sleep': lambda seconds: None}
+    saved = {name: getattr(download_utils, name) for name in patched
+             if hasattr(download_utils, name)}
+    for name, value in patched.items():
+        setattr(download_utils, name, value)
+    try:
+        with synthetic.serve(_game_logs_page('batting')):
+            return download_utils.download_team_results(2022, 1, **kwargs)
+    finally:
+        for name in patched:
+            if name in saved:
+                setattr(download_utils, name, saved[name])
+            else:
+                delattr(download_utils, name)
+
+
+def transform_stats(n):
+    """
+    ncaa_utils._transform_stats on n raw batting and n raw pitching game
+    log rows
+    """
+    from collegebaseball import ncaa_utils
+    return [ncaa_utils._transform_stats(synthetic.game_log_cells(
+        ncaa_utils.team_gamelog_headers[variant][2022][:-13], n, seed))
+        for seed, variant in enumerate(['batting', 'pitching'])]
+
+
+def game_logs(n):
+    """
+    n 60-game pages, cycling through player batting, team batting and
+    team pitching game logs at Vanderbilt. Players are looked up as
+    Vanderbilt's, since the bundled data has no rosters table
+    """
+    from collegebaseball import lookup, ncaa_scraper
+    calls = [(ncaa_scraper.ncaa_player_game_logs, 'batting'),
+             (ncaa_scraper.ncaa_team_game_logs, 'batting'),
+             (ncaa_scraper.ncaa_team_game_logs, 'pitching')]
+    pages = {variant: _game_logs_page(variant)
+             for variant in ['batting', 'pitching']}
+    lookup_player_reverse = lookup.lookup_player_reverse
+    lookup.lookup_player_reverse = lambda player_id, season: (
+        'Jane Doe', 'Vanderbilt', 736)
+    res = []
+    try:
+        for i in range(n):
+            func, variant = calls[i % 3]
+            key = 2400000 + i if i % 3 == 0 else 736
+            with synthetic.serve(pages[variant]):
+                res.append(func(key, 2022, variant))
+    finally:
+        lookup.lookup_player_reverse = lookup_player_reverse
+    return res
+
+
+WORKLOADS = {
+    'batting_metrics': (batting_metrics, 500, 10000),
+    'lookups': (lookups, 3000, 100000),
+    'team_stats': (team_stats, 8, 100),
+    'team_results': (team_results, 10, 300),
+    'transform_stats': (transform_stats, 5000, 100000),
+    'game_logs': (game_logs, 6, 60),
+}
@@ -6,8 +6,8 @@ A scraper module for boydsworld.com historical game results
 created by Nathan Blumenfeld in November 2021
 """
 import pandas as pd
-import requests
 from io import StringIO
+from collegebaseball import http_utils, instrumentation
 
 
 def boydsworld_team_results(school, start, end=None, vs="all",
@@ -38,27 +38,109 @@ def boydsworld_team_results(school, start, end=None, vs="all",
               .sort_values(by="date", axis=0, ascending=True)
               )
         return df
+    except http_utils.ThrottledError:
+        raise
     except:
         print(f'''no records found for {school} between {start} and {end}''')
         return pd.DataFrame()
 
 
+def boydsworld_league_results(start, end=None, parse_dates=True):
+    """
+    A function to scrape every game between start and end in one request,
+    from boydsworld.com. Each game appears once, unlike the concatenated
+    results of boydsworld_team_results, which has every game twice.
+
+    Args:
+        start (int): the start year of games, 1992 <= start <= 2022
+        end (int):  the end season of games, 1992 <= end <= 2022
+        parse_dates (bool): whether to parse data into datetime64
+
+    Returns:
+        Dataframe with one row per game: date, team_1 (the winner),
+        team_1_score, team_2, team_2_score and field
+    """
+    return _get_data("all", start, end=end, vs="all",
+                     parse_dates=parse_dates)
+
+
+def boydsworld_team_perspectives(games):
+    """
+    A function to turn one-row-per-game results into one row per team per
+    game, with the columns boydsworld_team_results gives for a single team
+
+    Args:
+        games (pd.DataFrame): from boydsworld_league_results
+
+    Returns:
+        Dataframe of school (whose perspective the row is from), date,
+        field, runs_scored, runs_allowed, opponent and run_difference
+    """
+    if len(games) == 0:
+        return pd.DataFrame()
+    decided = games.loc[games["team_1_score"] > games["team_2_score"]]
+    wins = pd.DataFrame({"school": decided["team_1"],
+                         "date": decided["date"],
+                         "field": decided["field"],
+                         "runs_scored": decided["team_1_score"],
+                         "runs_allowed": decided["team_2_score"],
+                         "opponent": decided["team_2"]})
+    losses = pd.DataFrame({"school": decided["team_2"],
+                           "date": decided["date"],
+                           "field": decided["field"],
+                           "runs_scored": decided["team_2_score"],
+                           "runs_allowed": decided["team_1_score"],
+                           "opponent": decided["team_1"]})
+    df = pd.concat([wins, losses])
+    df["run_difference"] = df["runs_scored"] - df["runs_allowed"]
+    return _set_dtypes(df)
+
+
+def _canonical_games(frames):
+    """
+    A helper function to merge several teams' raw results (from _get_data)
+    into one row per game. A game shows up in both teams' results, so rows
+    are matched on their contents and on how many times they occur within
+    one team's results, which keeps both games of a doubleheader that
+    ended with the same score.
+    """
+    frames = [i.assign(_n=i.groupby(list(i.columns), dropna=False)
+                       .cumcount()) for i in frames if len(i) > 0]
+    if len(frames) == 0:
+        return pd.DataFrame()
+    return (pd.concat(frames)
+            .drop_duplicates()
+            .drop(columns=["_n"])
+            .reset_index(drop=True))
+
+
 def _get_data(school, start, end=None, vs="all", parse_dates=True):
     """
     A helper function to send GET request to boydsworld.com and parse data
     """
-    col_names = ["date", "team_1", "team_1_score",
-                 "team_2", "team_2_score", "field"]
     url = 'http://www.boydsworld.com/cgi/scores.pl'
     if end is None:
         end = start
     try:
         payload = {"team1": school, "firstyear": str(start), "team2": vs,
                    "lastyear": str(end), "format": "HTML", "submit": "Fetch"}
-        with requests.Session() as s:
-            r = s.get(url, params=payload)
-        response = r.text
-        io = StringIO(response).read()
+        r = http_utils.get(url, params=payload)
+    except http_utils.ThrottledError:
+        raise
+    except:
+        return pd.DataFrame()
+    return _parse_data(r.text, parse_dates)
+
+
+@instrumentation.instrument_parse('boydsworld')
+def _parse_data(text, parse_dates=True):
+    """
+    A helper function to parse a boydsworld.com results page
+    """
+    col_names = ["date", "team_1", "team_1_score",
+                 "team_2", "team_2_score", "field"]
+    try:
+        io = StringIO(text).read()
         dfs = pd.read_html(io=io, parse_dates=parse_dates)
         df = dfs[1].dropna(how="all", axis=1, inplace=False)
         if len(df.columns) != len(col_names):
@@ -5,32 +5,358 @@ large-download utilities for collegebaseball
 
 created by Nathan Blumenfeld in Summer 2022
 """
+import json
+import os
+import re
 import pandas as pd
-from collegebaseball import guts, lookup, boydsworld_scraper
+from collegebaseball import guts, lookup, boydsworld_scraper, http_utils, \
+    html_archive, ncaa_utils, instrumentation
 from collegebaseball import ncaa_scraper as ncaa
-import random
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, \
+    wait, FIRST_COMPLETED
+from datetime import date
+from itertools import islice
+from time import monotonic, process_time
 from tqdm import tqdm
-from time import sleep
 
 
-# GET request options
-_TIMEOUT = 1
+# concurrency and politeness defaults for bulk jobs
+_MAX_WORKERS = 4
+_REQUESTS_PER_SECOND = 2
+_NCAA_HOST = 'stats.ncaa.org'
+_BOYDSWORLD_HOST = 'www.boydsworld.com'
+# passes over the units that failed because the host was throttling us
+_RETRY_ROUNDS = 2
+# calls or pages allowed to wait per worker at each stage, which bounds
+# memory and holds fetching back when parsing falls behind
+_IN_FLIGHT_PER_WORKER = 2
+_ROSTER_URL = re.compile(r'/team/(\d+)/roster/(\d+)$')
+_TEAM_STATS_URL = re.compile(r'/team/(\d+)/stats$')
+# completed units buffered in memory before being flushed to a checkpoint
+_CHUNK_SIZE = 500
+# the chunk files a _Checkpoint writes, e.g. 00012_batting.pkl
+_CHUNK_FILE = re.compile(r'(\d{5})_\w+\.pkl')
 
 
-def download_rosters(seasons: list[int], divisions: list[int], save=True):
-    res = pd.DataFrame()
+def _map_concurrently(func, units, max_workers=_MAX_WORKERS,
+                      requests_per_second=_REQUESTS_PER_SECOND,
+                      host=_NCAA_HOST, progress=True):
+    """
+    A helper function to run func(*unit) for every unit on a bounded thread
+    pool, with all requests to host throttled by a shared token bucket so
+    network waits overlap without exceeding requests_per_second
+
+    Args:
+        func (callable)
+        units (list of tuples): positional arguments for each call
+        max_workers (int): max concurrent calls
+        requests_per_second (float): sustained request rate to host
+        host (str): the host whose rate limit to set
+        progress (bool): whether to show a tqdm progress bar
+
+    Returns:
+        list of (unit, result, exception) in the same order as units,
+        with exception None on success
+    """
+    results = [None] * len(units)
+    tagged = [(index,) + tuple(unit) for index, unit in enumerate(units)]
+    for unit, result, error in _imap_concurrently(
+            lambda index, *args: func(*args), tagged, max_workers,
+            requests_per_second, host, progress):
+        results[unit[0]] = (units[unit[0]], result, error)
+    return results
+
+
+def _concat(frames):
+    """
+    A helper function to join the frames collected by a download loop in
+    one copy, rather than growing a result frame on every iteration
+
+    Args:
+        frames (list of pd.DataFrames)
+
+    Returns:
+        pd.DataFrame, empty if frames is
+    """
+    if len(frames) == 0:
+        return pd.DataFrame()
+    return pd.concat(frames)
+
+
+def _imap_concurrently(func, units, max_workers=_MAX_WORKERS,
+                       requests_per_second=_REQUESTS_PER_SECOND,
+                       host=_NCAA_HOST, progress=True,
+                       retry_rounds=_RETRY_ROUNDS):
+    """
+    Like _map_concurrently, but yields (unit, result, exception) as each
+    call finishes, so callers can act on results without holding all of
+    them
+
+    Units that fail with http_utils.ThrottledError go to a retry queue
+    that is re-driven, once host's circuit breaker has closed, up to
+    retry_rounds times before their error is yielded
+
+    requests_per_second and max_workers apply to host while the generator
+    runs, and the host's previous limits come back when it finishes
+    """
+    with http_utils.host_limits(host, requests_per_second, max_workers):
+        max_in_flight = max_workers * _IN_FLIGHT_PER_WORKER
+        for attempt in range(retry_rounds + 1):
+            retry = []
+            queue = iter(units)
+            pending = {}
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+            progress_bar = tqdm(total=len(units), disable=not progress)
+            try:
+                while True:
+                    for unit in islice(queue, max_in_flight - len(pending)):
+                        pending[executor.submit(func, *unit)] = unit
+                    if len(pending) == 0:
+                        break
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        unit = pending.pop(future)
+                        progress_bar.update()
+                        try:
+                            result = future.result()
+                        except http_utils.ThrottledError as e:
+                            if attempt < retry_rounds:
+                                retry.append(unit)
+                                progress_bar.set_postfix(
+                                    throttled=len(retry), refresh=False)
+                                continue
+                            yield unit, None, e
+                            continue
+                        except Exception as e:
+                            yield unit, None, e
+                            continue
+                        yield unit, result, None
+            finally:
+                # on an interrupt, drop queued calls rather than run them all
+                executor.shutdown(cancel_futures=True)
+                progress_bar.close()
+            if len(retry) == 0:
+                return
+            http_utils.wait_for_circuit(host)
+            units = retry
+
+
+def _timed_parse(parse, text, args, kwargs):
+    """
+    A helper function run in a parser process, returning parse's result,
+    the CPU seconds it took and the parse metrics it recorded, for the
+    parent process to merge into its own
+    """
+    instrumentation.reset()
+    start = process_time()
+    res = parse(text, *args, **kwargs)
+    return res, process_time() - start, instrumentation._raw()
+
+
+def _pipeline(fetch, parse, units, max_workers=_MAX_WORKERS,
+              requests_per_second=_REQUESTS_PER_SECOND, host=_NCAA_HOST,
+              parse_workers=None, parse_kwargs=None, progress=True,
+              report=None):
+    """
+    A helper function to fetch pages on a thread pool and parse them on a
+    process pool, so parsing is not held to one core by the GIL. Each stage
+    keeps at most _IN_FLIGHT_PER_WORKER pages per worker waiting, so a slow
+    stage holds the other back instead of piling pages up in memory.
+
+    On platforms that start processes by spawning (Windows, macOS), call
+    this from under an if __name__ == '__main__' guard.
+
+    Args:
+        fetch (callable): fetch(*unit) returns (page html, parse args), or
+         None when there is nothing to parse
+        parse (callable): parse(html, *args, **parse_kwargs), a module-level
+         function so it can be sent to the parser processes
+        units (list of tuples)
+        max_workers (int): concurrent fetches
+        requests_per_second (float): sustained request rate to host
+        host (str): the host whose rate limit to set
+        parse_workers (int, optional): parser processes, defaults to the
+         number of cores
+        parse_kwargs (dict, optional): keyword arguments for parse
+        progress (bool): whether to show a tqdm progress bar
+        report (dict, optional): filled with each stage's page counts,
+         seconds and pages/sec. parse_pages_per_second is what the parser
+         processes sustain from their CPU time, i.e. given a core each.
+         Page counts and seconds by stage also go to the pipeline_*
+         instrumentation counters
+
+    Yields:
+        (unit, result, exception) as each page is parsed, which need not be
+        the order of units, with exception None on success
+    """
+    parse_workers = parse_workers or os.cpu_count() or 1
+    parse_kwargs = parse_kwargs or {}
+    max_parsing = parse_workers * _IN_FLIGHT_PER_WORKER
+    fetched = 0
+    parsed = 0
+    parse_seconds = 0.0
+    parsing = {}
+
+    def collect(futures):
+        nonlocal parsed, parse_seconds
+        res = []
+        for future in futures:
+            unit = parsing.pop(future)
+            try:
+                result, seconds, recorded = future.result()
+            except Exception as e:
+                res.append((unit, None, e))
+                continue
+            instrumentation._merge(recorded)
+            parsed += 1
+            parse_seconds += seconds
+            res.append((unit, result, None))
+        return res
+
+    parsers = ProcessPoolExecutor(max_workers=parse_workers)
+    try:
+        # start the parser processes before any fetch threads exist
+        parsers.submit(os.getpid).result()
+        start = monotonic()
+        for unit, page, error in _imap_concurrently(
+                fetch, units, max_workers, requests_per_second, host,
+                progress):
+            if error is not None:
+                yield unit, None, error
+                continue
+            if page is None:
+                yield unit, pd.DataFrame(), None
+                continue
+            fetched += 1
+            text, args = page
+            parsing[parsers.submit(_timed_parse, parse, text, args,
+                                   parse_kwargs)] = unit
+            while len(parsing) >= max_parsing:
+                done, _ = wait(parsing, return_when=FIRST_COMPLETED)
+                yield from collect(done)
+        fetch_seconds = monotonic() - start
+        while len(parsing) > 0:
+            done, _ = wait(parsing, return_when=FIRST_COMPLETED)
+            yield from collect(done)
+        total_seconds = monotonic() - start
+    finally:
+        parsers.shutdown(cancel_futures=True)
+    stats = {'pages_fetched': fetched,
+             'fetch_seconds': fetch_seconds,
+             'fetch_pages_per_second': fetched / max(fetch_seconds, 1e-9),
+             'pages_parsed': parsed,
+             'parse_workers': parse_workers,
+             'parse_ms_per_page': 1000 * parse_seconds / max(parsed, 1),
+             'parse_pages_per_second':
+                 parsed * parse_workers / max(parse_seconds, 1e-9),
+             'total_seconds': total_seconds,
+             'pages_per_second': parsed / max(total_seconds, 1e-9)}
+    if report is not None:
+        report.update(stats)
+    instrumentation.increment('pipeline_pages_total', fetched,
+                              stage='fetch')
+    instrumentation.increment('pipeline_pages_total', parsed, stage='parse')
+    instrumentation.increment('pipeline_seconds_total', fetch_seconds,
+                              stage='fetch')
+    instrumentation.increment('pipeline_seconds_total', parse_seconds,
+                              stage='parse')
+
+class _Checkpoint:
+    """
+    A directory holding a JSON-lines manifest and pickled chunks of rows
+    for a long bulk job. A chunk is only counted once its manifest line,
+    listing the units whose rows it holds, has been written, so a job
+    killed mid-flush never keeps partial or duplicate rows.
+    """
+
+    def __init__(self, path, resume=False):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.manifest = os.path.join(path, 'manifest.jsonl')
+        if not resume:
+            # only ever delete what a checkpoint wrote, never the directory
+            for name in os.listdir(path):
+                if name == 'manifest.jsonl' or _CHUNK_FILE.fullmatch(name):
+                    os.remove(os.path.join(path, name))
+        self.done = set()
+        self.failed = {}
+        self.chunks = set()
+        if os.path.exists(self.manifest):
+            with open(self.manifest) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # a line cut short by a crash
+                        continue
+                    if 'chunk' in entry:
+                        self.chunks.add(entry['chunk'])
+                        self.done.update(tuple(i) for i in entry['units'])
+                    else:
+                        self.failed[tuple(entry['failed'])] = entry['error']
+        for unit in self.done:
+            self.failed.pop(unit, None)
+        for name in os.listdir(path):
+            match = _CHUNK_FILE.fullmatch(name)
+            if match and int(match.group(1)) not in self.chunks:
+                os.remove(os.path.join(path, name))
+
+    def _append(self, entry):
+        with open(self.manifest, 'a') as f:
+            f.write(json.dumps(entry)+'\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def record_failure(self, unit, error):
+        self.failed[unit] = repr(error)
+        self._append({'failed': list(unit), 'error': repr(error)})
+
+    def write_chunk(self, units, frames):
+        """
+        Args:
+            units (list of tuples): the units whose rows are in frames
+            frames (dict): name -> list of pd.DataFrames
+        """
+        chunk = max(self.chunks, default=-1) + 1
+        for name, values in frames.items():
+            if len(values) > 0:
+                _concat(values).to_pickle(os.path.join(
+                    self.path, f'{chunk:05d}_{name}.pkl'))
+        self._append({'chunk': chunk, 'units': [list(i) for i in units]})
+        self.chunks.add(chunk)
+        self.done.update(units)
+        for unit in units:
+            self.failed.pop(unit, None)
+
+    def read(self, name):
+        """
+        Returns:
+            pd.DataFrame of every committed chunk's rows for name
+        """
+        return _concat([pd.read_pickle(os.path.join(
+            self.path, f'{chunk:05d}_{name}.pkl'))
+            for chunk in sorted(self.chunks)
+            if os.path.exists(os.path.join(
+                self.path, f'{chunk:05d}_{name}.pkl'))])
+
+
+def download_rosters(seasons: list[int], divisions: list[int], save=True,
+                     max_workers=_MAX_WORKERS,
+                     requests_per_second=_REQUESTS_PER_SECOND,
+                     parse_workers=None):
+    frames = []
     failures = []
     for season in seasons:
         for division in divisions:
-            sleep(random.uniform(0, _TIMEOUT))
-            try:
-                new = download_season_rosters(int(season), int(division))
-            except:
-                continue
             try:
-                res = pd.concat([res, new])
+                new = download_season_rosters(
+                    int(season), int(division), max_workers=max_workers,
+                    requests_per_second=requests_per_second,
+                    parse_workers=parse_workers)
             except:
                 continue
+            frames.append(new)
+    res = _concat(frames)
     if save:
         res.to_parquet(
             'collegebaseball/data/'+str(divisions)+'_'+str(seasons)
@@ -38,22 +364,28 @@ def download_rosters(seasons: list[int], divisions: list[int], save=True):
     return res, failures
 
 
-def download_season_rosters(season: int, division: int, save=True):
+def download_season_rosters(season: int, division: int, save=True,
+                            max_workers=_MAX_WORKERS,
+                            requests_per_second=_REQUESTS_PER_SECOND,
+                            parse_workers=None):
     """
     """
-    res = pd.DataFrame()
+    frames = []
     failures = []
     df = guts.get_schools_table()
     school_ids = df.loc[df['division'] == division]
     school_ids = school_ids.school_id.unique()
-    for i in school_ids:
-        sleep(random.uniform(0, _TIMEOUT))
-        try:
-            new = ncaa.ncaa_team_season_roster(int(i), int(season))
-            res = pd.concat([res, new])
-        except:
-            failures.append(i)
+    units = [(int(i), int(season)) for i in school_ids]
+    order = {unit: index for index, unit in enumerate(units)}
+    for unit, new, error in _pipeline(
+            ncaa._fetch_team_season_roster, ncaa._parse_team_season_roster,
+            units, max_workers, requests_per_second,
+            parse_workers=parse_workers, progress=False):
+        if error is not None:
+            failures.append(unit[0])
             continue
+        frames.append((order[unit], new))
+    res = _concat([new for _, new in sorted(frames, key=lambda x: x[0])])
     res['season'] = season
     res['season'] = res['season'].astype('int64')
     res['division'] = division
@@ -64,28 +396,36 @@ def download_season_rosters(season: int, division: int, save=True):
     return res
 
 
-def download_team_results(season: int, division=1, save=True):
+def download_team_results(season: int, division=1, save=True,
+                          max_workers=_MAX_WORKERS,
+                          requests_per_second=_REQUESTS_PER_SECOND,
+                          parse_workers=None):
     """
     """
-    res = pd.DataFrame()
+    frames = []
     failures = []
     df = guts.get_schools_table()
     df = df.loc[df.division == division]
-    for i in tqdm(df.school_id.unique()):
-        sleep(random.uniform(0, _TIMEOUT))
-        try:
-            new = ncaa.ncaa_team_results(int(i), int(season))
-            res = pd.concat([res, new])
-        except:
-            failures.append(i)
+    units = [(int(i), int(season), 'batting')
+             for i in df.school_id.unique()]
+    order = {unit: index for index, unit in enumerate(units)}
+    for unit, new, error in _pipeline(
+            ncaa._fetch_team_game_logs, ncaa._parse_team_results, units,
+            max_workers, requests_per_second, parse_workers=parse_workers):
+        if error is not None:
+            failures.append(unit[0])
             continue
+        frames.append((order[unit], new))
+    res = _concat([new for _, new in sorted(frames, key=lambda x: x[0])])
     if save:
         res.to_csv('collegebaseball/data/'+str(season) +
                    '_results.csv', index=False)
     return res, failures
 
 
-def download_team_stats(seasons: list[int], variant: str, divisions: list[int], save=True):
+def download_team_stats(seasons: list[int], variant: str, divisions: list[int], save=True,
+                        max_workers=_MAX_WORKERS,
+                        requests_per_second=_REQUESTS_PER_SECOND):
     """
     """
     failures = []
@@ -93,19 +433,25 @@ def download_team_stats(seasons: list[int], variant: str, divisions: list[int],
     for division in tqdm(divisions):
         schools = df.loc[df.division == division]
         for season in tqdm(seasons):
-            res = pd.DataFrame()
-            for i in tqdm(schools.school_id.unique()):
-                sleep(random.uniform(0, _TIMEOUT))
+            frames = []
+            units = [(int(i), int(season), variant)
+                     for i in schools.school_id.unique()]
+            for unit, new, error in _map_concurrently(
+                    ncaa.ncaa_team_stats, units, max_workers,
+                    requests_per_second):
                 try:
-                    new = ncaa.ncaa_team_stats(int(i), int(season), variant)
-                    new['school_id'] = i
+                    if error is not None:
+                        raise error
+                    new['school_id'] = unit[0]
                     new['school_id'] = new['school_id'].astype('int32')
-                    new['school'] = lookup.lookup_school_reverse(i)
-                    new['school'] = new['school'].astype('string')
-                    res = pd.concat([res, new])
+                    frames.append(new)
                 except:
-                    failures.append(i)
+                    failures.append(unit[0])
                     continue
+            res = _concat(frames)
+            if 'school_id' in res.columns:
+                res['school'] = lookup.lookup_schools_bulk(
+                    res['school_id'])['school'].values
             res['season'] = season
             res['season'] = res['season'].astype('int32')
             res['division'] = division
@@ -117,7 +463,9 @@ def download_team_stats(seasons: list[int], variant: str, divisions: list[int],
     return res
 
 
-def download_team_totals(seasons: list[int], variant: str, divisions: list[int], save=True):
+def download_team_totals(seasons: list[int], variant: str, divisions: list[int], save=True,
+                         max_workers=_MAX_WORKERS,
+                         requests_per_second=_REQUESTS_PER_SECOND):
     """
     """
     failures = []
@@ -125,19 +473,25 @@ def download_team_totals(seasons: list[int], variant: str, divisions: list[int],
     for division in tqdm(divisions):
         schools = df.loc[df.division == division]
         for season in tqdm(seasons):
-            res = pd.DataFrame()
-            for i in tqdm(schools.school_id.unique()):
-                sleep(random.uniform(0, _TIMEOUT))
+            frames = []
+            units = [(int(i), int(season), variant)
+                     for i in schools.school_id.unique()]
+            for unit, new, error in _map_concurrently(
+                    ncaa.ncaa_team_totals, units, max_workers,
+                    requests_per_second):
                 try:
-                    new = ncaa.ncaa_team_totals(int(i), int(season), variant)
-                    new['school_id'] = i
+                    if error is not None:
+                        raise error
+                    new['school_id'] = unit[0]
                     new['school_id'] = new['school_id'].astype('int32')
-                    new['school'] = lookup.lookup_school_reverse(i)[0]
-                    new['school'] = new['school'].astype('string')
-                    res = pd.concat([res, new])
+                    frames.append(new)
                 except:
-                    failures.append(i)
+                    failures.append(unit[0])
                     continue
+            res = _concat(frames)
+            if 'school_id' in res.columns:
+                res['school'] = lookup.lookup_schools_bulk(
+                    res['school_id'])['school'].values
             res['season'] = season
             res['season'] = res['season'].astype('int32')
             res['division'] = division
@@ -148,35 +502,115 @@ def download_team_totals(seasons: list[int], variant: str, divisions: list[int],
     return failures
 
 
-def download_player_game_logs(season, division=None, save=True):
+def download_team_stats_and_totals(seasons: list[int], variant: str,
+                                   divisions: list[int], save=True,
+                                   max_workers=_MAX_WORKERS,
+                                   requests_per_second=_REQUESTS_PER_SECOND):
+    """
+    Builds both the player-level (download_team_stats) and team-level
+    (download_team_totals) tables in one pass, with one request per team
+
+    Returns:
+        tuple of (stats pd.DataFrame, totals pd.DataFrame, failures) for
+        the last division and season
+    """
+    failures = []
+    df = guts.get_schools_table()
+    for division in tqdm(divisions):
+        schools = df.loc[df.division == division]
+        for season in tqdm(seasons):
+            stats_frames = []
+            totals_frames = []
+            units = [(int(i), int(season), variant)
+                     for i in schools.school_id.unique()]
+            for unit, new, error in _map_concurrently(
+                    ncaa.ncaa_team_stats_and_totals, units, max_workers,
+                    requests_per_second):
+                try:
+                    if error is not None:
+                        raise error
+                    new_stats, new_totals = new
+                    new_stats['school_id'] = unit[0]
+                    new_stats['school_id'] = new_stats['school_id'].astype(
+                        'int32')
+                    new_totals['school_id'] = unit[0]
+                    new_totals['school_id'] = new_totals['school_id'].astype(
+                        'int32')
+                    stats_frames.append(new_stats)
+                    totals_frames.append(new_totals)
+                except:
+                    failures.append(unit[0])
+                    continue
+            stats = _concat(stats_frames)
+            totals = _concat(totals_frames)
+            for res, kind in ((stats, 'stats'), (totals, 'totals')):
+                if 'school_id' in res.columns:
+                    res['school'] = lookup.lookup_schools_bulk(
+                        res['school_id'])['school'].values
+                res['season'] = season
+                res['season'] = res['season'].astype('int32')
+                res['division'] = division
+                res['division'] = res['division'].astype('int8')
+                if save:
+                    res.to_csv('collegebaseball/data/d'+str(division)+'_'+str(season) +
+                               '_'+variant+'_'+kind+'.csv', index=False)
+    return stats, totals, failures
+
+
+def download_player_game_logs(season, division=None, save=True,
+                              max_workers=_MAX_WORKERS,
+                              requests_per_second=_REQUESTS_PER_SECOND,
+                              resume=False, checkpoint_dir=None,
+                              chunk_size=_CHUNK_SIZE, parse_workers=None):
     '''
     Gets literally all stats in D1 NCAA Mens Baseball.
     This will take some time to complete.
+
+    Progress is checkpointed to checkpoint_dir every chunk_size units, with
+    a manifest of finished and failed (stats_player_seq, season, variant)
+    units. resume=True skips finished units and re-drives the failures;
+    otherwise the job starts over, deleting the manifest and chunks left
+    in checkpoint_dir (and nothing else there). Pages are parsed on parse_workers
+    processes (defaults to the number of cores), so rows are in the order
+    their pages finished rather than roster order.
     '''
+    if checkpoint_dir is None:
+        checkpoint_dir = 'collegebaseball/data/checkpoints/d'+str(division) + \
+            '_'+str(season)+'_player_game_logs'
+    checkpoint = _Checkpoint(checkpoint_dir, resume=resume)
     df = guts.get_rosters_table()
     players = df.loc[df.season == season]
     if division is not None:
         players = players.loc[players.division == division]
-    batting_res = pd.DataFrame()
-    pitching_res = pd.DataFrame()
-    fielding_res = pd.DataFrame()
-    failures = []
-    for index, player in tqdm(players.iterrows()):
-        stats_player_seq = player['stats_player_seq']
-        for variant in ['batting', 'pitching', 'fielding']:
-            sleep(random.uniform(0, _TIMEOUT))
-            try:
-                new = ncaa.ncaa_player_game_logs(stats_player_seq,
-                                                 season,  variant)
-                if variant == 'batting':
-                    batting_res = pd.concat([batting_res, new])
-                elif variant == 'pitching':
-                    pitching_res = pd.concat([pitching_res, new])
-                else:
-                    fielding_res = pd.concat([fielding_res, new])
-            except:
-                failures.append((stats_player_seq, variant, season))
+    units = [(int(stats_player_seq), int(season), variant)
+             for stats_player_seq in players['stats_player_seq']
+             for variant in ['batting', 'pitching', 'fielding']]
+    units = [i for i in units if i not in checkpoint.done]
+    pending = []
+    frames = {'batting': [], 'pitching': [], 'fielding': []}
+    try:
+        for unit, new, error in _pipeline(
+                ncaa._fetch_player_game_logs, ncaa._parse_player_game_logs,
+                units, max_workers, requests_per_second,
+                parse_workers=parse_workers):
+            if error is not None:
+                checkpoint.record_failure(unit, error)
                 continue
+            frames[unit[2]].append(new)
+            pending.append(unit)
+            if len(pending) >= chunk_size:
+                checkpoint.write_chunk(pending, frames)
+                pending = []
+                frames = {'batting': [], 'pitching': [], 'fielding': []}
+    finally:
+        if len(pending) > 0:
+            checkpoint.write_chunk(pending, frames)
+    if len(checkpoint.failed) > 0:
+        print(str(len(checkpoint.failed))+' units failed, '
+              'rerun with resume=True to retry them')
+    batting_res = checkpoint.read('batting')
+    pitching_res = checkpoint.read('pitching')
+    fielding_res = checkpoint.read('fielding')
     if save:
         batting_res.to_csv('collegebaseball/data/d'+str(division)+'_batting_player_game_logs_' +
                            str(season)+'.csv', index=False)
@@ -187,21 +621,407 @@ def download_player_game_logs(season, division=None, save=True):
     return batting_res, pitching_res, fielding_res
 
 
-def download_boydsworld_games(start, end, save=True):
+def _boydsworld_school_results(bd_name, school_id, ncaa_name, start, end):
+    """
+    A helper function to fetch one school's boydsworld results and tag them
+    with its NCAA school_id and name
+    """
+    new = boydsworld_scraper.boydsworld_team_results(bd_name, start, end)
+    new['school_id'] = school_id
+    new['school_id'] = new['school_id'].astype('int')
+    new['school'] = ncaa_name
+    new['school'] = new['school'].astype('string')
+    return new
+
+
+def download_boydsworld_games(start, end, save=True,
+                              max_workers=_MAX_WORKERS,
+                              requests_per_second=_REQUESTS_PER_SECOND,
+                              bulk=True):
+    """
+    Gets every boydsworld result between start and end for each school
+    with a bd_name, from each school's perspective
+
+    With bulk=True, every game is pulled in one league-wide request and
+    split into each team's perspective locally. Should that request come
+    back empty, each school's results are fetched and merged into one row
+    per game before being split. bulk=False calls boydsworld_team_results
+    once per school.
+    """
     df = guts.get_schools_table()
     df = df.loc[df.bd_name.notnull()]
-    res = pd.DataFrame()
-    for index, row in tqdm(df.iterrows()): 
-        sleep(random.uniform(0, _TIMEOUT))
-        try: 
-            new = boydsworld_scraper.boydsworld_team_results(row['bd_name'], start, end)
-            new['school_id'] = row['school_id']
-            new['school_id'] = new['school_id'].astype('int')
-            new['school'] = row['ncaa_name']
-            new['school'] = new['school'].astype('string')
-            res = pd.concat([res, new])
-        except: 
-            continue
-    if save: 
+    if bulk:
+        res = _boydsworld_bulk_results(df, start, end, max_workers,
+                                       requests_per_second)
+    else:
+        frames = []
+        units = [(row['bd_name'], row['school_id'], row['ncaa_name'],
+                  start, end) for index, row in df.iterrows()]
+        for unit, new, error in _map_concurrently(
+                _boydsworld_school_results, units, max_workers,
+                requests_per_second, host=_BOYDSWORLD_HOST):
+            if error is not None:
+                continue
+            frames.append(new)
+        res = _concat(frames)
+    if save:
         res.to_csv('collegebaseball/data/games_'+str(start)+'_'+str(end)+'.csv', index=False)
-    return res
\ No newline at end of file
+    return res
+
+
+def sync_boydsworld_games(path='collegebaseball/data/d1_games.parquet',
+                          end=None, start=1992, by_school=False, save=True,
+                          max_workers=_MAX_WORKERS,
+                          requests_per_second=_REQUESTS_PER_SECOND):
+    """
+    Brings a stored download_boydsworld_games table up to date, fetching
+    only the games on or after the last stored date instead of the whole
+    history. Rows already stored are skipped, so syncing again adds
+    nothing.
+
+    Args:
+        path (str): the stored table, .parquet or .csv. Created if missing
+        end (int, optional): the last season to fetch, defaults to this year
+        start (int, optional): the first season for schools with nothing
+         stored yet. Defaults to 1992
+        by_school (bool, optional): fetch from each school's own last stored
+         date, one request per school, instead of from the league's last
+         date in one request. Defaults to False
+        save (bool, optional): write the updated table back to path
+
+    Returns:
+        tuple of (the updated table (pd.DataFrame), rows added (int))
+    """
+    if end is None:
+        end = date.today().year
+    stored = pd.DataFrame()
+    if os.path.exists(path):
+        if path.endswith('.csv'):
+            stored = pd.read_csv(path)
+        else:
+            stored = pd.read_parquet(path)
+        stored['date'] = pd.to_datetime(stored['date'])
+    schools = guts.get_schools_table()
+    schools = schools.loc[schools.bd_name.notnull()]
+    since = pd.Timestamp(year=start, month=1, day=1)
+    if len(stored) > 0:
+        since = stored['date'].max()
+    if by_school:
+        last = stored.groupby('school_id')['date'].max() if len(stored) > 0 \
+            else pd.Series(dtype='datetime64[ns]')
+        school_since = {i: last.get(i, pd.Timestamp(year=start, month=1,
+                                                    day=1))
+                        for i in schools['school_id']}
+        units = [(row['bd_name'], row['school_id'], row['ncaa_name'],
+                  school_since[row['school_id']].year, end)
+                 for index, row in schools.iterrows()]
+        frames = []
+        for unit, new, error in _map_concurrently(
+                _boydsworld_school_results, units, max_workers,
+                requests_per_second, host=_BOYDSWORLD_HOST):
+            if error is not None or len(new) == 0:
+                continue
+            frames.append(new.loc[new['date'] >= school_since[unit[1]]])
+        fetched = _concat(frames)
+    else:
+        fetched = _boydsworld_bulk_results(schools, since.year, end,
+                                           max_workers, requests_per_second)
+        if len(fetched) > 0:
+            fetched = fetched.loc[fetched['date'] >= since]
+    added = _unstored_rows(stored, fetched)
+    if len(stored) > 0 and 'season' in stored.columns and len(added) > 0:
+        added['season'] = added['date'].dt.year.astype(
+            stored['season'].dtype)
+    res = _concat([stored, added]).reset_index(drop=True)
+    print(str(len(added))+' rows added')
+    if save and len(added) > 0:
+        if path.endswith('.csv'):
+            res.to_csv(path, index=False)
+        else:
+            res.to_parquet(path, index=False)
+    return res, len(added)
+
+
+def _unstored_rows(stored, fetched):
+    """
+    A helper function to find the fetched boydsworld rows that are not yet
+    stored, matched on school, date, opponent and score. Repeated rows are
+    matched one for one, so a same-score doubleheader is kept whole.
+    """
+    if len(fetched) == 0:
+        return fetched
+    keys = ['school_id', 'date', 'opponent', 'runs_scored', 'runs_allowed']
+    fetched = fetched.assign(
+        _n=fetched.groupby(keys, dropna=False).cumcount())
+    if len(stored) > 0:
+        counts = stored.groupby(keys, dropna=False).size().rename('_stored')
+        fetched = fetched.join(counts, on=keys)
+        fetched = fetched.loc[~(fetched['_n'] < fetched['_stored'])]
+        fetched = fetched.drop(columns=['_stored'])
+    return fetched.drop(columns=['_n'])
+
+
+def _boydsworld_bulk_results(schools, start, end, max_workers,
+                             requests_per_second):
+    """
+    A helper function to build download_boydsworld_games' table from one
+    row per game instead of one request per school
+    """
+    with http_utils.host_limits(_BOYDSWORLD_HOST, requests_per_second):
+        games = boydsworld_scraper.boydsworld_league_results(start, end)
+    if len(games) == 0:
+        units = [(i, start, end) for i in schools['bd_name']]
+        games = boydsworld_scraper._canonical_games(
+            [new for unit, new, error in _map_concurrently(
+                boydsworld_scraper._get_data, units, max_workers,
+                requests_per_second, host=_BOYDSWORLD_HOST)
+             if error is None])
+    res = boydsworld_scraper.boydsworld_team_perspectives(games)
+    if len(res) == 0:
+        return res
+    schools = schools[['bd_name', 'school_id', 'ncaa_name']].drop_duplicates(
+        subset=['bd_name']).reset_index(drop=True)
+    order = pd.Series(schools.index, index=schools['bd_name'])
+    res = res.loc[res['school'].isin(order.index)]
+    res = res.assign(_order=res['school'].map(order).values)
+    res = res.sort_values(['_order', 'date'], kind='stable')
+    res['school_id'] = schools['school_id'].values[res['_order'].values]
+    res['school_id'] = res['school_id'].astype('int')
+    res = res.drop(columns=['school', '_order']).assign(
+        school=schools['ncaa_name'].values[res['_order'].values])
+    res['school'] = res['school'].astype('string')
+    return res
+
+
+def _archived_season(season_id, year_stat_category_id=None):
+    """
+    A helper function to turn an archived request's season_id (and stat
+    category) back into the values the fetch helpers pass to the parsers
+    """
+    season = lookup.lookup_season_id_reverse(int(season_id))
+    season, season_id, batting_id, pitching_id, fielding_id = lookup._lookup_season_info(
+        season)
+    variant = None
+    if year_stat_category_id is not None:
+        variant = {int(batting_id): 'batting', int(pitching_id): 'pitching',
+                   int(fielding_id): 'fielding'}.get(int(year_stat_category_id))
+    return season, season_id, variant
+
+
+def _archived_jobs(dataset, season, division, variant, split, path):
+    """
+    A helper function to find the archived pages a dataset is built from
+
+    Returns:
+        list of (ArchivedPage, parse function, parse args, key) where key
+        is what the dataset is grouped or tagged by
+    """
+    jobs = []
+    # the same schools the download_* functions walk for a division
+    schools = guts.get_schools_table()
+    schools = None if division is None else \
+        set(schools.loc[schools.division == division].school_id.astype(int))
+    if dataset in ['player_game_logs', 'team_results']:
+        for entry in html_archive.entries(path, '%/player/game_by_game'):
+            params = entry.params
+            try:
+                entry_season, season_id, entry_variant = _archived_season(
+                    params['game_sport_year_ctl_id'],
+                    params['year_stat_category_id'])
+                school, school_id, entry_division = lookup._lookup_school_info(
+                    int(params['org_id']))
+            except (KeyError, ValueError):
+                continue
+            if entry_season != season or (schools is not None and
+                                          school_id not in schools):
+                continue
+            if dataset == 'team_results':
+                if params['stats_player_seq'] != '-100' or \
+                        entry_variant != 'batting':
+                    continue
+                jobs.append((entry, ncaa._parse_team_results,
+                             (entry_season, season_id, school_id,
+                              entry_division, entry_variant), school_id))
+            else:
+                if params['stats_player_seq'] == '-100' or \
+                        (variant is not None and entry_variant != variant):
+                    continue
+                jobs.append((entry, ncaa._parse_player_game_logs,
+                             (int(params['stats_player_seq']), entry_season,
+                              season_id, school_id, entry_division,
+                              entry_variant), entry_variant))
+    elif dataset == 'rosters':
+        for entry in html_archive.entries(path, '%/team/%/roster/%'):
+            match = _ROSTER_URL.search(entry.url)
+            if match is None:
+                continue
+            try:
+                school, school_id, entry_division = lookup._lookup_school_info(
+                    int(match.group(1)))
+                entry_season, season_id = lookup._lookup_season_basic(
+                    lookup.lookup_season_id_reverse(int(match.group(2))))
+            except (KeyError, ValueError):
+                continue
+            if entry_season != season or (schools is not None and
+                                          school_id not in schools):
+                continue
+            jobs.append((entry, ncaa._parse_team_season_roster,
+                         (school, school_id, entry_division, entry_season,
+                          season_id), school_id))
+    elif dataset in ['team_stats', 'team_totals']:
+        for entry in html_archive.entries(path, '%/team/%/stats'):
+            match = _TEAM_STATS_URL.search(entry.url)
+            params = entry.params
+            if match is None:
+                continue
+            try:
+                entry_season, season_id, entry_variant = _archived_season(
+                    params['game_sport_year_ctl_id'],
+                    params['year_stat_category_id'])
+                school, school_id, entry_division = lookup._lookup_school_info(
+                    int(match.group(1)))
+            except (KeyError, ValueError):
+                continue
+            if entry_season != season or entry_variant != variant or \
+                    (schools is not None and school_id not in schools):
+                continue
+            if split is None:
+                if 'available_stat_id' in params:
+                    continue
+            elif params.get('available_stat_id') != str(
+                    ncaa_utils.available_stat_ids[variant][season][split]):
+                continue
+            if dataset == 'team_stats':
+                jobs.append((entry, ncaa._parse_team_stats,
+                             (entry_season, entry_division, entry_variant,
+                              True, split), school_id))
+            else:
+                jobs.append((entry, ncaa._parse_team_totals,
+                             (entry_season, entry_division, entry_variant,
+                              True), school_id))
+    else:
+        raise ValueError('unknown dataset '+str(dataset))
+    return jobs
+
+
+def _reparse_page(path, entry, parse, args):
+    """
+    A helper function run in a parser process to read one archived page
+    and parse it, returning the parse metrics it recorded as well
+    """
+    instrumentation.reset()
+    res = parse(html_archive.read(entry, path), *args)
+    return res, instrumentation._raw()
+
+
+def reparse(dataset, season, division=None, variant=None, split=None,
+            save=True, archive_path=None, parse_workers=None, progress=True):
+    """
+    Rebuilds a dataset from the raw HTML archive (see
+    http_utils.enable_archive) with the current parsers, in parallel and
+    without touching the network. Only the latest fetch of each page is
+    used. Files are saved under the same names the download_* functions
+    use.
+
+    On platforms that start processes by spawning (Windows, macOS), call
+    this from under an if __name__ == '__main__' guard.
+
+    Args:
+        dataset (str): 'player_game_logs', 'team_results', 'rosters',
+         'team_stats' or 'team_totals'
+        season (int, YYYY)
+        division (int, optional): only schools in this division
+        variant (str, optional): 'batting', 'pitching', or 'fielding'.
+         Required for 'team_stats' and 'team_totals'
+        split (str, optional): for 'team_stats' and 'team_totals', see
+         ncaa_team_stats
+        save (bool, optional): Defaults to True
+        archive_path (str, optional): defaults to html_archive.get_path()
+        parse_workers (int, optional): parser processes, defaults to the
+         number of cores
+        progress (bool): whether to show a tqdm progress bar
+
+    Returns:
+        pd.DataFrame, or for 'player_game_logs' a tuple of
+        (batting, pitching, fielding) pd.DataFrames, plus a list of
+        (url, params, exception) for pages that failed to parse
+    """
+    if dataset in ['team_stats', 'team_totals'] and variant is None:
+        raise ValueError('variant is required for '+dataset)
+    path = archive_path or html_archive.get_path()
+    jobs = _archived_jobs(dataset, season, division, variant, split, path)
+    parse_workers = parse_workers or os.cpu_count() or 1
+    results = [None] * len(jobs)
+    failures = []
+    queue = iter(enumerate(jobs))
+    pending = {}
+    with ProcessPoolExecutor(max_workers=parse_workers) as parsers:
+        progress_bar = tqdm(total=len(jobs), disable=not progress)
+        while True:
+            for index, (entry, parse, args, key) in islice(
+                    queue, parse_workers * _IN_FLIGHT_PER_WORKER
+                    - len(pending)):
+                pending[parsers.submit(_reparse_page, path, entry, parse,
+                                       args)] = index
+            if len(pending) == 0:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                progress_bar.update()
+                try:
+                    results[index], recorded = future.result()
+                    instrumentation._merge(recorded)
+                except Exception as e:
+                    entry = jobs[index][0]
+                    failures.append((entry.url, entry.params, e))
+        progress_bar.close()
+    keys = [job[3] for job in jobs]
+    if dataset == 'player_game_logs':
+        res = tuple(_concat([new for new, key in zip(results, keys)
+                             if new is not None and key == i])
+                    for i in ['batting', 'pitching', 'fielding'])
+        if save:
+            for new, i in zip(res, ['batting', 'pitching', 'fielding']):
+                new.to_csv('collegebaseball/data/d'+str(division)+'_'+i +
+                           '_player_game_logs_'+str(season)+'.csv',
+                           index=False)
+        return res, failures
+    if dataset in ['team_stats', 'team_totals']:
+        frames = []
+        for new, school_id in zip(results, keys):
+            if new is None:
+                continue
+            new['school_id'] = school_id
+            new['school_id'] = new['school_id'].astype('int32')
+            frames.append(new)
+        res = _concat(frames)
+        if 'school_id' in res.columns:
+            res['school'] = lookup.lookup_schools_bulk(
+                res['school_id'])['school'].values
+        res['season'] = season
+        res['season'] = res['season'].astype('int32')
+        if division is not None:
+            res['division'] = division
+        if 'division' in res.columns:
+            res['division'] = res['division'].astype('int8')
+        if save:
+            res.to_csv('collegebaseball/data/d'+str(division)+'_'+str(season) +
+                       '_'+variant+'_'+dataset.split('_')[-1]+'.csv',
+                       index=False)
+        return res, failures
+    res = _concat([new for new in results if new is not None])
+    if dataset == 'rosters':
+        res['season'] = season
+        res['season'] = res['season'].astype('int64')
+        if division is not None:
+            res['division'] = division
+        if 'division' in res.columns:
+            res['division'] = res['division'].astype('int64')
+        if save:
+            res.to_parquet('collegebaseball/data/d'+str(division) +
+                           '_'+str(season)+'_rosters.parquet', index=False)
+    elif save:
+        res.to_csv('collegebaseball/data/'+str(season) +
+                   '_results.csv', index=False)
+    return res, failures
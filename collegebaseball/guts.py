@@ -6,9 +6,27 @@ A module to provide convenient read-access to collegebaseball's internal data
 created by Nathan Blumenfeld in Summer 2022
 """
 from importlib import resources
+from collections import namedtuple
+import os
 import pandas as pd
 
 
+# default base directory of the on-disk stores, the response cache
+# (http_cache) and the page archive (html_archive)
+STORE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'collegebaseball')
+
+
+# a single season's linear weights, as returned by
+# get_season_linear_weights_record
+LinearWeights = namedtuple('LinearWeights', [
+    'season', 'division', 'wOBA', 'wOBAScale', 'wBB', 'wHBP', 'w1B', 'w2B',
+    'w3B', 'wHR', 'R_PA', 'RPG', 'cFIP'])
+
+# in-process cache of the bundled linear weights, see _load_linear_weights
+_linear_weights_table = None
+_linear_weights = None
+
+
 def get_schools_path():
     """
 
@@ -101,26 +119,79 @@ def get_linear_weights_path():
     return data_file_path
 
 
+def _load_linear_weights():
+    """
+    A helper function to read linear_weights.csv from disk once and index
+    it by (season, division)
+    """
+    global _linear_weights_table, _linear_weights
+    df = pd.read_csv(get_linear_weights_path())
+    _linear_weights = {}
+    for row in df.to_dict('records'):
+        record = LinearWeights(
+            season=int(row['season']), division=int(row['division']),
+            wOBA=row['wOBA'], wOBAScale=row['wOBAScale'], wBB=row['wBB'],
+            wHBP=row['wHBP'], w1B=row['w1B'], w2B=row['w2B'],
+            w3B=row['w3B'], wHR=row['wHR'], R_PA=row['R/PA'],
+            RPG=row['RPG'], cFIP=row['cFIP'])
+        _linear_weights[(record.season, record.division)] = record
+    _linear_weights_table = df
+
+
+def reload_linear_weights():
+    """
+    Drops the in-process linear weights cache so the next lookup re-reads
+    linear_weights.csv. Call this after rewriting the file.
+    """
+    global _linear_weights_table, _linear_weights
+    _linear_weights_table = None
+    _linear_weights = None
+
+
 def get_linear_weights_table():
     """
+    Returns:
+        DataFrame of linear_weights.csv, read from disk once per process
     """
-    return pd.read_csv(get_linear_weights_path())
+    if _linear_weights_table is None:
+        _load_linear_weights()
+    return _linear_weights_table.copy()
 
 
-def get_season_linear_weights(season: int, division):
+def get_season_linear_weights(season: int, division=1):
     """
     Args:
-        season(int, YYYY): valid 2013-2022
+        season(int, YYYY): valid 2013-2023
+        division(int): 1, 2, or 3. Defaults to 1
 
     Returns:
-        Single-row Dataframe with the following columns:
-            season(primary key)
-            season_id
-            batting_id
-            pitching_id
-            fielding_id
+        Single-row DataFrame with the following columns:
+            wOBA, wOBAScale, wBB, wHBP, w1B, w2B, w3B, wHR, R/PA, RPG,
+            cFIP, season, division
+        empty if there are no weights for the given season and division
     """
     df = get_linear_weights_table()
-    df = df.loc[df['season'] == int(season)]
-    res = df.loc[df['division'] == int(division)]
-    return res
+    return df.loc[(df['season'] == int(season)) &
+                  (df['division'] == int(division))]
+
+
+def get_season_linear_weights_record(season: int, division=1):
+    """
+    Like get_season_linear_weights, but returns a lightweight record from
+    the in-process cache instead of a DataFrame, for per-player
+    calculations
+
+    Args:
+        season(int, YYYY): valid 2013-2023
+        division(int): 1, 2, or 3. Defaults to 1
+
+    Returns:
+        LinearWeights namedtuple with the fields wOBA, wOBAScale, wBB,
+        wHBP, w1B, w2B, w3B, wHR, R_PA (R/PA), RPG, cFIP, season, division
+
+    Raises:
+        KeyError if there are no weights for the given season and division
+    """
+    if _linear_weights is None:
+        _load_linear_weights()
+    return _linear_weights[(int(season), int(division))]
@@ -0,0 +1,234 @@
+"""
+html_archive.py
+
+an append-only archive of every page the scrapers fetch
+
+Each page is compressed on its own with zstd and appended to the current
+segment file. A SQLite index records its URL, params, fetch time, status
+and location, so the parsers can be re-run over past fetches without the
+network (see download_utils.reparse).
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections import namedtuple
+from time import time
+import zstandard
+from collegebaseball import guts
+
+
+_DEFAULT_DIR = os.path.join(guts.STORE_DIR, 'archive')
+# segment files are rolled over once they reach this size
+_SEGMENT_BYTES = 256 * 1024 ** 2
+_ZSTD_LEVEL = 10
+
+_SEGMENT_NAME = re.compile(r'^pages-(\d+)\.bin$')
+
+ArchivedPage = namedtuple('ArchivedPage', [
+    'id', 'url', 'params', 'fetched_at', 'status', 'encoding', 'segment',
+    'offset', 'length', 'codec'])
+
+_lock = threading.Lock()
+_state = {'dir': None, 'conn': None, 'segment': None, 'file': None}
+
+
+def configure(path=None):
+    """
+    Opens (creating if needed) the archive at path. Every page fetched
+    through http_utils is appended to it until close is called.
+
+    Args:
+        path (str, optional): archive directory, defaults to
+         ~/.cache/collegebaseball/archive
+    """
+    with _lock:
+        path = path or _state['dir'] or _DEFAULT_DIR
+        if path == _state['dir'] and _state['conn'] is not None:
+            return
+        _close()
+        os.makedirs(path, exist_ok=True)
+        conn = sqlite3.connect(os.path.join(path, 'index.sqlite'),
+                               check_same_thread=False)
+        conn.execute('''CREATE TABLE IF NOT EXISTS pages (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            url TEXT,
+                            params TEXT,
+                            fetched_at REAL,
+                            status INTEGER,
+                            encoding TEXT,
+                            segment INTEGER,
+                            offset INTEGER,
+                            length INTEGER,
+                            codec TEXT)''')
+        conn.execute('''CREATE INDEX IF NOT EXISTS pages_url
+                        ON pages (url, params)''')
+        conn.commit()
+        segments = [int(m.group(1)) for m in map(_SEGMENT_NAME.match,
+                                                  os.listdir(path)) if m]
+        _state['dir'] = path
+        _state['conn'] = conn
+        _state['segment'] = max(segments, default=0)
+
+
+def _close():
+    if _state['file'] is not None:
+        _state['file'].close()
+    if _state['conn'] is not None:
+        _state['conn'].close()
+    _state['file'] = None
+    _state['conn'] = None
+
+
+def close():
+    """
+    Stops archiving. Pages stay on disk for reparse and the next configure.
+    """
+    with _lock:
+        _close()
+
+
+def is_enabled():
+    """
+    Returns:
+        True if configure has opened an archive
+    """
+    return _state['conn'] is not None
+
+
+def get_path():
+    """
+    Returns:
+        the directory of the open (or last opened) archive, or the default
+    """
+    return _state['dir'] or _DEFAULT_DIR
+
+
+def _segment_path(path, segment):
+    return os.path.join(path, f'pages-{segment:05d}.bin')
+
+
+def _compress(body):
+    return 'zstd', zstandard.ZstdCompressor(level=_ZSTD_LEVEL).compress(body)
+
+
+def _decompress(data):
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+def _normalize(url, params):
+    """
+    A helper function to store a request the same way however its params
+    were passed
+    """
+    params = {str(k): str(v) for k, v in (params or {}).items()
+              if v is not None}
+    return url.rstrip('?'), json.dumps(params, sort_keys=True)
+
+
+def append(url, params, body, encoding=None, status=200):
+    """
+    Adds a fetched page to the archive. Nothing is ever overwritten; a
+    page fetched again is stored again with its new fetch time.
+
+    Args:
+        url (str)
+        params (dict or None): the request's query string parameters
+        body (bytes): the raw response body
+        encoding (str, optional): the response's text encoding
+        status (int, optional): the response's HTTP status
+    """
+    if not is_enabled():
+        return
+    url, params = _normalize(url, params)
+    codec, data = _compress(body)
+    with _lock:
+        if _state['file'] is None:
+            _state['file'] = open(_segment_path(
+                _state['dir'], _state['segment']), 'ab')
+        if _state['file'].tell() + len(data) > _SEGMENT_BYTES and \
+                _state['file'].tell() > 0:
+            _state['file'].close()
+            _state['segment'] += 1
+            _state['file'] = open(_segment_path(
+                _state['dir'], _state['segment']), 'ab')
+        f = _state['file']
+        offset = f.tell()
+        f.write(data)
+        f.flush()
+        _state['conn'].execute(
+            'INSERT INTO pages (url, params, fetched_at, status, encoding, '
+            'segment, offset, length, codec) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (url, params, time(), int(status), encoding, _state['segment'],
+             offset, len(data), codec))
+        _state['conn'].commit()
+
+
+def entries(path=None, url_like=None, latest=True, status=200):
+    """
+    Lists archived pages
+
+    Args:
+        path (str, optional): archive directory, defaults to get_path()
+        url_like (str, optional): SQL LIKE pattern the URL must match, e.g.
+         '%/player/game_by_game'
+        latest (bool, optional): only the most recent fetch of each URL and
+         params. Defaults to True
+        status (int, optional): only pages with this HTTP status, None for
+         all. Defaults to 200
+
+    Returns:
+        list of ArchivedPage, params decoded to a dict
+    """
+    path = path or get_path()
+    conn = sqlite3.connect(os.path.join(path, 'index.sqlite'))
+    try:
+        where = ' WHERE 1 = 1'
+        args = []
+        if url_like is not None:
+            where += ' AND url LIKE ?'
+            args.append(url_like)
+        if status is not None:
+            where += ' AND status = ?'
+            args.append(int(status))
+        query = 'SELECT * FROM pages' + where
+        if latest:
+            query += ' AND id IN (SELECT MAX(id) FROM pages' + where + \
+                ' GROUP BY url, params)'
+            args = args * 2
+        rows = conn.execute(query + ' ORDER BY id', args).fetchall()
+    finally:
+        conn.close()
+    return [ArchivedPage(i[0], i[1], json.loads(i[2]), *i[3:]) for i in rows]
+
+
+def read_body(entry, path=None):
+    """
+    Reads one archived page's raw response body back. Only needs the
+    archive on disk, so it can run in any process.
+
+    Args:
+        entry (ArchivedPage)
+        path (str, optional): archive directory, defaults to get_path()
+
+    Returns:
+        bytes
+    """
+    path = path or get_path()
+    with open(_segment_path(path, entry.segment), 'rb') as f:
+        f.seek(entry.offset)
+        data = f.read(entry.length)
+    return _decompress(data)
+
+
+def read(entry, path=None):
+    """
+    Reads one archived page back as text, see read_body
+
+    Returns:
+        str, the page's html
+    """
+    return read_body(entry, path).decode(entry.encoding or 'utf-8',
+                                         errors='replace')
@@ -0,0 +1,309 @@
+"""
+http_cache.py
+
+a persistent, content-addressed cache of scraper responses
+
+Entries are keyed by URL plus normalized query params and point at a body
+blob named by the sha256 of its content, so identical pages are stored
+once. Pages from completed seasons never expire, pages from the current
+season (or with no identifiable season) expire after a configurable
+number of hours, and the least recently used bodies are evicted, with the
+entries that share them, once the cache grows past its size limit.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from datetime import date
+from time import time
+from collegebaseball import guts, lookup
+
+
+# defaults, see configure
+_DEFAULT_DIR = os.path.join(guts.STORE_DIR, 'http')
+_MAX_BYTES = 2 * 1024 ** 3
+_CURRENT_SEASON_TTL_HOURS = 12
+
+_ROSTER_URL = re.compile(r'/team/\d+/roster/(\d+)')
+# each distinct body once, as bodies are shared between entries, with its
+# size and when any entry using it was last read
+_BLOB_SIZES = ('SELECT blob, MAX(size) AS size, MAX(accessed_at) AS '
+               'accessed_at FROM entries GROUP BY blob')
+
+_lock = threading.RLock()
+_state = {'dir': None, 'conn': None, 'max_bytes': _MAX_BYTES,
+          'ttl_hours': _CURRENT_SEASON_TTL_HOURS, 'current_season': None}
+_stats = {'hits': 0, 'misses': 0, 'expired': 0, 'stores': 0, 'evictions': 0}
+
+
+def configure(path=None, max_bytes=None, current_season_ttl_hours=None,
+              current_season=None):
+    """
+    Opens (creating if needed) the cache at path and sets its policies
+
+    Args:
+        path (str, optional): cache directory, defaults to
+         ~/.cache/collegebaseball/http
+        max_bytes (int, optional): total body size before LRU eviction
+        current_season_ttl_hours (float, optional): how long pages from the
+         current season stay fresh
+        current_season (int, optional): the season still in progress,
+         defaults to the current calendar year
+    """
+    with _lock:
+        path = path or _state['dir'] or _DEFAULT_DIR
+        if path != _state['dir'] or _state['conn'] is None:
+            close()
+            os.makedirs(os.path.join(path, 'blobs'), exist_ok=True)
+            conn = sqlite3.connect(os.path.join(path, 'index.sqlite'),
+                                   check_same_thread=False)
+            conn.execute('''CREATE TABLE IF NOT EXISTS entries (
+                                key TEXT PRIMARY KEY,
+                                url TEXT,
+                                blob TEXT,
+                                size INTEGER,
+                                encoding TEXT,
+                                season INTEGER,
+                                fetched_at REAL,
+                                accessed_at REAL)''')
+            conn.execute('''CREATE INDEX IF NOT EXISTS entries_accessed
+                            ON entries (accessed_at)''')
+            conn.commit()
+            _state['dir'] = path
+            _state['conn'] = conn
+        if max_bytes is not None:
+            _state['max_bytes'] = int(max_bytes)
+        if current_season_ttl_hours is not None:
+            _state['ttl_hours'] = float(current_season_ttl_hours)
+        if current_season is not None:
+            _state['current_season'] = int(current_season)
+
+
+def close():
+    """
+    Closes the cache. Entries stay on disk for the next configure.
+    """
+    with _lock:
+        if _state['conn'] is not None:
+            _state['conn'].close()
+        _state['conn'] = None
+
+
+def is_enabled():
+    """
+    Returns:
+        True if configure has opened a cache
+    """
+    return _state['conn'] is not None
+
+
+def _normalize_params(params):
+    """
+    A helper function to turn request params (game_sport_year_ctl_id,
+    year_stat_category_id, stats_player_seq, available_stat_id, etc.) into
+    a stable, sorted list of (key, value) strings
+    """
+    if not params:
+        return []
+    return sorted((str(k), str(v)) for k, v in params.items()
+                  if v is not None)
+
+
+def make_key(url, params=None):
+    """
+    Returns:
+        sha256 hex digest identifying a request for url with params
+    """
+    url = url.rstrip('?')
+    params = _normalize_params(params)
+    raw = url + '?' + '&'.join(f'{k}={v}' for k, v in params)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _season_of(url, params):
+    """
+    A helper function to find which season a request is for, or None when
+    the page is not tied to a single season (e.g. career pages)
+    """
+    params = params or {}
+    if 'lastyear' in params:
+        return int(params['lastyear'])
+    if 'stats_player_seq' in params and 'org_id' not in params:
+        # /player/index pages cover a whole career
+        return None
+    season_id = params.get('game_sport_year_ctl_id', params.get('id'))
+    if season_id is None:
+        match = _ROSTER_URL.search(url)
+        season_id = match.group(1) if match else None
+    if season_id is None:
+        return None
+    try:
+        return lookup.lookup_season_id_reverse(int(season_id))
+    except (KeyError, ValueError):
+        return None
+
+
+def _current_season():
+    if _state['current_season'] is not None:
+        return _state['current_season']
+    return date.today().year
+
+
+def _is_fresh(season, fetched_at):
+    if season is not None and season < _current_season():
+        return True
+    return time() - fetched_at < _state['ttl_hours'] * 3600
+
+
+def _blob_path(blob):
+    return os.path.join(_state['dir'], 'blobs', blob[:2], blob)
+
+
+def get(url, params=None):
+    """
+    Looks up a cached response body
+
+    Returns:
+        (body bytes, encoding) or None on a miss or expired entry
+    """
+    if not is_enabled():
+        return None
+    key = make_key(url, params)
+    with _lock:
+        row = _state['conn'].execute(
+            'SELECT blob, encoding, season, fetched_at FROM entries '
+            'WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            _stats['misses'] += 1
+            return None
+        blob, encoding, season, fetched_at = row
+        if not _is_fresh(season, fetched_at):
+            _stats['expired'] += 1
+            _stats['misses'] += 1
+            return None
+        try:
+            with open(_blob_path(blob), 'rb') as f:
+                body = f.read()
+        except OSError:
+            _state['conn'].execute('DELETE FROM entries WHERE key = ?',
+                                   (key,))
+            _state['conn'].commit()
+            _stats['misses'] += 1
+            return None
+        _state['conn'].execute(
+            'UPDATE entries SET accessed_at = ? WHERE key = ?', (time(), key))
+        _state['conn'].commit()
+        _stats['hits'] += 1
+    return body, encoding
+
+
+def put(url, params, body, encoding=None):
+    """
+    Stores a response body, then evicts least recently used entries if the
+    cache is over its size limit
+    """
+    if not is_enabled():
+        return
+    key = make_key(url, params)
+    blob = hashlib.sha256(body).hexdigest()
+    season = _season_of(url, params)
+    with _lock:
+        path = _blob_path(blob)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(body)
+            os.replace(tmp, path)
+        now = time()
+        old = _state['conn'].execute(
+            'SELECT blob FROM entries WHERE key = ?', (key,)).fetchone()
+        _state['conn'].execute(
+            'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (key, url, blob, len(body), encoding, season, now, now))
+        _state['conn'].commit()
+        if old is not None and old[0] != blob:
+            _remove_blob_if_unused(old[0])
+        _stats['stores'] += 1
+        _evict()
+
+
+def _remove_blob_if_unused(blob):
+    used = _state['conn'].execute(
+        'SELECT 1 FROM entries WHERE blob = ? LIMIT 1', (blob,)).fetchone()
+    if used is None:
+        try:
+            os.remove(_blob_path(blob))
+        except OSError:
+            pass
+
+
+def _evict():
+    """
+    A helper function to drop the least recently used bodies, with every
+    entry that points at them, until the stored bodies fit in max_bytes.
+    A body shared by several entries counts once and is only freed with
+    its last entry.
+    """
+    conn = _state['conn']
+    total = conn.execute(
+        'SELECT COALESCE(SUM(size), 0) FROM (' + _BLOB_SIZES + ')'
+    ).fetchone()[0]
+    if total <= _state['max_bytes']:
+        return
+    for blob, size, _ in conn.execute(
+            _BLOB_SIZES + ' ORDER BY accessed_at').fetchall():
+        if total <= _state['max_bytes']:
+            break
+        evicted = conn.execute('DELETE FROM entries WHERE blob = ?',
+                               (blob,)).rowcount
+        _remove_blob_if_unused(blob)
+        total -= size
+        _stats['evictions'] += evicted
+    conn.commit()
+
+
+def clear():
+    """
+    Deletes every cached entry and body
+    """
+    if not is_enabled():
+        return
+    with _lock:
+        blobs = _state['conn'].execute(
+            'SELECT DISTINCT blob FROM entries').fetchall()
+        _state['conn'].execute('DELETE FROM entries')
+        _state['conn'].commit()
+        for (blob,) in blobs:
+            try:
+                os.remove(_blob_path(blob))
+            except OSError:
+                pass
+
+
+def get_stats():
+    """
+    Returns:
+        dict of hits, misses, expired, stores and evictions since the
+        process started (or reset_stats), plus entries and bytes on disk
+    """
+    res = dict(_stats)
+    res['entries'] = 0
+    res['bytes'] = 0
+    if is_enabled():
+        with _lock:
+            res['entries'] = _state['conn'].execute(
+                'SELECT COUNT(*) FROM entries').fetchone()[0]
+            res['bytes'] = _state['conn'].execute(
+                'SELECT COALESCE(SUM(size), 0) FROM (' + _BLOB_SIZES + ')'
+            ).fetchone()[0]
+    return res
+
+
+def reset_stats():
+    """
+    Zeroes the hit/miss counters
+    """
+    for k in _stats:
+        _stats[k] = 0
@@ -0,0 +1,559 @@
+"""
+http_utils.py
+
+a shared, pooled HTTP client for collegebaseball's scrapers
+"""
+import random
+import threading
+from contextlib import contextmanager
+from time import monotonic, sleep
+from urllib.parse import urlsplit
+from requests import Session, Response, HTTPError, RequestException
+from requests.adapters import HTTPAdapter
+from collegebaseball import http_cache, html_archive, instrumentation
+
+
+# GET request options
+_HEADERS = {'User-Agent': 'Mozilla/5.0'}
+# (connect, read) timeout in seconds applied to every request
+_TIMEOUT = (5, 30)
+# max number of keep-alive connections kept open per host
+_POOL_SIZE = 16
+
+_session = None
+_session_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {'requests': 0}
+# token buckets keyed by host, see set_rate_limit
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+# responses treated as the server asking us to slow down
+_THROTTLE_STATUSES = {403, 429, 500, 502, 503, 504}
+# retry and backoff policy, see set_retry_policy
+_MAX_RETRIES = 4
+_BACKOFF_BASE = 2.0
+_BACKOFF_MAX = 120.0
+# consecutive throttled responses before a host's circuit opens, and how
+# many seconds it stays open
+_CIRCUIT_THRESHOLD = 8
+_CIRCUIT_COOLDOWN = 300.0
+# successful requests needed before a host's concurrency goes back up by one
+_RAMP_UP_AFTER = 20
+# adaptive concurrency guards keyed by host, see set_max_concurrency
+_guards = {}
+_guards_lock = threading.Lock()
+# base URLs that requests for a host are redirected to, see
+# set_host_override
+_host_overrides = {}
+
+
+class ThrottledError(HTTPError):
+    """
+    Raised when a host keeps answering 403/429/5xx (or the request keeps
+    failing) after every retry
+    """
+
+
+class CircuitOpenError(ThrottledError):
+    """
+    Raised without sending when a host's circuit breaker is open
+    """
+
+
+class _TokenBucket:
+    """
+    A thread-safe token bucket. Callers that find the bucket empty reserve
+    the next token and sleep until it is due, so waiting threads are
+    released in order at the configured rate.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._last = monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = monotonic()
+            self._tokens = min(self.burst,
+                               self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            sleep(wait)
+
+
+class _HostGuard:
+    """
+    Limits in-flight requests to one host. The limit is halved on a
+    throttled response and raised by one after every _RAMP_UP_AFTER
+    successes, back up to max_concurrency. After _CIRCUIT_THRESHOLD
+    throttled responses in a row the circuit opens and requests fail fast
+    for _CIRCUIT_COOLDOWN seconds; after that a single further failure
+    reopens it.
+    """
+
+    def __init__(self, max_concurrency):
+        self.max_concurrency = max(int(max_concurrency), 1)
+        self.limit = self.max_concurrency
+        self.active = 0
+        self.failures = 0
+        self.successes = 0
+        self.open_until = 0.0
+        self._last_cut = 0.0
+        self._cond = threading.Condition()
+
+    def is_open(self):
+        return monotonic() < self.open_until
+
+    def acquire(self, host):
+        with self._cond:
+            while True:
+                if self.is_open():
+                    raise CircuitOpenError(
+                        'circuit open for '+host+', retry in ' +
+                        str(round(self.open_until - monotonic()))+'s')
+                if self.active < self.limit:
+                    self.active += 1
+                    return monotonic()
+                self._cond.wait(1.0)
+
+    def release(self, ok, started):
+        with self._cond:
+            self.active -= 1
+            if ok:
+                self.failures = 0
+                self.successes += 1
+                if self.successes >= _RAMP_UP_AFTER and \
+                        self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self.successes = 0
+            else:
+                now = monotonic()
+                self.successes = 0
+                self.failures += 1
+                # requests sent before the last cut saw the old limit, so
+                # their failures don't cut it again
+                if started >= self._last_cut:
+                    self.limit = max(self.limit // 2, 1)
+                    self._last_cut = now
+                if self.failures >= _CIRCUIT_THRESHOLD:
+                    self.open_until = now + _CIRCUIT_COOLDOWN
+                    self.failures = _CIRCUIT_THRESHOLD - 1
+            self._cond.notify_all()
+
+
+def _get_guard(host):
+    guard = _guards.get(host)
+    if guard is None:
+        with _guards_lock:
+            guard = _guards.setdefault(host, _HostGuard(_POOL_SIZE))
+    return guard
+
+
+def _new_session(pool_size=_POOL_SIZE):
+    """
+    A helper function to build a keep-alive Session with a connection pool
+    large enough for pool_size concurrent requests per host
+    """
+    s = Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    s.mount('http://', adapter)
+    s.mount('https://', adapter)
+    s.headers.update(_HEADERS)
+    return s
+
+
+def get_session():
+    """
+    Returns:
+        the module-level requests.Session shared by every scraper call,
+        created on first use
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _new_session()
+    return _session
+
+
+def set_session(session=None):
+    """
+    Replaces the shared session, e.g. with one carrying its own adapters,
+    proxies or auth. Passing None closes the current session and goes back
+    to the default on next use.
+
+    Args:
+        session (requests.Session, optional)
+    """
+    global _session
+    with _session_lock:
+        old = _session
+        _session = session
+    if old is not None and old is not session:
+        old.close()
+
+
+def configure(timeout=None, pool_size=None, headers=None):
+    """
+    Adjusts the shared client. Changing pool_size rebuilds the session.
+
+    Args:
+        timeout (float or (connect, read) tuple, optional): per-request
+         timeout in seconds
+        pool_size (int, optional): keep-alive connections kept per host
+        headers (dict, optional): headers sent with every request
+    """
+    global _TIMEOUT, _POOL_SIZE
+    if timeout is not None:
+        _TIMEOUT = timeout
+    if headers is not None:
+        _HEADERS.update(headers)
+        if _session is not None:
+            _session.headers.update(headers)
+    if pool_size is not None:
+        _POOL_SIZE = int(pool_size)
+        set_session(_new_session(_POOL_SIZE))
+
+
+def set_rate_limit(host, requests_per_second, burst=1):
+    """
+    Throttles every request to a host with a token bucket, shared by all
+    threads in the process
+
+    Args:
+        host (str): e.g. 'stats.ncaa.org'
+        requests_per_second (float): sustained rate. None removes the limit
+        burst (int, optional): requests allowed back-to-back after idling
+    """
+    with _limiters_lock:
+        if requests_per_second is None:
+            _limiters.pop(host, None)
+        else:
+            _limiters[host] = _TokenBucket(requests_per_second, burst)
+
+
+def set_host_override(host, base_url=None):
+    """
+    Sends every request for host to base_url/host/path instead, e.g. to a
+    replay.ReplayServer. Caching, archiving, rate limits and throttling
+    still go by the original URL.
+
+    Args:
+        host (str): e.g. 'stats.ncaa.org'
+        base_url (str, optional): e.g. 'http://127.0.0.1:8765'. None
+         removes the override
+    """
+    if base_url is None:
+        _host_overrides.pop(host, None)
+    else:
+        _host_overrides[host] = base_url.rstrip('/')
+
+
+def _send_url(url, host):
+    """
+    A helper function to apply a host override to url
+    """
+    base_url = _host_overrides.get(host)
+    if base_url is None:
+        return url
+    parts = urlsplit(url)
+    res = base_url + '/' + host + parts.path
+    if parts.query:
+        res += '?' + parts.query
+    return res
+
+
+def set_max_concurrency(host, max_concurrency):
+    """
+    Caps the number of requests in flight to a host. The cap is what the
+    adaptive limit ramps back up to after being halved by throttling.
+
+    Args:
+        host (str): e.g. 'stats.ncaa.org'
+        max_concurrency (int)
+    """
+    guard = _get_guard(host)
+    with guard._cond:
+        guard.max_concurrency = max(int(max_concurrency), 1)
+        guard.limit = min(guard.limit, guard.max_concurrency) \
+            if guard.failures else guard.max_concurrency
+        guard._cond.notify_all()
+
+
+@contextmanager
+def host_limits(host, requests_per_second, max_concurrency=None):
+    """
+    Applies set_rate_limit (and set_max_concurrency) to a host inside a
+    with block, then puts back the host's previous limiter and cap, so a
+    bulk job's limits don't outlive it
+
+    Args:
+        host (str): e.g. 'stats.ncaa.org'
+        requests_per_second (float): sustained rate. None removes the limit
+        max_concurrency (int, optional): leaves the cap as is if None
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+    guard = _get_guard(host)
+    with guard._cond:
+        cap = guard.max_concurrency
+    set_rate_limit(host, requests_per_second)
+    if max_concurrency is not None:
+        set_max_concurrency(host, max_concurrency)
+    try:
+        yield
+    finally:
+        with _limiters_lock:
+            if limiter is None:
+                _limiters.pop(host, None)
+            else:
+                _limiters[host] = limiter
+        set_max_concurrency(host, cap)
+
+def set_retry_policy(max_retries=None, backoff_base=None, backoff_max=None,
+                     circuit_threshold=None, circuit_cooldown=None):
+    """
+    Adjusts how throttled requests are retried
+
+    Args:
+        max_retries (int, optional): retries after the first attempt
+        backoff_base (float, optional): seconds before the first retry,
+         doubled on each one
+        backoff_max (float, optional): cap on any single wait
+        circuit_threshold (int, optional): throttled responses in a row that
+         open a host's circuit
+        circuit_cooldown (float, optional): seconds a circuit stays open
+    """
+    global _MAX_RETRIES, _BACKOFF_BASE, _BACKOFF_MAX, _CIRCUIT_THRESHOLD, \
+        _CIRCUIT_COOLDOWN
+    if max_retries is not None:
+        _MAX_RETRIES = int(max_retries)
+    if backoff_base is not None:
+        _BACKOFF_BASE = float(backoff_base)
+    if backoff_max is not None:
+        _BACKOFF_MAX = float(backoff_max)
+    if circuit_threshold is not None:
+        _CIRCUIT_THRESHOLD = int(circuit_threshold)
+    if circuit_cooldown is not None:
+        _CIRCUIT_COOLDOWN = float(circuit_cooldown)
+
+
+def get_host_state(host):
+    """
+    Returns:
+        dict of the host's current concurrency limit, its cap, requests in
+        flight, consecutive failures and seconds until its circuit closes
+    """
+    guard = _get_guard(host)
+    with guard._cond:
+        return {'limit': guard.limit,
+                'max_concurrency': guard.max_concurrency,
+                'active': guard.active,
+                'consecutive_failures': guard.failures,
+                'circuit_open_for': max(guard.open_until - monotonic(), 0)}
+
+
+def wait_for_circuit(host):
+    """
+    Blocks until the host's circuit breaker (if open) closes
+    """
+    wait = _get_guard(host).open_until - monotonic()
+    if wait > 0:
+        sleep(wait)
+
+
+def _backoff(attempt):
+    """
+    A helper function giving the jittered exponential wait before retry
+    number attempt (0-based): half the capped delay plus a random share of
+    the other half
+    """
+    delay = min(_BACKOFF_MAX, _BACKOFF_BASE * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def enable_cache(path=None, max_bytes=None, current_season_ttl_hours=None,
+                 current_season=None):
+    """
+    Turns on the persistent response cache for every scraper request, see
+    http_cache.configure for the arguments
+    """
+    http_cache.configure(path=path, max_bytes=max_bytes,
+                         current_season_ttl_hours=current_season_ttl_hours,
+                         current_season=current_season)
+
+
+def disable_cache():
+    """
+    Turns off the persistent response cache, leaving its entries on disk
+    """
+    http_cache.close()
+
+
+def enable_archive(path=None):
+    """
+    Appends every page fetched, from the network or the response cache, to
+    the raw HTML archive, see html_archive.configure
+    """
+    html_archive.configure(path=path)
+
+
+def disable_archive():
+    """
+    Stops archiving fetched pages, leaving the archive on disk
+    """
+    html_archive.close()
+
+
+def _cached_response(url, body, encoding):
+    """
+    A helper function to wrap a cached body in a requests.Response
+    """
+    r = Response()
+    r.status_code = 200
+    r._content = body
+    r.encoding = encoding
+    r.url = url
+    return r
+
+
+def _archive(url, params, r):
+    """
+    A helper function to append a response, from the network or the
+    response cache, to the raw HTML archive when it is enabled
+    """
+    if html_archive.is_enabled():
+        html_archive.append(url, params, r.content,
+                            r.encoding or r.apparent_encoding, r.status_code)
+
+
+def get(url, params=None, headers=None, timeout=None, session=None,
+        use_cache=True):
+    """
+    Sends a GET request through the shared, keep-alive session, answering
+    from the response cache when it is enabled and holds a fresh copy.
+    With the raw HTML archive enabled, every response is archived, cache
+    hits included.
+    403/429/5xx responses and request errors (connection errors, timeouts,
+    broken or undecodable bodies, etc.) are retried with jittered
+    exponential backoff while the host's concurrency is cut back.
+
+    Args:
+        url (str)
+        params (dict, optional): query string parameters
+        headers (dict, optional): extra headers for this request only
+        timeout (optional): overrides the configured timeout
+        session (requests.Session, optional): send through this session
+         instead of the shared one
+        use_cache (bool, optional): whether to read and write the response
+         cache. Defaults to True
+
+    Returns:
+        requests.Response
+
+    Raises:
+        ThrottledError: if every attempt was throttled or failed
+        CircuitOpenError: if the host's circuit breaker is open
+    """
+    endpoint = instrumentation.endpoint_of(url)
+    use_cache = use_cache and http_cache.is_enabled()
+    if use_cache:
+        cached = http_cache.get(url, params)
+        if cached is not None:
+            instrumentation.increment('cache_hits_total', endpoint=endpoint)
+            r = _cached_response(url, *cached)
+            _archive(url, params, r)
+            return r
+    host = urlsplit(url).hostname
+    guard = _get_guard(host)
+    s = session if session is not None else get_session()
+    for attempt in range(_MAX_RETRIES + 1):
+        if attempt > 0:
+            instrumentation.increment('retries_total', endpoint=endpoint)
+        try:
+            started = guard.acquire(host)
+        except CircuitOpenError:
+            instrumentation.increment('circuit_open_total', endpoint=endpoint)
+            raise
+        ok = False
+        error = None
+        status = 'error'
+        try:
+            limiter = _limiters.get(host)
+            if limiter is not None:
+                limiter.acquire()
+            sent = monotonic()
+            r = s.get(_send_url(url, host), params=params, headers=headers,
+                      timeout=_TIMEOUT if timeout is None else timeout)
+            instrumentation.observe('request_seconds', monotonic() - sent,
+                                    endpoint=endpoint)
+            instrumentation.observe('response_bytes', len(r.content),
+                                    endpoint=endpoint)
+            status = r.status_code
+            with _stats_lock:
+                _stats['requests'] += 1
+            ok = r.status_code not in _THROTTLE_STATUSES
+            error = None if ok else ThrottledError(
+                str(r.status_code)+' response from '+host, response=r)
+        except RequestException as e:
+            error = e
+        finally:
+            guard.release(ok, started)
+            instrumentation.increment('requests_total', endpoint=endpoint,
+                                      status=status)
+        if ok:
+            if use_cache and r.status_code == 200:
+                http_cache.put(url, params, r.content, r.encoding)
+            _archive(url, params, r)
+            return r
+        if attempt < _MAX_RETRIES:
+            sleep(_backoff(attempt))
+    if isinstance(error, ThrottledError):
+        raise error
+    raise ThrottledError('no response from '+host+' after ' +
+                         str(_MAX_RETRIES + 1)+' attempts') from error
+
+
+def get_connection_stats():
+    """
+    Reports how well the shared session is reusing connections
+
+    Returns:
+        dict with requests (sent through get), connections_opened
+        (new TCP/TLS connections in the live pools), connections_reused
+        and hosts (per-host opened/requests counts)
+    """
+    hosts = {}
+    s = _session
+    if s is not None:
+        for adapter in set(s.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                host = f'{pool.scheme}://{pool.host}'
+                opened, sent = hosts.get(host, (0, 0))
+                hosts[host] = (opened + pool.num_connections,
+                               sent + pool.num_requests)
+    opened = sum(i[0] for i in hosts.values())
+    sent = sum(i[1] for i in hosts.values())
+    return {'requests': _stats['requests'],
+            'connections_opened': opened,
+            'connections_reused': max(sent - opened, 0),
+            'hosts': {k: {'connections_opened': v[0], 'requests': v[1]}
+                      for k, v in hosts.items()}}
+
+
+def reset_connection_stats():
+    """
+    Zeroes the request counter. Pool counters reset with the session.
+    """
+    with _stats_lock:
+        _stats['requests'] = 0
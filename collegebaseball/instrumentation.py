@@ -0,0 +1,243 @@
+"""
+instrumentation.py
+
+counters and histograms for the scraper layer, by endpoint
+
+http_utils records request latency, response bytes, status codes,
+retries and cache hits; the scrapers' parsers record parse time, rows
+produced and empty results. Everything can be exported as a JSON snapshot
+or in the Prometheus text format.
+"""
+import json
+import re
+import threading
+from bisect import bisect_left
+from functools import wraps
+from time import perf_counter
+
+
+_PREFIX = 'collegebaseball_'
+
+# url patterns, checked in order, that name the endpoint a request is for
+_ENDPOINTS = [
+    ('team_stats', re.compile(r'stats\.ncaa\.org/team/\d+/stats')),
+    ('roster', re.compile(r'stats\.ncaa\.org/team/\d+/roster/\d+')),
+    ('game_by_game', re.compile(r'stats\.ncaa\.org/player/game_by_game')),
+    ('player_index', re.compile(r'stats\.ncaa\.org/player/index')),
+    ('boydsworld', re.compile(r'boydsworld\.com/')),
+]
+
+_HELP = {
+    'requests_total': 'HTTP responses (or errors) by status',
+    'retries_total': 'requests retried after a throttled response or error',
+    'cache_hits_total': 'requests answered from the response cache',
+    'circuit_open_total': 'requests refused by an open circuit breaker',
+    'parses_total': 'pages parsed',
+    'empty_results_total': 'pages that parsed to no rows',
+    'pipeline_pages_total': 'pages through a bulk download pipeline, by '
+                            'stage',
+    'pipeline_seconds_total': 'wall seconds fetching, and parser CPU '
+                              'seconds, in bulk download pipelines',
+    'request_seconds': 'request latency, excluding rate-limit waits',
+    'response_bytes': 'response body size',
+    'parse_seconds': 'time spent parsing a page into a DataFrame',
+    'rows': 'rows produced per parsed page',
+}
+
+# histogram bucket upper bounds
+_BUCKETS = {
+    'request_seconds': (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+    'response_bytes': (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 5e6),
+    'parse_seconds': (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+    'rows': (0, 1, 5, 10, 25, 50, 100, 250, 1000),
+}
+
+_lock = threading.Lock()
+# (name, labels) -> value, labels a sorted tuple of (key, value)
+_counters = {}
+# (name, labels) -> [per-bucket counts (last is +Inf), sum, count]
+_histograms = {}
+
+
+def endpoint_of(url):
+    """
+    Returns:
+        the endpoint name for url: 'team_stats', 'roster', 'game_by_game',
+        'player_index', 'boydsworld', or 'other'
+    """
+    for name, pattern in _ENDPOINTS:
+        if pattern.search(url):
+            return name
+    return 'other'
+
+
+def _labels(labels):
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items()))
+
+
+def increment(name, value=1, **labels):
+    """
+    Adds value to the counter name with the given labels
+    """
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    """
+    Records value in the histogram name with the given labels
+    """
+    key = (name, _labels(labels))
+    buckets = _BUCKETS[name]
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+        hist[0][bisect_left(buckets, value)] += 1
+        hist[1] += value
+        hist[2] += 1
+
+
+def instrument_parse(endpoint):
+    """
+    A decorator for the scrapers' parse helpers, recording parse time,
+    rows produced and empty results for endpoint
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            res = func(*args, **kwargs)
+            labels = {'endpoint': endpoint, 'parser': func.__name__}
+            observe('parse_seconds', perf_counter() - start, **labels)
+            increment('parses_total', **labels)
+            if hasattr(res, 'shape'):
+                observe('rows', len(res), **labels)
+                if len(res) == 0:
+                    increment('empty_results_total', **labels)
+            return res
+        return wrapper
+    return decorator
+
+
+def reset():
+    """
+    Zeroes every counter and histogram
+    """
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _raw():
+    """
+    A helper function to copy the registry, e.g. to send it back from a
+    parser process
+    """
+    with _lock:
+        return (dict(_counters),
+                {k: [list(v[0]), v[1], v[2]] for k, v in _histograms.items()})
+
+
+def _merge(raw):
+    """
+    A helper function to add a registry copied with _raw into this one
+    """
+    counters, histograms = raw
+    with _lock:
+        for key, value in counters.items():
+            _counters[key] = _counters.get(key, 0) + value
+        for key, (counts, total, count) in histograms.items():
+            hist = _histograms.get(key)
+            if hist is None:
+                _histograms[key] = [list(counts), total, count]
+                continue
+            hist[0] = [a + b for a, b in zip(hist[0], counts)]
+            hist[1] += total
+            hist[2] += count
+
+
+def snapshot():
+    """
+    Returns:
+        dict of counters and histograms, each a list of dicts with name,
+        labels and either value, or sum, count and cumulative buckets
+    """
+    counters, histograms = _raw()
+    res = {'counters': [], 'histograms': []}
+    for (name, labels), value in sorted(counters.items()):
+        res['counters'].append({'name': name, 'labels': dict(labels),
+                                'value': value})
+    for (name, labels), (counts, total, count) in sorted(histograms.items()):
+        cumulative = 0
+        buckets = {}
+        for bound, n in zip(list(_BUCKETS[name]) + ['+Inf'], counts):
+            cumulative += n
+            buckets[str(bound)] = cumulative
+        res['histograms'].append({'name': name, 'labels': dict(labels),
+                                  'sum': total, 'count': count,
+                                  'buckets': buckets})
+    return res
+
+
+def to_json(path=None):
+    """
+    Exports snapshot() as JSON
+
+    Args:
+        path (str, optional): file to write as well
+
+    Returns:
+        str
+    """
+    res = json.dumps(snapshot(), indent=2)
+    if path is not None:
+        with open(path, 'w') as f:
+            f.write(res)
+    return res
+
+
+def _prometheus_labels(labels, extra=None):
+    labels = dict(labels)
+    if extra is not None:
+        labels.update(extra)
+    if len(labels) == 0:
+        return ''
+    return '{' + ','.join(
+        k + '="' + str(v).replace('\\', '\\\\').replace('"', '\\"') + '"'
+        for k, v in labels.items()) + '}'
+
+
+def to_prometheus():
+    """
+    Exports the counters and histograms in the Prometheus text format
+
+    Returns:
+        str
+    """
+    snap = snapshot()
+    lines = []
+    seen = set()
+    for counter in snap['counters']:
+        name = _PREFIX + counter['name']
+        if name not in seen:
+            seen.add(name)
+            lines.append('# HELP ' + name + ' ' + _HELP[counter['name']])
+            lines.append('# TYPE ' + name + ' counter')
+        lines.append(name + _prometheus_labels(counter['labels']) + ' ' +
+                     repr(float(counter['value'])))
+    for hist in snap['histograms']:
+        name = _PREFIX + hist['name']
+        if name not in seen:
+            seen.add(name)
+            lines.append('# HELP ' + name + ' ' + _HELP[hist['name']])
+            lines.append('# TYPE ' + name + ' histogram')
+        for bound, count in hist['buckets'].items():
+            lines.append(name + '_bucket' + _prometheus_labels(
+                hist['labels'], {'le': bound}) + ' ' + str(count))
+        lines.append(name + '_sum' + _prometheus_labels(hist['labels']) +
+                     ' ' + repr(float(hist['sum'])))
+        lines.append(name + '_count' + _prometheus_labels(hist['labels']) +
+                     ' ' + str(hist['count']))
+    return '\n'.join(lines) + '\n'
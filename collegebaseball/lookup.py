@@ -5,10 +5,163 @@ lookup functions for collegebaseball
 
 created by Nathan Blumenfeld in Summer 2022
 """
-
+import os
+from time import monotonic
+import pandas as pd
 from collegebaseball import guts
 
 
+# per-process lookup indexes built from collegebaseball's internal data
+# each entry holds the backing file's path and mtime plus a dict of
+# hash maps, and is rebuilt whenever the file's mtime changes
+_indexes = {}
+
+# minimum number of seconds between mtime checks of an index's data file
+_MTIME_CHECK_INTERVAL = 1.0
+
+
+def _build_schools_index(df):
+    """
+    hash maps keyed by school_id, ncaa_name and bd_name
+    """
+    by_school_id = {}
+    by_ncaa_name = {}
+    by_bd_name = {}
+    for i, n, b, d in zip(df.school_id, df.ncaa_name, df.bd_name,
+                          df.division):
+        by_school_id.setdefault(int(i), (str(n), int(d)))
+        by_ncaa_name.setdefault(n, (int(i), int(d)))
+        if b is not None and b == b:
+            by_bd_name.setdefault(b, (int(i), int(d)))
+    school_id_frame = pd.DataFrame(
+        {'school': pd.array([i[0] for i in by_school_id.values()],
+                            dtype='string'),
+         'division': pd.array([i[1] for i in by_school_id.values()],
+                              dtype='Int8')},
+        index=pd.Index(list(by_school_id.keys()), name='school_id'))
+    return {'school_id': by_school_id, 'ncaa_name': by_ncaa_name,
+            'bd_name': by_bd_name, 'school_id_frame': school_id_frame}
+
+
+def _build_seasons_index(df):
+    """
+    hash maps keyed by season and season_id
+    """
+    by_season = {}
+    by_season_id = {}
+    for row in df.itertuples(index=False):
+        by_season.setdefault(int(row.season), (
+            int(row.season_id), int(row.batting_id), int(row.pitching_id),
+            int(row.fielding_id)))
+        by_season_id.setdefault(int(row.season_id), (
+            int(row.season), int(row.batting_id), int(row.pitching_id),
+            int(row.fielding_id)))
+    season_frame = pd.DataFrame(
+        list(by_season.values()),
+        columns=['season_id', 'batting_id', 'pitching_id', 'fielding_id'],
+        index=pd.Index(list(by_season.keys()), name='season'),
+        dtype='Int32')
+    return {'season': by_season, 'season_id': by_season_id,
+            'season_frame': season_frame}
+
+
+def _build_players_history_index(df):
+    """
+    hash map keyed by stats_player_seq
+    """
+    res = {}
+    for i, debut, last in zip(df.stats_player_seq, df.debut_season,
+                              df.season_last):
+        res.setdefault(int(i), (int(debut), int(last)))
+    return {'stats_player_seq': res}
+
+
+def _build_player_lu_index(df):
+    """
+    hash map keyed by (name, school)
+    """
+    res = {}
+    for i, name, school in zip(df.stats_player_seq, df.name, df.school):
+        res.setdefault((name, school), int(i))
+    return {'name_school': res}
+
+
+def _build_rosters_index(df):
+    """
+    hash map keyed by (stats_player_seq, season)
+    """
+    res = {}
+    for i, season, name, school, school_id in zip(
+            df.stats_player_seq, df.season, df.name, df.school,
+            df.school_id):
+        res.setdefault((int(i), int(season)),
+                       (str(name), str(school), int(school_id)))
+    frame = pd.DataFrame(
+        {'name': pd.array([i[0] for i in res.values()], dtype='string'),
+         'school': pd.array([i[1] for i in res.values()], dtype='string'),
+         'school_id': pd.array([i[2] for i in res.values()],
+                               dtype='Int32')},
+        index=pd.MultiIndex.from_tuples(
+            list(res.keys()), names=['stats_player_seq', 'season']))
+    return {'stats_player_seq_season': res,
+            'stats_player_seq_season_frame': frame}
+
+
+_INDEX_SOURCES = {
+    'schools': (guts.get_schools_path, guts.get_schools_table,
+                _build_schools_index),
+    'seasons': (guts.get_seasons_path, guts.get_seasons_table,
+                _build_seasons_index),
+    'players_history': (guts.get_players_history_path,
+                        guts.get_players_history_table,
+                        _build_players_history_index),
+    'player_lu': (guts.get_player_lu_path, guts.get_player_lu_table,
+                  _build_player_lu_index),
+    'rosters': (guts.get_rosters_path, guts.get_rosters_table,
+                _build_rosters_index)
+}
+
+
+def _get_index(name):
+    """
+    A helper function to return the lookup index for a given table,
+    (re)building it if it is missing or its data file has changed
+
+    Args:
+        name (str): 'schools', 'seasons', 'players_history', 'player_lu',
+         or 'rosters'
+
+    Returns:
+        dict of hash maps for the table
+    """
+    entry = _indexes.get(name)
+    if entry is not None:
+        now = monotonic()
+        if now - entry['checked'] < _MTIME_CHECK_INTERVAL:
+            return entry['index']
+        try:
+            mtime = os.stat(entry['path']).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == entry['mtime']:
+            entry['checked'] = now
+            return entry['index']
+    get_path, get_table, build = _INDEX_SOURCES[name]
+    path = get_path()
+    mtime = os.stat(path).st_mtime_ns
+    index = build(get_table())
+    _indexes[name] = {'path': path, 'mtime': mtime, 'checked': monotonic(),
+                      'index': index}
+    return index
+
+
+def clear_lookup_cache():
+    """
+    Drops every in-process lookup index, forcing a rebuild on next use
+    """
+    _indexes.clear()
+
+
 def lookup_season_ids(season):
     """
     A function that finds the year_stat_category_ids of a given season
@@ -17,13 +170,7 @@ def lookup_season_ids(season):
     Returns:
         tuple of (season_id, batting_id, pitching_id) for desired season
     """
-    df = guts.get_seasons_table()
-    season_row = df.loc[df['season'] == season]
-    season_id = season_row.values[0][1]
-    batting_id = season_row.values[0][2]
-    pitching_id = season_row.values[0][3]
-    fielding_id = season_row.values[0][4]
-    return int(season_id), int(batting_id), int(pitching_id), int(fielding_id)
+    return _get_index('seasons')['season'][int(season)]
 
 
 def lookup_season_reverse(season_id):
@@ -34,13 +181,7 @@ def lookup_season_reverse(season_id):
     Returns:
         tuple of (season_id, batting_id, pitching_id) for desired season
     """
-    df = guts.get_seasons_table()
-    season_row = df.loc[df['season_id'] == season_id]
-    season = season_row['season'].values[0]
-    batting_id = season_row['batting_id'].values[0]
-    pitching_id = season_row['pitching_id'].values[0]
-    fielding_id = season_row['fielding_id'].values[0]
-    return int(season), int(batting_id), int(pitching_id), int(fielding_id)
+    return _get_index('seasons')['season_id'][int(season_id)]
 
 
 def lookup_season_id(season):
@@ -53,10 +194,7 @@ def lookup_season_id(season):
     Returns:
         season_id as an int
     """
-    df = guts.get_seasons_table()
-    season_row = df.loc[df['season'] == season]
-    season_id = season_row.values[0][1]
-    return int(season_id)
+    return _get_index('seasons')['season'][int(season)][0]
 
 
 def lookup_season_id_reverse(season_id):
@@ -69,10 +207,7 @@ def lookup_season_id_reverse(season_id):
     Returns:
         season_id as an int
     """
-    df = guts.get_seasons_table()
-    season_row = df.loc[df['season_id'] == season_id]
-    season = season_row.values[0][0]
-    return int(season)
+    return _get_index('seasons')['season_id'][int(season_id)][0]
 
 
 def lookup_seasons_played(stats_player_seq):
@@ -85,9 +220,8 @@ def lookup_seasons_played(stats_player_seq):
     Returns:
         tuple of ints: (debut season, most recent season)
     """
-    df = guts.get_players_history_table()
-    row = df.loc[df.stats_player_seq == stats_player_seq]
-    return int(row['debut_season'].values[0]), int(row['season_last'].values[0])
+    return _get_index('players_history')['stats_player_seq'][
+        int(stats_player_seq)]
 
 
 def lookup_school(school_name):
@@ -104,14 +238,14 @@ def lookup_school(school_name):
         lookup_school("cornell")
         >>> 167, 1
     """
-    df = guts.get_schools_table()
-    school_row = df.loc[(df.ncaa_name == school_name)]
-    if len(school_row) == 0:
-        school_row = df.loc[(df.bd_name == school_name)]
-    if len(school_row) == 0:
+    index = _get_index('schools')
+    res = index['ncaa_name'].get(school_name)
+    if res is None:
+        res = index['bd_name'].get(school_name)
+    if res is None:
         return f'''could not find school {school_name}'''
     else:
-        return int(school_row['school_id'].values[0]), int(school_row['division'].values[0])
+        return res
 
 
 def lookup_school_reverse(school_id):
@@ -128,13 +262,11 @@ def lookup_school_reverse(school_id):
         lookup_school_reverse(167)
         >>> "Cornell", 1
     """
-    df = guts.get_schools_table()
-    school_row = df.loc[(
-        df.school_id == school_id)]
-    if len(school_row) == 0:
+    res = _get_index('schools')['school_id'].get(school_id)
+    if res is None:
         return f'''could not find school {school_id}'''
     else:
-        return str(school_row['ncaa_name'].values[0]), int(school_row['division'].values[0])
+        return res
 
 
 def lookup_player(player_name, school):
@@ -152,15 +284,12 @@ def lookup_player(player_name, school):
         lookup_player("Jake Gelof", "Virginia")
         >>> 2486499
     """
-    df = guts.get_player_lu_table()
-    player_row = df.loc[
-        df.name == player_name.title(
-        )]
-    player_row = player_row.loc[player_row.school == school]
-    if len(player_row) == 0:
+    res = _get_index('player_lu')['name_school'].get(
+        (player_name.title(), school))
+    if res is None:
         return f'''could not find player {player_name}'''
     else:
-        return int(player_row['stats_player_seq'].values[0])
+        return res
 
 
 def lookup_player_reverse(player_id, season):
@@ -175,13 +304,88 @@ def lookup_player_reverse(player_id, season):
         player_name (str), school_name (str), school_id (int)
 
     """
-    df = guts.get_rosters_table()
-    row = df.loc[(df.stats_player_seq == player_id)
-                 & (df.season == season)]
-    if len(row) == 0:
+    res = _get_index('rosters')['stats_player_seq_season'].get(
+        (player_id, season))
+    if res is None:
         return f'''could not find player {player_id}'''
     else:
-        return str(row['name'].values[0]), str(row['school'].values[0]), int(row['school_id'].values[0])
+        return res
+
+
+def _probe(frame, keys, index):
+    """
+    A helper function to look up many keys against an indexed frame at once
+
+    Args:
+        frame (DataFrame): lookup table indexed by its key(s)
+        keys (Index or MultiIndex): the keys to look up
+        index: the index to give the result, aligned to the input
+
+    Returns:
+        DataFrame with one row per key, null where the key was not found
+    """
+    res = frame.reindex(keys)
+    res.index = index
+    return res
+
+
+def lookup_schools_bulk(school_ids):
+    """
+    A function to find the names and divisions of many schools at once
+
+    Args:
+        school_ids (Series or array-like of ints): NCAA school_ids
+
+    Returns:
+        DataFrame aligned to school_ids with columns school (string) and
+        division (Int8), null where the school_id could not be found
+
+    Examples:
+        lookup_schools_bulk(games.opponent_id)['school'].isna()
+    """
+    school_ids = pd.Series(school_ids)
+    frame = _get_index('schools')['school_id_frame']
+    return _probe(frame, pd.Index(school_ids), school_ids.index)
+
+
+def lookup_season_ids_bulk(seasons):
+    """
+    A function that finds the year_stat_category_ids of many seasons at once
+
+    Args:
+        seasons (Series or array-like of ints, YYYY)
+
+    Returns:
+        DataFrame aligned to seasons with columns season_id, batting_id,
+        pitching_id and fielding_id (Int32), null where the season could
+        not be found
+    """
+    seasons = pd.Series(seasons)
+    frame = _get_index('seasons')['season_frame']
+    return _probe(frame, pd.Index(seasons), seasons.index)
+
+
+def lookup_players_bulk(player_ids, seasons):
+    """
+    A function to find the names and schools of many players at once
+
+    Args:
+        player_ids (Series or array-like of ints): NCAA stats_player_seqs
+        seasons (int, YYYY, or Series or array-like of ints aligned to
+         player_ids)
+
+    Returns:
+        DataFrame aligned to player_ids with columns name (string),
+        school (string) and school_id (Int32), null where the player could
+        not be found in the given season
+    """
+    player_ids = pd.Series(player_ids)
+    if pd.api.types.is_scalar(seasons):
+        seasons = [seasons] * len(player_ids)
+    keys = pd.MultiIndex.from_arrays([player_ids.values,
+                                      pd.Series(seasons).values])
+    frame = _get_index('rosters')['stats_player_seq_season_frame']
+    return _probe(frame, keys, player_ids.index)
 
 
 def _lookup_school_info(x):
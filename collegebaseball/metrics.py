@@ -8,60 +8,71 @@ created by Nathan Blumenfeld in Spring 2022
 """
 from collegebaseball import guts
 import numpy as np
+import pandas as pd
 
 
 # number of decimal places to round floats to
 ROUND_TO = 3
 
 
-def _calculate_pa(row):
+def _get_season_weights(df):
     """
+    Joins the linear weights of each row's (season, division) onto a
+    DataFrame in a single pass
+
+    Args:
+        df(DataFrame): must contain season and division columns
+
     Returns:
-        The number of plate appearances by a player as an int
+        DataFrame of linear weights aligned to the index of df
+    """
+    weights = guts.get_linear_weights_table()
+    weights = weights.set_index(['season', 'division'])
+    keys = pd.MultiIndex.from_arrays([df['season'].astype('int64'),
+                                      df['division'].astype('int64')])
+    res = weights.reindex(keys)
+    res.index = df.index
+    return res
+
+
+def _calculate_pa(df):
+    """
+    Returns:
+        The number of plate appearances by each player as a Series
         based on the following formula:
 
         PA = AB + BB + SF + SH + HBP - IBB
 
     """
-    PA = (row['AB'] + row['BB'] + row['SF'] + row['SH'] + row['HBP']
-          - row['IBB'])
-    return PA
+    PA = (df['AB'] + df['BB'] + df['SF'] + df['SH'] + df['HBP']
+          - df['IBB'])
+    return PA.astype('int64')
 
 
-def _calculate_woba(row):
+def _calculate_woba(df, season_weights):
     """
     """
-    if row['PA'] > 0:
-        season_weights = guts.get_season_linear_weights(
-            row['season'], row['division'])
-        numerator = (season_weights['wBB'].values[0] * row['BB']
-                     + season_weights['wHBP'].values[0] * row['HBP']
-                     + season_weights['w1B'].values[0] * row['1B']
-                     + season_weights['w2B'].values[0] * row['2B']
-                     + season_weights['w3B'].values[0] * row['3B']
-                     + season_weights['wHR'].values[0] * row['HR'])
-        denominator = row['PA']
-        return round(numerator / denominator, ROUND_TO)
-    else:
-        return 0.00
+    numerator = (season_weights['wBB'] * df['BB']
+                 + season_weights['wHBP'] * df['HBP']
+                 + season_weights['w1B'] * df['1B']
+                 + season_weights['w2B'] * df['2B']
+                 + season_weights['w3B'] * df['3B']
+                 + season_weights['wHR'] * df['HR'])
+    res = (numerator / df['PA']).round(ROUND_TO)
+    return res.where(df['PA'] > 0, 0.00)
 
 
-def _calculate_woba_against(row):
+def _calculate_woba_against(df, season_weights):
     """
     """
-    if row['BF'] > 0:
-        season_weights = guts.get_season_linear_weights(
-            row['season'], row['division'])
-        numerator = (season_weights['wBB'].values[0] * row['BB']
-                     + season_weights['wHBP'].values[0] * row['HB']
-                     + season_weights['w1B'].values[0] * row['1B-A']
-                     + season_weights['w2B'].values[0] * row['2B-A']
-                     + season_weights['w3B'].values[0] * row['3B-A']
-                     + season_weights['wHR'].values[0] * row['HR-A'])
-        denominator = row['BF']
-        return round(numerator / denominator, ROUND_TO)
-    else:
-        return 0.00
+    numerator = (season_weights['wBB'] * df['BB']
+                 + season_weights['wHBP'] * df['HB']
+                 + season_weights['w1B'] * df['1B-A']
+                 + season_weights['w2B'] * df['2B-A']
+                 + season_weights['w3B'] * df['3B-A']
+                 + season_weights['wHR'] * df['HR-A'])
+    res = (numerator / df['BF']).round(ROUND_TO)
+    return res.where(df['BF'] > 0, 0.00)
 
 
 def calculate_woba_manual(plate_appearances, walks, hits_by_pitch, singles,
@@ -78,38 +89,36 @@ def calculate_woba_manual(plate_appearances, walks, hits_by_pitch, singles,
         triples(int)
         homeruns(int)
         season(int)
+        division(int)
 
     Returns:
         wOBA as a float
     """
     if plate_appearances > 0:
-        season_weights = guts.get_season_linear_weights(season, division)
-        numerator = (season_weights['wBB'].values[0] * walks
-                     + season_weights['wHBP'].values[0] * hits_by_pitch
-                     + season_weights['w1B'].values[0] * singles
-                     + season_weights['w2B'].values[0] * doubles
-                     + season_weights['w3B'].values[0] * triples
-                     + season_weights['wHR'].values[0] * homeruns)
+        season_weights = guts.get_season_linear_weights_record(
+            season, division)
+        numerator = (season_weights.wBB * walks
+                     + season_weights.wHBP * hits_by_pitch
+                     + season_weights.w1B * singles
+                     + season_weights.w2B * doubles
+                     + season_weights.w3B * triples
+                     + season_weights.wHR * homeruns)
         denominator = plate_appearances
         return round(numerator / denominator, ROUND_TO)
     else:
         return 0.00
 
 
-def _calculate_wraa(row):
+def _calculate_wraa(df, season_weights):
     """
     """
-    if row['PA'] > 0:
-        season_weights = guts.get_season_linear_weights(
-            row['season'], row['division'])
-        return round(((row['wOBA'] - season_weights['wOBA'].values[0])
-                     / season_weights['wOBAScale'].values[0])
-                     * row['PA'], ROUND_TO)
-    else:
-        return 0.00
+    res = (((df['wOBA'] - season_weights['wOBA'])
+            / season_weights['wOBAScale'])
+           * df['PA']).round(ROUND_TO)
+    return res.where(df['PA'] > 0, 0.00)
 
 
-def calculate_wraa_manual(plate_appearances, woba,  season):
+def calculate_wraa_manual(plate_appearances, woba, season, division=1):
     """
     Calculates wRAA based on the following formula:
         wRAA = [(wOBA - leagueWOBA) / wOBAscale] * PA
@@ -118,38 +127,36 @@ def calculate_wraa_manual(plate_appearances, woba,  season):
         plate_appearances(int)
         woba(float)
         season(int)
+        division(int)
 
     Returns:
         The weighted runs created above average of a player as a float
     """
     if plate_appearances > 0:
-        season_weights = guts.get_season_linear_weights(season)
-        return round(((woba - season_weights['wOBA'].values[0])
-                     / season_weights['wOBAScale'].values[0])
+        season_weights = guts.get_season_linear_weights_record(
+            season, division)
+        return round(((woba - season_weights.wOBA)
+                     / season_weights.wOBAScale)
                      * plate_appearances, ROUND_TO)
     else:
         return 0.00
 
 
-def _calculate_wrc(row):
+def _calculate_wrc(df, season_weights):
     """
     Args:
 
     Returns:
-        The weighted runs created of a player as a float
+        The weighted runs created of each player as a Series
         based on the following formula:
 
         wRC = [((wOBA - lgwOBA) / wOBAScale) + (lgR / PA))] * PA
     """
-    if row['PA'] > 0:
-        season_weights = guts.get_season_linear_weights(
-            row['season'], row['division'])
-        return round((((row['wOBA'] - season_weights['wOBA'].values[0])
-                       / season_weights['wOBAScale'].values[0])
-                      + season_weights['R/PA'].values[0])
-                     * row['PA'], ROUND_TO)
-    else:
-        return 0.00
+    res = ((((df['wOBA'] - season_weights['wOBA'])
+             / season_weights['wOBAScale'])
+            + season_weights['R/PA'])
+           * df['PA']).round(ROUND_TO)
+    return res.where(df['PA'] > 0, 0.00)
 
 
 def calculate_wrc_manual(plate_appearances, woba, season, division):
@@ -161,15 +168,17 @@ def calculate_wrc_manual(plate_appearances, woba, season, division):
         plate_appearances(int)
         woba(float)
         season(int)
+        division(int)
 
     Returns:
         The weighted runs created by a player as a float
     """
     if plate_appearances > 0:
-        season_weights = guts.get_season_linear_weights(season, division)
-        return round((((woba - season_weights['wOBA'].values[0])
-                       / season_weights['wOBAScale'].values[0])
-                      + season_weights['R/PA'].values[0])
+        season_weights = guts.get_season_linear_weights_record(
+            season, division)
+        return round((((woba - season_weights.wOBA)
+                       / season_weights.wOBAScale)
+                      + season_weights.R_PA)
                      * plate_appearances, ROUND_TO)
     else:
         return 0.00
@@ -188,7 +197,7 @@ def add_batting_metrics(df):
     Returns:
         DataFrame of stats with additional columns
     """
-    df.loc[:, 'PA'] = df.apply(_calculate_pa, axis=1)
+    df.loc[:, 'PA'] = _calculate_pa(df)
     df = df.loc[df.PA > 0]
     df.loc[:, '1B'] = (df['H'] - df['2B'] - df['3B'] - df['HR'])
     df.loc[:, 'OBP'] = round((df['H'] + df['BB'] + df['IBB'] + df['HBP'])
@@ -207,33 +216,33 @@ def add_batting_metrics(df):
     df.loc[:, 'BABIP'] = round((df['H'] - df['HR'])
                                / (df['AB'] - df['K'] - df['HR']
                                   + df['SF']), ROUND_TO)
-    df.loc[:, 'wOBA'] = df.apply(_calculate_woba, axis=1)
-    df.loc[:, 'wRAA'] = df.apply(_calculate_wraa, axis=1)
-    df.loc[:, 'wRC'] = df.apply(_calculate_wrc, axis=1)
+    season_weights = _get_season_weights(df)
+    df.loc[:, 'wOBA'] = _calculate_woba(df, season_weights)
+    df.loc[:, 'wRAA'] = _calculate_wraa(df, season_weights)
+    df.loc[:, 'wRC'] = _calculate_wrc(df, season_weights)
     df = df.fillna(value=0.00, inplace=False)
     return df
 
 
 def _adjust_innings_pitched(df):
-    full_innings = int(df['IP'])
+    """
+    Converts innings pitched from baseball notation (x.1, x.2) to
+    true innings (x.333, x.667) for a whole column at once
+    """
+    full_innings = np.trunc(df['IP'])
     partial_innings = df['IP'] % 1
-    adj_innings = round(partial_innings*(10/3), ROUND_TO)
+    adj_innings = (partial_innings*(10/3)).round(ROUND_TO)
     res = full_innings + adj_innings
-    return float(res)
+    return res.astype('float')
 
 
-def _calculate_fip(row):
+def _calculate_fip(df, season_weights):
     """
     """
-    if row['IP-adj'] > 0:
-        season_weights = guts.get_season_linear_weights(
-            row['season'], row['division'])
-        res = round(((13 * row['HR-A'] + 3 * (row['BB'] + row['HB']) - 2 *
-                    row['SO']) / row['IP-adj'])
-                    + season_weights['cFIP'].values[0], 3)
-        return res
-    else:
-        return 0.00
+    res = (((13 * df['HR-A'] + 3 * (df['BB'] + df['HB']) - 2 *
+            df['SO']) / df['IP-adj'])
+           + season_weights['cFIP']).round(ROUND_TO)
+    return res.where(df['IP-adj'] > 0, 0.00)
 
 
 def calculate_fip_manual(homeruns, walks, hit_batters, strikeouts, innings_pitched, season, division):
@@ -248,13 +257,15 @@ def calculate_fip_manual(homeruns, walks, hit_batters, strikeouts, innings_pitch
         K(int)
         IP(float)
         season(int)
+        division(int)
 
     Returns:
         FIP as a float
     """
-    season_weights = guts.get_season_linear_weights(season, division)
+    season_weights = guts.get_season_linear_weights_record(
+        season, division)
     return round(((13 * homeruns + 3 * (walks + hit_batters) - 2 * strikeouts) / innings_pitched)
-                 + season_weights['cFIP'].values[0], ROUND_TO)
+                 + season_weights.cFIP, ROUND_TO)
 
 
 def add_pitching_metrics(df):
@@ -270,7 +281,8 @@ def add_pitching_metrics(df):
     Returns:
         DataFrame of stats with additional columns
     """
-    df['IP-adj'] = df.apply(_adjust_innings_pitched, axis=1)
+    df['IP-adj'] = _adjust_innings_pitched(df)
+    season_weights = _get_season_weights(df)
     df['1B-A'] = df['H']-df['HR-A']-df['3B-A']-df['2B-A']
     df.loc[:, 'OBP-against'] = round((df['H'] + df['BB'] + df['IBB']
                                       + df['HB']) /
@@ -299,7 +311,7 @@ def add_pitching_metrics(df):
     df.loc[:, 'BABIP-against'] = round((df['H'] - df['HR-A'])
                                        / (df['BF'] - df['SO']
                                           - df['HR-A'] + df['SFA']), ROUND_TO)
-    df.loc[:, 'FIP'] = df.apply(_calculate_fip, axis=1)
+    df.loc[:, 'FIP'] = _calculate_fip(df, season_weights)
     df.loc[:, 'WHIP'] = round(
         ((df['H']+df['BB']) / (df['IP-adj'])).replace(np.inf, 0), ROUND_TO)
     df.loc[:, 'Pitches/IP'] = round(
@@ -317,7 +329,7 @@ def add_pitching_metrics(df):
                                   ).replace(np.inf, 0), ROUND_TO)
     df.loc[:, 'GO/FO'] = round((df['GO'] / (df['FO'])
                                 ).replace(np.inf, 0), ROUND_TO)
-    df.loc[:, 'wOBA-against'] = df.apply(_calculate_woba_against, axis=1)
+    df.loc[:, 'wOBA-against'] = _calculate_woba_against(df, season_weights)
     if len(df.loc[df['Pitches/IP'] > 0]) < 1:
         df = df.drop(columns=['Pitches/IP'], inplace=False)
     if len(df.loc[df['Pitches/PA'] > 0]) < 1:
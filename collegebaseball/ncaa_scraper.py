@@ -8,33 +8,22 @@ created by Nathan Blumenfeld in Spring 2022
 import pandas as pd
 from time import sleep
 import random
-from bs4 import BeautifulSoup, Tag
-from collegebaseball import metrics, ncaa_utils, lookup
-from requests import Session
+from bs4 import BeautifulSoup
+from collegebaseball import metrics, ncaa_utils, lookup, http_utils, \
+    instrumentation
 
 
-# GET request options
-_HEADERS = {'User-Agent': 'Mozilla/5.0'}
+# max seconds to wait between consecutive requests in multi-season loops
 _TIMEOUT = 4
 
 
-def ncaa_team_stats(school, season, variant, include_advanced=True,
-                    split=None):
+def _get_team_stats_page(school, season, variant, split=None):
     """
-    Obtains player-level single-season aggregate stats
-     for all players from a given school, from stats.ncaa.org
-
-    Args:
-        school: schools (str) or NCAA school_id (int)
-        season: season (int, YYYY) or NCAA season_id (int), valid 2013-2022
-        variant (str): 'batting', 'pitching', or 'fielding'
-        include_advanced (bool, optional). Whether to
-         automatically calcuate advanced metrics, Defaults to True
-        split (str, optional): 'vs_LH', 'vs_RH', 'runners_on', 'bases_empty',
-        'bases_loaded', 'with_RISP', 'two_outs'
+    A helper function to request the /team/{school_id}/stats page that
+    holds both the player-level and team-level stats for a team
 
     Returns:
-       pd.DataFrame
+        tuple of (requests.Response, season (int), division (int))
     """
     season, season_id, batting_id, pitching_id, fielding_id = lookup._lookup_season_info(
         season)
@@ -53,40 +42,25 @@ def ncaa_team_stats(school, season, variant, include_advanced=True,
     if split is not None and variant != 'fielding':
         available_stat_id = ncaa_utils.available_stat_ids[variant][season][split]
         payload['available_stat_id'] = available_stat_id
-    with Session() as s:
-        r = s.get(url, params=payload, headers=_HEADERS)
-    if r.status_code == 403:
-        print('An error occurred with the GET Request')
-        print('403 Error: NCAA blocked request')
-        return pd.DataFrame()
-    soup = BeautifulSoup(r.text, features='lxml')
-    if len(soup.find_all(name='table', id='stat_grid')) < 1:
-        return pd.DataFrame()
-    table = soup.find_all(name='table', id='stat_grid')[-1]
-    if table is None:
-        print('no data found')
+    r = http_utils.get(url, params=payload)
+    return r, season, division
+
+
+@instrumentation.instrument_parse('team_stats')
+def _parse_team_stats(page, season, division, variant, include_advanced,
+                      split):
+    """
+    A helper function to build the player-level stats DataFrame from the
+    tbody of a team stats page
+    """
+    grid = ncaa_utils._extract_stat_grid(page, 'tbody', table=-1)
+    if grid is None:
         return pd.DataFrame()
-    headers = [x for x in table.thead.tr.stripped_strings]
+    headers, rows = grid
     headers.insert(headers.index('Player'), 'stats_player_seq')
     if season == 2022 and variant == 'batting':
         headers.remove('RBI2out')
-    rows = []
-    for i in table.tbody.find_all('tr'):
-        row = []
-        for j in i.find_all('td'):
-            if 'data-order' in j.attrs:
-                row.append(j.attrs['data-order'])
-            else:
-                if j.find('a') is not None:
-                    if 'href' in j.a.attrs:
-                        row.append(
-                            int(j.a.attrs['href'].split('&')[-1].split('=')[-1]))
-                    else:
-                        row.append('-')
-                row.append(j.string)
-        if len(row) > len(headers):
-            row = row[:-1]
-        rows.append(row)
+    rows = [row[:-1] if len(row) > len(headers) else row for row in rows]
     df = pd.DataFrame(rows, columns=headers)
     if len(df) < 1:
         return pd.DataFrame()
@@ -109,6 +83,67 @@ def ncaa_team_stats(school, season, variant, include_advanced=True,
     return res
 
 
+@instrumentation.instrument_parse('team_stats')
+def _parse_team_totals(page, season, division, variant, include_advanced):
+    """
+    A helper function to build the team-level totals DataFrame from the
+    tfoot of a team stats page
+    """
+    grid = ncaa_utils._extract_stat_grid(page, 'tfoot', table=0)
+    if grid is None:
+        print('no data found')
+        return pd.DataFrame()
+    headers, rows = grid
+    if season == 2022 and variant == 'batting':
+        headers.remove('RBI2out')
+    rows = [row[:-1] if len(row) > len(headers) else row for row in rows]
+    df = pd.DataFrame(rows, columns=headers)
+    df['season'] = season
+    df['division'] = division
+    res = ncaa_utils._transform_stats(df)
+    cols_to_drop = ['Jersey', 'Yr', 'pos', 'GP', 'GS', 'App']
+    for i in cols_to_drop:
+        if i in res.columns:
+            res = res.drop(columns=[i], inplace=False)
+    if variant == 'batting':
+        if include_advanced:
+            if len(res) > 0:
+                res = metrics.add_batting_metrics(res)
+                res = res.loc[res.PA > 0]
+    elif variant == 'pitching':
+        if include_advanced:
+            if len(res) > 0:
+                res = metrics.add_pitching_metrics(res)
+    return res
+
+
+def ncaa_team_stats(school, season, variant, include_advanced=True,
+                    split=None):
+    """
+    Obtains player-level single-season aggregate stats
+     for all players from a given school, from stats.ncaa.org
+
+    Args:
+        school: schools (str) or NCAA school_id (int)
+        season: season (int, YYYY) or NCAA season_id (int), valid 2013-2022
+        variant (str): 'batting', 'pitching', or 'fielding'
+        include_advanced (bool, optional). Whether to
+         automatically calcuate advanced metrics, Defaults to True
+        split (str, optional): 'vs_LH', 'vs_RH', 'runners_on', 'bases_empty',
+        'bases_loaded', 'with_RISP', 'two_outs'
+
+    Returns:
+       pd.DataFrame
+
+    Raises:
+        http_utils.ThrottledError
+    """
+    r, season, division = _get_team_stats_page(school, season, variant,
+                                                split)
+    return _parse_team_stats(r.text, season, division, variant,
+                             include_advanced, split)
+
+
 def ncaa_career_stats(stats_player_seq, variant, include_advanced=True):
     """
     Obtains season-aggregate stats for all seasons in a given player's
@@ -122,6 +157,9 @@ def ncaa_career_stats(stats_player_seq, variant, include_advanced=True):
 
     Returns:
         pd.DataFrame
+
+    Raises:
+        http_utils.ThrottledError
     """
     season = lookup.lookup_seasons_played(stats_player_seq)[0]
     season, season_id, batting_id, pitching_id, fielding_id = lookup._lookup_season_info(
@@ -135,12 +173,17 @@ def ncaa_career_stats(stats_player_seq, variant, include_advanced=True):
     payload = {'id': str(season_id), 'stats_player_seq': str(stats_player_seq),
                'year_stat_category_id': str(year_stat_category_id)}
     url = 'https://stats.ncaa.org/player/index'
-    with Session() as s:
-        r = s.get(url, params=payload, headers=_HEADERS)
-    if r.status_code == 403:
-        print('403 Error: NCAA blocked request')
-        return pd.DataFrame()
-    soup = BeautifulSoup(r.text, features='lxml')
+    r = http_utils.get(url, params=payload)
+    return _parse_career_stats(r.text, variant, include_advanced)
+
+
+@instrumentation.instrument_parse('player_index')
+def _parse_career_stats(text, variant, include_advanced=True):
+    """
+    A helper function to parse a player's career stats page, see
+     ncaa_career_stats
+    """
+    soup = BeautifulSoup(text, features='lxml')
     table = soup.find_all('table')[2]
     headers = []
     for val in table.find_all('th'):
@@ -198,86 +241,56 @@ def ncaa_team_totals(school, season, variant, include_advanced=True,
 
     Returns:
         pd.DataFrame
+
+    Raises:
+        http_utils.ThrottledError
     """
-    school, school_id, division = lookup._lookup_school_info(school)
-    season, season_id, batting_id, pitching_id, fielding_id = lookup._lookup_season_info(
-        season)
-    if variant == 'batting':
-        year_stat_category_id = batting_id
-    elif variant == 'pitching':
-        year_stat_category_id = pitching_id
-    else:
-        year_stat_category_id = fielding_id
-    url = 'https://stats.ncaa.org/team/'+str(school_id)+'/stats'
-    payload = {'game_sport_year_ctl_id': str(season_id),
-               'id': str(season_id),
-               'year_stat_category_id': str(year_stat_category_id)
-               }
-    if split is not None and variant != 'fielding':
-        available_stat_id = ncaa_utils.available_stat_ids[variant][season][split]
-        payload['available_stat_id'] = available_stat_id
-    with Session() as s:
-        r = s.get(url, params=payload, headers=_HEADERS)
-    if r.status_code == 403:
-        print('An error occurred with the GET Request')
-        print('403 Error: NCAA blocked request')
-        return pd.DataFrame()
-    soup = BeautifulSoup(r.text, features='lxml')
-    if len(soup.find_all(name='table', id='stat_grid')) < 1:
-        print('no data found')
-        return pd.DataFrame()
-    table = soup.find(name='table', id='stat_grid')
-    if table is None:
-        print('no data found')
-        return pd.DataFrame()
-    headers = [x for x in table.thead.tr.stripped_strings]
-    if season == 2022 and variant == 'batting':
-        headers.remove('RBI2out')
-    rows = []
-    for i in table.tfoot.find_all('tr'):
-        row = []
-        for j in i.find_all('td'):
-            if 'data-order' in j.attrs:
-                row.append(j.attrs['data-order'])
-            else:
-                row.append(j.string)
-        if len(row) > len(headers):
-            row = row[:-1]
-        rows.append(row)
-    df = pd.DataFrame(rows, columns=headers)
-    df['season'] = season
-    df['division'] = division
-    res = ncaa_utils._transform_stats(df)
-    cols_to_drop = ['Jersey', 'Yr', 'pos', 'GP', 'GS', 'App']
-    for i in cols_to_drop:
-        if i in res.columns:
-            res = res.drop(columns=[i], inplace=False)
-    if variant == 'batting':
-        if include_advanced:
-            if len(res) > 0:
-                res = metrics.add_batting_metrics(res)
-                res = res.loc[res.PA > 0]
-    elif variant == 'pitching':
-        if include_advanced:
-            if len(res) > 0:
-                res = metrics.add_pitching_metrics(res)
-    return res
+    r, season, division = _get_team_stats_page(school, season, variant,
+                                                split)
+    return _parse_team_totals(r.text, season, division, variant,
+                              include_advanced)
 
 
-def ncaa_player_game_logs(player, season, variant, school=None, include_advanced=True):
+def ncaa_team_stats_and_totals(school, season, variant,
+                               include_advanced=True, split=None):
     """
-    Obtains player-level game-by-game stats for a given player in 
-     a given season, from stats.ncaa.org
+    Obtains both player-level and team-level aggregate single-season stats
+     for a given team from a single request to stats.ncaa.org
 
     Args:
-        player: player name (str) or NCAA stats_player_seq (int)
+        school: schools (str) or NCAA school_id (int)
+        season: season (int, YYYY) or NCAA season_id (int), valid 2013-2022
         variant (str): 'batting', 'pitching', or 'fielding'
-        season: season as (int, YYYY) or NCAA season_id (int), valid 2013-2022
-        school (optional, if not passing a stats_player_seq): school name (str)
-            or NCAA school_id (int)
+        include_advanced (bool, optional). Whether to
+         automatically calcuate advanced metrics, Defaults to True
+        split (str, optional): 'vs_LH', 'vs_RH', 'runners_on', 'bases_empty',
+        'bases_loaded', 'with_RISP', 'two_outs'
 
     Returns:
-        pd.DataFrame
+        tuple of pd.DataFrames: (ncaa_team_stats output,
+         ncaa_team_totals output)
+
+    Raises:
+        http_utils.ThrottledError
+    """
+    r, season, division = _get_team_stats_page(school, season, variant,
+                                                split)
+    page = ncaa_utils._parse_html(r.text)
+    stats = _parse_team_stats(page, season, division, variant,
+                              include_advanced, split)
+    totals = _parse_team_totals(page, season, division, variant,
+                                include_advanced)
+    return stats, totals
+
+
+def _fetch_player_game_logs(player, season, variant, school=None):
+    """
+    A helper function to look up a player and request their game_by_game
+    page, the I/O half of ncaa_player_game_logs
+
+    Returns:
+        (page html, args for _parse_player_game_logs), or None if the
+        player can't be found
     """
     season, season_id, batting_id, pitching_id, fielding_id = lookup._lookup_season_info(
         season)
@@ -288,17 +301,12 @@ def ncaa_player_game_logs(player, season, variant, school=None, include_advanced
                 player_id, season)
             school, school_id, division = lookup._lookup_school_info(school)
         except:
-            print('no records found')
-            return pd.DataFrame()
+            return None
     elif type(player) == str:
         player_name = player
-        if school is not None:
-            player_id = lookup.lookup_player(player_name, school)
-            school, school_id, division = lookup._lookup_school_info(school)
-        else:
-            return 'must give a player_id if no school given'
+        player_id = lookup.lookup_player(player_name, school)
+        school, school_id, division = lookup._lookup_school_info(school)
     stats_player_seq = str(player_id)
-    headers = ncaa_utils.player_gamelog_headers[variant][season]
     if variant == 'batting':
         year_stat_category_id = batting_id
     elif variant == 'pitching':
@@ -310,68 +318,20 @@ def ncaa_player_game_logs(player, season, variant, school=None, include_advanced
                'stats_player_seq': str(stats_player_seq),
                'year_stat_category_id': str(year_stat_category_id)}
     url = 'https://stats.ncaa.org/player/game_by_game?'
-    with Session() as s:
-        r = s.get(url, params=payload, headers=_HEADERS)
-    soup = BeautifulSoup(r.text, features='lxml')
-    table = soup.find_all('table')[3]
-    if table is None:
-        print('no data found')
-        return pd.DataFrame()
-    rows = []
-    prev_game_id = 0
-    for val in table.find_all(ncaa_utils._has_no_id)[3:]:
-        row = []
-        for i in val.children:
-            if isinstance(i, Tag):
-                if i.a:
-                    if len(i.find_all('a')) >= 1:
-                        if 'box_score' in i.find_all('a')[-1].get('href'):
-                            score = i.a.string.strip()
-                            game_id = i.a.get('href').split('/')[-2]
-                        elif 'team' in (i.find_all('a'))[-1].get('href'):
-                            opponent_id = i.find_all(
-                                'a')[-1].get('href').split('/')[2]
-                            opponent_name, field = ncaa_utils._parse_opponent_info(
-                                i.find_all('a')[-1].text.strip())
-                        elif 'game/index' in i.find_all('a')[-1].get('href'):
-                            game_id = i.find_all(
-                                'a')[-1].get('href').split('/')[-1].split('?')[0]
-                            score = i.a.string.strip()
-                        else:
-                            opponent_name, field = ncaa_utils._parse_opponent_info(
-                                i.text.strip())
-                            opponent_id = '-'
-                elif 'data-order' in i.attrs:
-                    row.append(i.get('data-order'))
-                elif '/' in i.string:
-                    date = i.string
-                elif i.text.strip() == '-':
-                    score = '-'
-                    game_id = '-'
-                else:
-                    opponent_name, field = ncaa_utils._parse_opponent_info(
-                        i.text.strip())
-                    opponent_id = '-'
-        runs_scored, runs_allowed, run_diff, result, ip, extras = ncaa_utils._parse_score(
-            score)
-        row.append(date)
-        row.append(field)
-        row.append(season_id)
-        row.append(opponent_id)
-        row.append(opponent_name)
-        row.append(ip)
-        row.append(extras)
-        row.append(runs_scored)
-        row.append(runs_allowed)
-        row.append(run_diff)
-        row.append(result)
-        row.append(game_id)
-        row.append(school_id)
-        if len(row) == (len(headers)-1) and ((game_id != prev_game_id) or (result == 'cancelled')):
-            prev_game_id = game_id
-            row.append(int(player_id))
-            rows.append(row)
-    res = pd.DataFrame(rows, columns=headers)
+    r = http_utils.get(url, params=payload)
+    return r.text, (player_id, season, season_id, school_id, division,
+                    variant)
+
+
+@instrumentation.instrument_parse('game_by_game')
+def _parse_player_game_logs(text, player_id, season, season_id, school_id,
+                            division, variant, include_advanced=True):
+    """
+    A helper function to build a player's game logs DataFrame from their
+    game_by_game page, the CPU half of ncaa_player_game_logs
+    """
+    res = ncaa_utils._parse_game_by_game(text, variant, season, season_id,
+                                         school_id, player_id)
     if not res.empty:
         res['season'] = season
         res['division'] = division
@@ -390,25 +350,46 @@ def ncaa_player_game_logs(player, season, variant, school=None, include_advanced
     return res
 
 
-def ncaa_team_game_logs(school, season, variant, include_advanced=True):
+def ncaa_player_game_logs(player, season, variant, school=None, include_advanced=True):
     """
-    Obtains team-level game-by-game stats for a given team in a given 
-     season, from stats.ncaa.org
+    Obtains player-level game-by-game stats for a given player in 
+     a given season, from stats.ncaa.org
 
     Args:
-        school: school name (str) or NCAA school_id (int)
-        seasons: seasons as (int, YYYY) or NCAA season_id (list), 2013-2022
+        player: player name (str) or NCAA stats_player_seq (int)
         variant (str): 'batting', 'pitching', or 'fielding'
-        include_advanced (bool, optional). Whether to
-         automatically calcuate advanced metrics, Defaults to True
+        season: season as (int, YYYY) or NCAA season_id (int), valid 2013-2022
+        school (optional, if not passing a stats_player_seq): school name (str)
+            or NCAA school_id (int)
 
     Returns:
         pd.DataFrame
+
+    Raises:
+        http_utils.ThrottledError
+    """
+    if type(player) == str and school is None:
+        return 'must give a player_id if no school given'
+    page = _fetch_player_game_logs(player, season, variant, school)
+    if page is None:
+        print('no records found')
+        return pd.DataFrame()
+    text, args = page
+    return _parse_player_game_logs(text, *args,
+                                   include_advanced=include_advanced)
+
+
+def _fetch_team_game_logs(school, season, variant):
+    """
+    A helper function to request a team's game_by_game page, the I/O half
+    of ncaa_team_game_logs
+
+    Returns:
+        (page html, args for _parse_team_game_logs)
     """
     season, season_id, batting_id, pitching_id, fielding_id = lookup._lookup_season_info(
         season)
     school, school_id, division = lookup._lookup_school_info(school)
-    headers = ncaa_utils.team_gamelog_headers[variant][season]
     if variant == 'batting':
         year_stat_category_id = batting_id
     elif variant == 'pitching':
@@ -420,64 +401,19 @@ def ncaa_team_game_logs(school, season, variant, include_advanced=True):
                'stats_player_seq': '-100',
                'year_stat_category_id': str(year_stat_category_id)}
     url = 'https://stats.ncaa.org/player/game_by_game?'
-    with Session() as s:
-        r = s.get(url, params=payload, headers=_HEADERS)
-    soup = BeautifulSoup(r.text, features='lxml')
-    table = soup.find_all('table')[3]
-    rows = []
-    prev_game_id = 0
-    for val in table.find_all(ncaa_utils._has_no_id)[3:]:
-        row = []
-        for i in val.children:
-            if isinstance(i, Tag):
-                if i.a:
-                    if len(i.find_all('a')) >= 1:
-                        if 'box_score' in i.find_all('a')[-1].get('href'):
-                            score = i.a.string.strip()
-                            game_id = i.a.get('href').split('/')[-2]
-                        elif 'team' in (i.find_all('a'))[-1].get('href'):
-                            opponent_id = i.find_all(
-                                'a')[-1].get('href').split('/')[2]
-                            opponent_name, field = ncaa_utils._parse_opponent_info(
-                                i.find_all('a')[-1].text.strip())
-                        elif 'game/index' in i.find_all('a')[-1].get('href'):
-                            game_id = i.find_all(
-                                'a')[-1].get('href').split('/')[-1].split('?')[0]
-                            score = i.a.string.strip()
-                        else:
-                            opponent_name, field = ncaa_utils._parse_opponent_info(
-                                i.text.strip())
-                            opponent_id = '-'
-                elif 'data-order' in i.attrs:
-                    row.append(i.get('data-order'))
-                elif '/' in i.string:
-                    date = i.string
-                elif i.text.strip() == '-':
-                    score = '-'
-                    game_id = '-'
-                else:
-                    opponent_name, field = ncaa_utils._parse_opponent_info(
-                        i.text.strip())
-                    opponent_id = '-'
-        runs_scored, runs_allowed, run_diff, result, ip, extras = ncaa_utils._parse_score(
-            score)
-        row.append(date)
-        row.append(field)
-        row.append(season_id)
-        row.append(opponent_id)
-        row.append(opponent_name)
-        row.append(ip)
-        row.append(extras)
-        row.append(runs_scored)
-        row.append(runs_allowed)
-        row.append(run_diff)
-        row.append(result)
-        row.append(game_id)
-        row.append(school_id)
-        if (len(row) == len(headers)) and ((game_id != prev_game_id) or (result == 'cancelled')):
-            prev_game_id = game_id
-            rows.append(row)
-    res = pd.DataFrame(rows, columns=headers)
+    r = http_utils.get(url, params=payload)
+    return r.text, (season, season_id, school_id, division, variant)
+
+
+@instrumentation.instrument_parse('game_by_game')
+def _parse_team_game_logs(text, season, season_id, school_id, division,
+                          variant, include_advanced=True):
+    """
+    A helper function to build a team's game logs DataFrame from its
+    game_by_game page, the CPU half of ncaa_team_game_logs
+    """
+    res = ncaa_utils._parse_game_by_game(text, variant, season, season_id,
+                                         school_id)
     if not res.empty:
         res['season'] = season
         res['division'] = division
@@ -496,77 +432,90 @@ def ncaa_team_game_logs(school, season, variant, include_advanced=True):
     return res
 
 
-def ncaa_team_results(school, season):
+def ncaa_team_game_logs(school, season, variant, include_advanced=True):
     """
-    Obtains the results of games for a given school in a given 
+    Obtains team-level game-by-game stats for a given team in a given 
      season, from stats.ncaa.org
 
     Args:
         school: school name (str) or NCAA school_id (int)
-        season: season (int, YYYY) or NCAA season_id (int), valid 2013-2022
+        seasons: seasons as (int, YYYY) or NCAA season_id (list), 2013-2022
+        variant (str): 'batting', 'pitching', or 'fielding'
+        include_advanced (bool, optional). Whether to
+         automatically calcuate advanced metrics, Defaults to True
 
     Returns:
         pd.DataFrame
+
+    Raises:
+        http_utils.ThrottledError
+    """
+    text, args = _fetch_team_game_logs(school, season, variant)
+    return _parse_team_game_logs(text, *args,
+                                 include_advanced=include_advanced)
+
+
+def _parse_team_results(text, season, season_id, school_id, division,
+                        variant='batting'):
+    """
+    A helper function to build a team's results from its batting
+    game_by_game page, the CPU half of ncaa_team_results
     """
-    data = ncaa_team_game_logs(
-        school, season, variant='batting', include_advanced=False)
+    data = _parse_team_game_logs(text, season, season_id, school_id,
+                                 division, variant, include_advanced=False)
     res = data[['game_id', 'date', 'field', 'opponent_name', 'opponent_id',
                 'innings_played', 'extras', 'runs_scored', 'runs_allowed',
                'run_difference', 'result', 'school_id', 'season_id', 'division']]
     return res
 
 
-def ncaa_team_season_roster(school, season):
+def ncaa_team_results(school, season):
     """
-    Retrieves the single-season roster for a given school in a 
-     given season, from stats.ncaa.org
+    Obtains the results of games for a given school in a given 
+     season, from stats.ncaa.org
 
     Args:
         school: school name (str) or NCAA school_id (int)
-        season: season as (int, YYYY) or NCAA season_id (int), valid 2012-2022
+        season: season (int, YYYY) or NCAA season_id (int), valid 2013-2022
 
     Returns:
         pd.DataFrame
+
+    Raises:
+        http_utils.ThrottledError
+    """
+    text, args = _fetch_team_game_logs(school, season, 'batting')
+    return _parse_team_results(text, *args)
+
+
+def _fetch_team_season_roster(school, season):
+    """
+    A helper function to request a team's roster page, the I/O half of
+    ncaa_team_season_roster
+
+    Returns:
+        (page html, args for _parse_team_season_roster)
     """
     school, school_id, division = lookup._lookup_school_info(school)
     season, season_id = lookup._lookup_season_basic(season)
     request_body = 'https://stats.ncaa.org/team/'
     request_body += f'''{str(school_id)}/roster/{str(season_id)}'''
-    with Session() as s:
-        r = s.get(request_body, headers=_HEADERS)
-    soup = BeautifulSoup(r.text, features='lxml')
-    res = []
-    if (season in [2019, 14781, 2022, 15860]):
-        num_values = 7
-        col_names = ['jersey', 'stats_player_seq', 'name', 'position',
-                     'height', 'class_year', 'games_played',
-                     'games_started']
-    else:
-        num_values = 6
-        col_names = ['jersey', 'stats_player_seq', 'name', 'position',
-                     'class_year', 'games_played', 'games_started']
-    for index, value in enumerate(soup.find_all('td')):
-        if index % num_values == 0:
-            details = []
-            res.append(details)
-        if index % num_values == 1:
-            try:
-                details.append((value.contents[0].get('href')[-7:]))
-                details.append(value.contents[0].string)
-            except:
-                details.append(None)
-                details.append(value.contents[0])
-        else:
-            try:
-                details.append(value.contents[0])
-            except:
-                details.append(None)
-    df = pd.DataFrame(res)
-    df.columns = col_names
-    df.stats_player_seq = df.stats_player_seq.astype('str')
-    df.stats_player_seq = df.stats_player_seq.str.replace('=', '')
-    df = df.loc[df.stats_player_seq != 'None']
-    df.stats_player_seq = df.stats_player_seq.astype('int64')
+    r = http_utils.get(request_body)
+    return r.text, (school, school_id, division, season, season_id)
+
+
+@instrumentation.instrument_parse('roster')
+def _parse_team_season_roster(text, school, school_id, division, season,
+                              season_id):
+    """
+    A helper function to build a roster DataFrame from a team's roster
+    page, the CPU half of ncaa_team_season_roster
+    """
+    columns = ncaa_utils._extract_roster(text)
+    if columns is None:
+        print('no data found')
+        return pd.DataFrame()
+    df = pd.DataFrame(columns)
     df['season'] = season
     df['season_id'] = season_id
     df['school'] = school
@@ -577,10 +526,29 @@ def ncaa_team_season_roster(school, season):
     df['season'] = df['season'].astype('int16')
     df['division'] = df['division'].astype('int16')
     df['season_id'] = df['season_id'].astype('int32')
-    df.name = df.name.apply(ncaa_utils._format_names)
+    df.name = ncaa_utils._format_names(df.name).astype('string')
     return df
 
 
+def ncaa_team_season_roster(school, season):
+    """
+    Retrieves the single-season roster for a given school in a 
+     given season, from stats.ncaa.org
+
+    Args:
+        school: school name (str) or NCAA school_id (int)
+        season: season as (int, YYYY) or NCAA season_id (int), valid 2012-2022
+
+    Returns:
+        pd.DataFrame
+
+    Raises:
+        http_utils.ThrottledError
+    """
+    text, args = _fetch_team_season_roster(school, season)
+    return _parse_team_season_roster(text, *args)
+
+
 def ncaa_team_roster(school, seasons):
     """
     Retrieves a blindly concattenated roster for a given tea
@@ -593,6 +561,9 @@ def ncaa_team_roster(school, seasons):
 
     Returns:
         pd.DataFrame
+
+    Raises:
+        http_utils.ThrottledError
     """
     if len(seasons) == 1:
         return ncaa_team_season_roster(school, seasons[0])
@@ -607,6 +578,8 @@ def ncaa_team_roster(school, seasons):
                 roster = pd.concat([roster, new])
                 if 'Unnamed: 0' in roster.columns:
                     roster = roster.drop(columns=['Unnamed: 0'], inplace=False)
+            except http_utils.ThrottledError:
+                raise
             except:
                 continue
     return roster
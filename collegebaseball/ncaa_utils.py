@@ -5,131 +5,397 @@ utilities for collegebaseball's ncaa_scraper
 
 created by Nathan Blumenfeld in Summer 2022
 """
+import re
 import numpy as np
+import pandas as pd
+from array import array
+from collections import Counter
+from functools import lru_cache
+from lxml import etree, html
 
 
-def _format_names(original: str):
+# compiled XPath for the stat_grid table on /team/{school_id}/stats pages
+_STAT_GRID = etree.XPath('//table[@id="stat_grid"]')
+_HEADER_ROW = etree.XPath('(descendant::thead)[1]/descendant::tr[1]')
+_SECTION_ROWS = {
+    'tbody': etree.XPath('(descendant::tbody)[1]/descendant::tr'),
+    'tfoot': etree.XPath('(descendant::tfoot)[1]/descendant::tr')
+}
+_CELLS = etree.XPath('descendant::td')
+_FIRST_ANCHOR = etree.XPath('descendant::a[1]')
+
+# compiled XPath and link patterns for /player/game_by_game pages
+_TABLES = etree.XPath('//table')
+_ROWS = etree.XPath('descendant::tr')
+_ROWS_WITHOUT_ID = etree.XPath('descendant::tr[not(@id)]')
+_HEADER_CELLS = etree.XPath('descendant::th')
+_ANCHORS = etree.XPath('descendant::a')
+# checked in this order, the first match decides what a link is
+_BOX_SCORE_LINK = re.compile('box_score')
+_TEAM_LINK = re.compile('team')
+_GAME_LINK = re.compile('game/index')
+# game_by_game result and opponent cells, e.g. 'W 5 - 3 (10)' and
+# '@ Florida St.', 'Florida St. @ Omaha, NE' or 'Florida St.'
+_SCORE_PATTERN = re.compile(
+    r'^\s*[WLT]?\s*(\d+)\s*-\s*(\d+)\s*(?:\(\s*(\d+)\s*\))?\s*$')
+_OPPONENT_PATTERN = re.compile(
+    r'^(?:@(?:.*@)?\s*(?P<away>.*)|(?P<neutral>[^@]*?)\s*@.*'
+    r'|(?P<home>[^@]*))$', re.S)
+
+# for /team/{school_id}/roster/{season_id} pages
+_PLAYER_SEQ_LINK = re.compile(r'(?:stats_player_seq=|/players/)(\d+)')
+# roster header cells, lowercased, to the roster columns they fill
+_ROSTER_HEADERS = {'jersey': 'jersey', '#': 'jersey', 'player': 'name',
+                   'name': 'name', 'pos': 'position', 'position': 'position',
+                   'ht': 'height', 'height': 'height', 'yr': 'class_year',
+                   'class': 'class_year', 'gp': 'games_played',
+                   'gs': 'games_started'}
+# roster columns, in order, and their dtypes
+_ROSTER_COLUMNS = {'jersey': 'string', 'stats_player_seq': 'int64',
+                   'name': 'string', 'position': 'string',
+                   'height': 'string', 'class_year': 'string',
+                   'games_played': 'int16', 'games_started': 'int16'}
+# cell layouts for roster tables without a header row, by cells per row
+_ROSTER_LAYOUTS = {
+    7: ['jersey', 'name', 'position', 'height', 'class_year',
+        'games_played', 'games_started'],
+    6: ['jersey', 'name', 'position', 'class_year', 'games_played',
+        'games_started']
+}
+
+
+def _format_names(names):
     """
-    A helper function to turn names from "Last, First" to "First Last"
+    A helper function to turn names from "Last, First" to "First Last".
+    Each distinct name is formatted once, in a vectorized pass, and mapped
+    back onto every row it appears in.
+
     Args:
-        original (str): the name to reformat. must be in form "Last, First"
+        names (pd.Series): object, pandas string or Arrow string values in
+         the form "Last, First"
     Returns:
-        str of format "First Last"
+        pd.Series of str of format "First Last", NaN where a value isn't a
+        string
     Examples:
-        _format_names("Blumenfeld, Nathan")
-        "Nathan Blumenfeld"
+        _format_names(pd.Series(["Blumenfeld, Nathan"]))
+        0    Nathan Blumenfeld
+    """
+    codes, uniques = pd.factorize(names.to_numpy(dtype=object))
+    formatted = pd.Series(uniques, dtype=object).str.split(',').str[::-1] \
+        .str.join(' ').str.strip().str.title()
+    # missing values have code -1, which picks the NaN on the end
+    formatted = np.append(formatted.to_numpy(dtype=object), np.nan)
+    return pd.Series(formatted[codes], index=names.index, name=names.name)
+
+
+# cells the NCAA uses for no value, read as 0
+_NULL_TOKENS = ['None', '<NA>', '', ' ', '-', '--', '---']
+# we're going to calculate OBP/BA/SLG ourselves
+# G and RBI2out are unreliable
+_DROPPED_COLUMNS = ['OBPct', 'BA', 'SlgPct', 'RBI2out', 'G']
+_RENAMED_COLUMNS = {'Player': 'name', 'Team': 'school_id', 'Pos': 'pos',
+                    'Pitches': 'pitches'}
+_DATA_TYPES = {
+    'int8': ['division', 'innings_played'],
+    'int32': ['opponent_id', 'season_id', 'school_id', 'game_id'],
+    'int16': ['runs_scored', 'runs_allowed', 'run_difference',
+              'season', 'GP', 'GS', 'BB', 'Jersey', 'DP', 'H', 'DP' 'R',
+              'ER', 'SO', 'TB', '2B', '3B', 'HR', 'RBI', 'R', 'AB', 'HBP',
+              'SF', 'K', 'SH', 'Picked', 'SB', 'IBB', 'CS', 'OPP DP',
+              'SHO', 'BF', 'P-OAB', '3B-A', '2B-A', 'Bk', 'HR-A', 'WP',
+              'IBB', 'Inh Run', 'Inh Run Score', 'SHA', 'SFA', 'GO',
+              'FO', 'W', 'L', 'HB', 'SV', 'KL', 'pickoffs', 'OrdAppeared',
+              'App', 'GDP', 'PO', 'A', 'TC', 'E', 'CI', 'PB',
+              'SBA', 'CSB', 'IDP', 'TP'],
+    'bool': ['extras'],
+    'float': ['ERA', 'IP'],
+    'string': ['Yr', 'Pos', 'date', 'Year', 'school', 'opponent_name',
+               'school_name']
+}
+_COLUMN_TYPES = {column: dtype for dtype, columns in _DATA_TYPES.items()
+                 for column in columns}
+
+
+def _fill_nulls(col, value):
+    """
+    A helper function to replace the NCAA's null cells, and missing values,
+    with value
     """
+    if col.dtype != object:
+        return col.fillna(value)
+    return col.mask(col.isna() | col.isin(_NULL_TOKENS), value)
+
+
+def _strip_commas(col):
+    """
+    A helper function to drop thousands separators from a column's strings,
+    leaving other values as they are
+    """
+    if col.dtype != object:
+        return col
     try:
-        split = original.split(',')
-        split.reverse()
-        res = ' '.join(split).strip().title()
-    except:
-        res = np.nan
-    return res
+        stripped = col.str.replace(',', '', regex=False)
+    except AttributeError:
+        # no strings at all
+        return col
+    return stripped.where(stripped.notna(), col)
+
+
+def _to_type(dtype):
+    """
+    A helper function to build a column converter to a numeric or bool
+    dtype. Commas are only stripped when a cast fails, they're rare.
+    """
+    def convert(col):
+        col = _fill_nulls(col, 0)
+        try:
+            return col.astype(dtype)
+        except ValueError:
+            return _strip_commas(col).astype(dtype)
+    return convert
+
+
+_to_float = _to_type('float')
+
+
+def _to_string(col):
+    return _strip_commas(_fill_nulls(col, '0.0')).astype('string')
+
+
+def _to_name(col):
+    return _format_names(_fill_nulls(col, np.nan)).astype('string')
+
+
+def _to_player_seq(col):
+    # keeping as 64 byte to leave space for new potential player uuids
+    if col.dtype.kind in 'iu':
+        return col.astype('int64')
+    return _fill_nulls(col, 0.0).astype('string').str.replace(
+        r'\D+', '', regex=True).astype('int64')
+
+
+def _to_pitches(col):
+    return _to_float(col).astype('int32')
+
 
+def _to_rounded(col):
+    return _to_float(col).round(4)
 
-def _eliminate_dashes(df):
+
+def _untyped(col):
+    if col.dtype != object:
+        return col.fillna(0.0)
+    return _strip_commas(_fill_nulls(col, 0.0)).infer_objects()
+
+
+@lru_cache(maxsize=None)
+def _compile_schema(columns):
     """
-    A helper function to replace the weird dashes the NCAA uses with 0.00
+    A helper function to work out, once per set of raw columns (so once per
+    variant and season), what _transform_stats does with each column
 
     Args:
-        df (DataFrame):
+        columns (tuple of str): the raw DataFrame's columns
+
     Returns:
-        Dataframe with dashes replaced by 0.00 (not a copy!)
+        tuple of (position, output name, converter) for the columns kept,
+        and the column season is read from ('date', 'Year' or None)
     """
-    formats = ['None', '<NA>', '', ' ', '-', '--', '---']
-    for i in formats:
-        df.replace(i, 0.00, inplace=True)
-    return df
+    schema = []
+    seen = set()
+    for position, column in enumerate(columns):
+        name = _RENAMED_COLUMNS.get(column, column)
+        if name in seen or column in _DROPPED_COLUMNS:
+            continue
+        seen.add(name)
+        if name == 'name':
+            convert = _to_name
+        elif name == 'stats_player_seq':
+            convert = _to_player_seq
+        elif name == 'pitches':
+            convert = _to_pitches
+        elif name in ('ERA', 'IP'):
+            convert = _to_rounded
+        else:
+            # Team is typed as school_id, Pos as Pos
+            dtype = _COLUMN_TYPES.get(name, _COLUMN_TYPES.get(column))
+            if dtype is None:
+                convert = _untyped
+            elif dtype == 'string':
+                convert = _to_string
+            else:
+                convert = _to_type(dtype)
+        schema.append((position, name, convert))
+    season_from = 'Year' if 'Year' in seen else \
+        'date' if 'date' in seen else None
+    return tuple(schema), season_from
 
 
 def _transform_stats(df):
     """
-    A helper function to transform raw data obtained with get_career_stats
+    A helper function to transform raw data obtained with get_career_stats.
+    Every column is converted once, null cells, thousands separators and
+    dtype together, by a schema compiled per set of columns.
+
     Args:
         df: DataFrame output from get_career_stats function
     Returns:
         DataFrame
     """
-    df = _eliminate_dashes(df)
-    cols = df.columns
-    if 'Player' in cols:
-        df.rename(columns={'Player': 'name'}, inplace=True)
-        cols = df.columns
-    if 'name' in cols:
-        df.loc[:, 'name'] = df.loc[:, 'name'].apply(_format_names)
-        df.loc[:, 'name'] = df.loc[:, 'name'].astype('string')
-    if 'Team' in cols:
-        df = df.rename(columns={'Team': 'school_id'}, inplace=False)
-        cols = df.columns
-    # need to do this after name formatting, which relies on commas
-    df = df.replace(',', '', regex=True)
-    df = df.fillna(value=0.00, inplace=False)
-    # we're going to calculate OBP/BA/SLG ourselves
-    # G and RBI2out are unreliable
-    drops = ['OBPct', 'BA', 'SlgPct', 'RBI2out', 'G']
-    for i in drops:
-        if i in cols:
-            df = df.drop(columns=[i], inplace=False)
-    data_types = {
-        'int8': ['division', 'innings_played'],
-        'int32': ['opponent_id', 'season_id', 'school_id', 'game_id'],
-        'int16': ['runs_scored', 'runs_allowed', 'run_difference',
-                  'season', 'GP', 'GS', 'BB', 'Jersey', 'DP', 'H', 'DP' 'R',
-                  'ER', 'SO', 'TB', '2B', '3B', 'HR', 'RBI', 'R', 'AB', 'HBP',
-                  'SF', 'K', 'SH', 'Picked', 'SB', 'IBB', 'CS', 'OPP DP',
-                  'SHO', 'BF', 'P-OAB', '3B-A', '2B-A', 'Bk', 'HR-A', 'WP',
-                  'IBB', 'Inh Run', 'Inh Run Score', 'SHA', 'SFA', 'GO',
-                  'FO', 'W', 'L', 'HB', 'SV', 'KL', 'pickoffs', 'OrdAppeared',
-                  'App', 'GDP', 'PO', 'A', 'TC', 'E', 'CI', 'PB',
-                  'SBA', 'CSB', 'IDP', 'TP'],
-        'bool': ['extras'],
-        'float': ['ERA', 'IP'],
-        'string': ['Yr', 'Pos', 'date', 'Year', 'school', 'opponent_name', 'school_name']
-    }
-    for i in data_types.keys():
-        for j in data_types[i]:
-            if j in cols:
-                df[j] = df[j].astype(i)
-    # keeping as 64 byte to leave space for new potential player uuids
-    if 'stats_player_seq' in cols:
-        df.loc[:, 'stats_player_seq'] = df.stats_player_seq.astype('string')
-        df.loc[:, 'stats_player_seq'] = df.stats_player_seq.str.replace(
-            r'\D+', '')
-        df.loc[:, 'stats_player_seq'] = df.stats_player_seq.astype('int64')
-    if 'date' in cols:
-        df.loc[:, 'date'] = df.loc[:, 'date'].astype('string')
-        df.loc[:, 'season'] = df.loc[:, 'date'].str[-4:]
-        df.loc[:, 'season'] = df.loc[:, 'season'].astype('int32')
-    if 'Year' in cols:
-        df.loc[:, 'Year'] = df.loc[:, 'Year'].astype('string')
-        df.loc[:, 'season'] = df.loc[:, 'Year'].str[:4]
-        df.loc[:, 'season'] = df.loc[:, 'season'].astype('int32')
-        df.drop(columns=['Year'], inplace=True)
-    if 'Pos' in cols:
-        df = df.rename(columns={'Pos': 'pos'}, inplace=False)
-        cols = df.columns
-    if 'Pitches' in cols:
-        df = df.rename(columns={'Pitches': 'pitches'}, inplace=False)
-        df.loc[:, 'pitches'] = df.loc[:, 'pitches'].astype('string')
-        df.loc[:, 'pitches'] = df.loc[:, 'pitches'].astype('float')
-        df.loc[:, 'pitches'] = df.loc[:, 'pitches'].astype('int32')
-    if 'ERA' in cols:
-        df.loc[:, 'ERA'] = df.loc[:, 'ERA'].round(4)
-    if 'IP' in cols:
-        df.loc[:, 'IP'] = df.loc[:, 'IP'].round(4)
-    # drops duplicated columns (stats.ncaa.org sometimes has this issue)
-    df = df.loc[:, ~df.columns.duplicated()]
-    return df
-
-
-def _has_no_id(tag):
-    return tag.name == 'tr' and not tag.has_attr('id')
+    schema, season_from = _compile_schema(tuple(df.columns))
+    data = {}
+    for position, name, convert in schema:
+        data[name] = convert(df.iloc[:, position])
+    if season_from == 'date':
+        data['season'] = data['date'].str[-4:].astype('int32')
+    elif season_from == 'Year':
+        data['season'] = data.pop('Year').str[:4].astype('int32')
+    return pd.DataFrame(data, index=df.index)
+
+
+def _parse_html(text):
+    """
+    A helper function to parse a page with lxml, falling back to bytes for
+    pages that carry an XML encoding declaration
+    """
+    try:
+        return html.fromstring(text)
+    except ValueError:
+        return html.fromstring(text.encode('utf-8'))
+
+
+def _node_string(el):
+    """
+    A helper function that mirrors BeautifulSoup's Tag.string for an lxml
+    element: the text of an element whose only content is a single string,
+    following single-child chains, otherwise None
+    """
+    while True:
+        children = len(el)
+        if children == 0:
+            return el.text
+        if children == 1 and not el.text and not el[0].tail:
+            el = el[0]
+            continue
+        return None
+
+
+def _extract_stat_grid(page, section='tbody', table=-1):
+    """
+    A helper function to pull the header and the body or foot cells of the
+    stat_grid table on a team stats page with lxml and compiled XPath
+
+    Args:
+        page (str or lxml element): the page's html, or the page already
+         parsed with _parse_html
+        section (str): 'tbody' for player rows or 'tfoot' for team totals
+        table (int): which stat_grid table to read if there are several
+
+    Returns:
+        tuple of (headers, rows) with each row a list of cell values, or
+        None if the page has no stat_grid table. In tbody rows, a cell with
+        a player link contributes the stats_player_seq from its href
+        followed by its text
+    """
+    if isinstance(page, str):
+        page = _parse_html(page)
+    tables = _STAT_GRID(page)
+    if len(tables) < 1:
+        return None
+    grid = tables[table]
+    header_row = _HEADER_ROW(grid)
+    headers = []
+    if header_row:
+        headers = [x.strip() for x in header_row[0].itertext() if x.strip()]
+    with_links = section == 'tbody'
+    rows = []
+    for tr in _SECTION_ROWS[section](grid):
+        row = []
+        for td in _CELLS(tr):
+            order = td.get('data-order')
+            if order is not None:
+                row.append(order)
+                continue
+            if with_links:
+                anchor = _FIRST_ANCHOR(td)
+                if anchor:
+                    href = anchor[0].get('href')
+                    if href is not None:
+                        row.append(int(href.split('&')[-1].split('=')[-1]))
+                    else:
+                        row.append('-')
+            row.append(_node_string(td))
+        rows.append(row)
+    return headers, rows
+
+
+def _extract_roster(page):
+    """
+    A helper function to read the roster table of a team's roster page into
+    typed columns, placing cells by the table's header row (or, for tables
+    without one, by the number of cells per row). Players without a link
+    to their stats page have no stats_player_seq and are left out.
+
+    Args:
+        page (str or lxml element): the page's html, or the page already
+         parsed with _parse_html
+
+    Returns:
+        dict of roster column to values, ordered as _ROSTER_COLUMNS, or
+        None if the page has no roster table
+    """
+    if isinstance(page, str):
+        page = _parse_html(page)
+    rows = layout = None
+    for table in _TABLES(page):
+        names = [_ROSTER_HEADERS.get(name.lower())
+                 for name in _header_names(table)]
+        if 'name' in names:
+            rows, layout = _ROWS(table), names
+            break
+    if layout is None:
+        rows = [tr for tr in _ROWS(page)
+                if len(_CELLS(tr)) in _ROSTER_LAYOUTS]
+        if len(rows) == 0:
+            return None
+        layout = _ROSTER_LAYOUTS[len(_CELLS(rows[0]))]
+    positions = {column: i for i, column in enumerate(layout)
+                 if column is not None}
+    name_at = positions['name']
+    columns = [i for i in _ROSTER_COLUMNS
+               if i in positions or i == 'stats_player_seq']
+    data = {i: array('h') if _ROSTER_COLUMNS[i] == 'int16' else
+            array('q') if _ROSTER_COLUMNS[i] == 'int64' else []
+            for i in columns}
+    for tr in rows:
+        cells = _CELLS(tr)
+        if len(cells) <= name_at:
+            continue
+        anchor = _FIRST_ANCHOR(cells[name_at])
+        match = _PLAYER_SEQ_LINK.search(anchor[0].get('href', '')) \
+            if len(anchor) > 0 else None
+        if match is None:
+            continue
+        for column, values in data.items():
+            if column == 'stats_player_seq':
+                values.append(int(match.group(1)))
+                continue
+            i = positions[column]
+            text = (anchor[0] if i == name_at else cells[i]).text_content(
+                ).strip() if i < len(cells) else None
+            if _ROSTER_COLUMNS[column] == 'int16':
+                values.append(int(text) if text and text.isdigit() else 0)
+            else:
+                values.append(text)
+    return {column: np.asarray(values) if isinstance(values, array) else
+            pd.array(values, dtype=_ROSTER_COLUMNS[column])
+            for column, values in data.items()}
 
 
 #    n.b. due to inconsistencies in NCAA formatting and bad code
-#    (e.g. ghost columns), we are hard-coding these so things don't
-#    get too messy
+#    (e.g. ghost columns), these hard-coded columns are kept as a fallback
+#    for pages whose header row doesn't line up with their cells, see
+#    _gamelog_stat_columns
 team_gamelog_headers = {
     'batting': {
         2022: ['G', 'R', 'AB', 'H', '2B', '3B', 'TB', 'HR',
@@ -142,7 +408,7 @@ team_gamelog_headers = {
                'school_id'],
         2021: ['G', 'R', 'AB', 'H', '2B', '3B',
                'TB', 'HR', 'RBI', 'BB', 'HBP', 'SF', 'SH', 'K', 'OPP DP',
-               'CS', 'Picked', 'SB', 'IBB', 'RBI2out', 'date', 'field'
+               'CS', 'Picked', 'SB', 'IBB', 'RBI2out', 'date', 'field',
                'season_id', 'opponent_id', 'opponent_name',
                'innings_played', 'extras', 'runs_scored', 'runs_allowed',
                'run_difference', 'result', 'game_id',
@@ -297,7 +563,7 @@ team_gamelog_headers = {
                'HR-A', 'WP', 'HB', 'IBB', 'Inh Run', 'Inh Run Score',
                'SHA', 'SFA', 'Pitches', 'GO', 'FO', 'W', 'L', 'SV',
                'OrdAppeared', 'KL', 'date', 'field', 'season_id',
-               'opponent_id', 'opponent_name', 'innings_played'
+               'opponent_id', 'opponent_name', 'innings_played',
                'extras', 'runs_scored', 'runs_allowed',
                'run_difference', 'result', 'game_id',
                'school_id'],
@@ -378,7 +644,7 @@ player_gamelog_headers = {
                'school_id', 'stats_player_seq'],
         2021: ['G', 'R', 'AB', 'H', '2B', '3B',
                'TB', 'HR', 'RBI', 'BB', 'HBP', 'SF', 'SH', 'K', 'OPP DP',
-               'CS', 'Picked', 'SB', 'IBB', 'RBI2out', 'date', 'field'
+               'CS', 'Picked', 'SB', 'IBB', 'RBI2out', 'date', 'field',
                'season_id', 'opponent_id', 'opponent_name',
                'innings_played', 'extras', 'runs_scored', 'runs_allowed',
                'run_difference', 'result', 'game_id',
@@ -533,7 +799,7 @@ player_gamelog_headers = {
                'HR-A', 'WP', 'HB', 'IBB', 'Inh Run', 'Inh Run Score',
                'SHA', 'SFA', 'Pitches', 'GO', 'FO', 'W', 'L', 'SV',
                'OrdAppeared', 'KL', 'date', 'field', 'season_id',
-               'opponent_id', 'opponent_name', 'innings_played'
+               'opponent_id', 'opponent_name', 'innings_played',
                'extras', 'runs_scored', 'runs_allowed',
                'run_difference', 'result', 'game_id',
                'school_id', 'stats_player_seq'],
@@ -601,6 +867,263 @@ player_gamelog_headers = {
                'game_id', 'school_id', 'stats_player_seq']
     }
 }
+
+# columns the game_by_game parsers add after a row's stat cells
+_GAMELOG_GAME_COLUMNS = ['date', 'field', 'season_id', 'opponent_id',
+                         'opponent_name', 'innings_played', 'extras',
+                         'runs_scored', 'runs_allowed', 'run_difference',
+                         'result', 'game_id', 'school_id']
+# the date, opponent and result cells before a row's stat cells
+_GAMELOG_LEADING_CELLS = 3
+# (variant, season) -> stat columns, see _gamelog_stat_columns
+_gamelog_schemas = {}
+
+
+def _gamelog_stat_columns(variant, season, header_names, width):
+    """
+    A helper function to work out the stat columns of a game_by_game page.
+    They're read from the page's header row the first time a variant and
+    season is seen, and cached. Falls back to team_gamelog_headers when the
+    header row doesn't line up with the page's stat cells.
+
+    Args:
+        variant (str): 'batting', 'pitching', or 'fielding'
+        season (int, YYYY)
+        header_names (list of str): the page's header cells, in order
+        width (int or None): the number of stat cells in most of the
+         page's game rows, None if it has no game rows
+
+    Returns:
+        list of str
+    """
+    key = (variant, season)
+    columns = _gamelog_schemas.get(key)
+    if columns is not None and (width is None or len(columns) == width):
+        return columns
+    fixed = team_gamelog_headers.get(variant, {}).get(season)
+    if fixed is not None:
+        fixed = fixed[:-len(_GAMELOG_GAME_COLUMNS)]
+    inferred = header_names[_GAMELOG_LEADING_CELLS:]
+    if not width:
+        return fixed if fixed is not None else inferred
+    if len(inferred) == width and len(set(inferred)) == width:
+        columns = inferred
+    elif fixed is not None and len(fixed) == width:
+        columns = fixed
+    else:
+        print('the ' + str(season) + ' ' + variant + ' game_by_game header '
+              'does not match its ' + str(width) + ' stat columns')
+        return fixed if fixed is not None else inferred
+    _gamelog_schemas[key] = columns
+    return columns
+
+
+def _gamelog_frame(stats, widths, game_columns, header_names, variant,
+                   season):
+    """
+    A helper function to build the raw DataFrame of a game_by_game page
+    from its column buffers. No row is dropped for its length: rows short
+    of stat cells are padded with None, and extra cells are reported and
+    left out.
+
+    Args:
+        stats (list of str): every game row's stat cells, one after another
+        widths (array): the number of stat cells in each game row
+        game_columns (dict): _GAMELOG_GAME_COLUMNS (and stats_player_seq)
+         to their buffers, or to a value shared by every row
+        header_names (list of str): the page's header cells, in order
+        variant (str): 'batting', 'pitching', or 'fielding'
+        season (int, YYYY)
+
+    Returns:
+        pd.DataFrame
+    """
+    counts = Counter(widths)
+    width = counts.most_common(1)[0][0] if len(counts) > 0 else None
+    columns = _gamelog_stat_columns(variant, season, header_names, width)
+    names = columns + list(game_columns)
+    if len(widths) == 0:
+        return pd.DataFrame([], columns=names)
+    n = len(columns)
+    if len(counts) > 1 or width != n:
+        fitted = []
+        start = 0
+        longer = 0
+        for w in widths:
+            row = stats[start:start + w]
+            start += w
+            if w > n:
+                longer += 1
+                row = row[:n]
+            fitted.extend(row)
+            fitted.extend([None] * (n - len(row)))
+        if longer > 0:
+            print(str(longer) + ' game_by_game rows had more stat cells than '
+                  'columns, the extra cells were left out')
+        stats = fitted
+    # positional keys, stat columns can repeat a name
+    data = {i: stats[i::n] for i in range(n)}
+    for i, values in enumerate(game_columns.values()):
+        data[n + i] = values
+    res = pd.DataFrame(data)
+    res.columns = names
+    return res
+
+
+def _header_names(table):
+    """
+    A helper function to read the first header row of a table
+
+    Returns:
+        list of str, empty if the table has no th cells
+    """
+    for tr in _ROWS(table):
+        cells = _HEADER_CELLS(tr)
+        if len(cells) > 0:
+            return [th.text_content().strip() for th in cells]
+    return []
+
+
+def _decode_game_results(scores, opponents):
+    """
+    A helper function to decode the result and opponent cells of
+    game_by_game rows, one vectorized pass over each. Also used to re-parse
+    archived pages in bulk.
+
+    Args:
+        scores (pd.Series of str): e.g. 'W 5 - 3 (10)', '-' for a
+         cancelled game
+        opponents (pd.Series of str): e.g. '@ Florida St.' (away),
+         'Florida St. @ Omaha, NE' (neutral) or 'Florida St.' (home)
+
+    Returns:
+        pd.DataFrame on scores' index with runs_scored, runs_allowed,
+        run_difference (int16), result ('win', 'loss', 'tie' or
+        'cancelled'), innings_played (int8), extras (bool), field ('away',
+        'neutral', 'home', or NaN without an opponent) and opponent_name
+
+    Raises:
+        ValueError: if a score can't be read
+    """
+    cancelled = (scores == '-').to_numpy()
+    parts = scores.str.extract(_SCORE_PATTERN)
+    unread = parts[0].isna().to_numpy() & ~cancelled
+    if unread.any():
+        raise ValueError('could not read the score ' +
+                         repr(scores[unread].iloc[0]))
+    scored = parts[0].fillna(0).to_numpy().astype('int16')
+    allowed = parts[1].fillna(0).to_numpy().astype('int16')
+    innings = parts[2].fillna(9).to_numpy().astype('int8')
+    innings[cancelled] = 0
+    difference = scored - allowed
+    result = np.select([cancelled, difference > 0, difference < 0],
+                       ['cancelled', 'win', 'loss'], 'tie').astype(object)
+    sides = opponents.str.extract(_OPPONENT_PATTERN)
+    field = np.select([sides['away'].notna().to_numpy(),
+                       sides['neutral'].notna().to_numpy()],
+                      ['away', 'neutral'], 'home').astype(object)
+    field[sides.isna().all(axis=1).to_numpy()] = np.nan
+    name = sides['away'].fillna(sides['neutral']).fillna(sides['home'])
+    return pd.DataFrame({'runs_scored': scored, 'runs_allowed': allowed,
+                         'run_difference': difference, 'result': result,
+                         'innings_played': innings, 'extras': innings > 9,
+                         'field': field,
+                         'opponent_name': name.to_numpy()},
+                        index=scores.index)
+
+
+def _parse_game_by_game(text, variant, season, season_id, school_id,
+                        player_id=None):
+    """
+    A helper function to parse the game-by-game table of a team's or a
+    player's game_by_game page. Each row is walked once, its links told
+    apart with compiled patterns, and its cells written straight to column
+    buffers.
+
+    Args:
+        text (str): the page's html
+        variant (str): 'batting', 'pitching', or 'fielding'
+        season (int, YYYY)
+        season_id (int): the NCAA season_id
+        school_id (int): the NCAA school_id
+        player_id (int, optional): the NCAA stats_player_seq, for a
+         player's page
+
+    Returns:
+        pd.DataFrame of raw cells: the page's stat columns, then
+        _GAMELOG_GAME_COLUMNS (and stats_player_seq for a player)
+    """
+    table = _TABLES(_parse_html(text))[3]
+    stats = []
+    widths = array('H')
+    dates, opponent_ids, opponents, scores, game_ids = [], [], [], [], []
+    prev_game_id = 0
+    for tr in _ROWS_WITHOUT_ID(table)[3:]:
+        width = 0
+        date = opponent = opponent_id = score = game_id = None
+        for cell in tr:
+            if not isinstance(cell.tag, str):
+                # comments
+                continue
+            links = _ANCHORS(cell)
+            if len(links) > 0:
+                href = links[-1].get('href')
+                if _BOX_SCORE_LINK.search(href):
+                    score = _node_string(links[0]).strip()
+                    game_id = links[0].get('href').split('/')[-2]
+                elif _TEAM_LINK.search(href):
+                    opponent_id = href.split('/')[2]
+                    opponent = links[-1].text_content().strip()
+                elif _GAME_LINK.search(href):
+                    game_id = href.split('/')[-1].split('?')[0]
+                    score = _node_string(links[0]).strip()
+                else:
+                    opponent = cell.text_content().strip()
+                    opponent_id = '-'
+                continue
+            order = cell.get('data-order')
+            if order is not None:
+                stats.append(order)
+                width += 1
+                continue
+            string = _node_string(cell)
+            if string is not None and '/' in string:
+                date = string
+            elif cell.text_content().strip() == '-':
+                score = '-'
+                game_id = '-'
+            else:
+                opponent = cell.text_content().strip()
+                opponent_id = '-'
+        if date is None or score is None:
+            # totals and other rows that aren't a game
+            del stats[len(stats) - width:]
+            continue
+        if (game_id == prev_game_id) and (score != '-'):
+            # the same game again, cancelled games are all kept
+            del stats[len(stats) - width:]
+            continue
+        prev_game_id = game_id
+        widths.append(width)
+        dates.append(date)
+        opponent_ids.append(opponent_id)
+        opponents.append(opponent)
+        scores.append(score)
+        game_ids.append(game_id)
+    games = _decode_game_results(pd.Series(scores, dtype=object),
+                                 pd.Series(opponents, dtype=object))
+    game_columns = {'date': dates, 'field': games['field'].to_numpy(),
+                    'season_id': season_id, 'opponent_id': opponent_ids}
+    for column in _GAMELOG_GAME_COLUMNS[4:-2]:
+        game_columns[column] = games[column].to_numpy()
+    game_columns['game_id'] = game_ids
+    game_columns['school_id'] = school_id
+    if player_id is not None:
+        game_columns['stats_player_seq'] = int(player_id)
+    return _gamelog_frame(stats, widths, game_columns, _header_names(table),
+                          variant, season)
+
+
 # try reading these automatically?
 # html changes year to year make it difficult to automatically read tables
 # and NCAA likes to mess with the columns in different years
@@ -809,48 +1332,3 @@ available_stat_ids = {
         }
     }
 }
-
-
-def _parse_score(score):
-    if score == '-':
-        return 0, 0, 0, 'cancelled', 0, False
-    score = score.replace('W', '')
-    score = score.replace('L', '')
-    score = score.replace('T', '')
-    if '(' in score:
-        ip = score.split(
-            '(')[-1].split(')')[0].strip()
-        if int(ip) > 9:
-            extras = 'True'
-        else:
-            extras = 'False'
-        score = score.split('(')[0].strip()
-    else:
-        ip = '9'
-        extras = 'False'
-    scores = score.split('-')
-    scored = int(scores[0].strip())
-    allowed = int(scores[-1].strip())
-    difference = scored - allowed
-    if difference > 0:
-        result = 'win'
-    elif difference < 0:
-        result = 'loss'
-    else:
-        result = 'tie'
-    return scored, allowed, difference, result, ip, extras
-
-
-def _parse_opponent_info(opponent_info):
-    if opponent_info[0] == '@':
-        field = 'away'
-        opponent_name = opponent_info.split(
-            '@')[-1].strip()
-    elif '@' in opponent_info:
-        field = 'neutral'
-        opponent_name = opponent_info.split(
-            '@')[0].strip()
-    else:
-        field = 'home'
-        opponent_name = opponent_info
-    return opponent_name, field
@@ -0,0 +1,271 @@
+"""
+replay.py
+
+a local stand-in for stats.ncaa.org and boydsworld.com, for testing and
+benchmarking the scrapers without the network
+
+Fixtures are html_archive directories: record() captures every page the
+scrapers fetch, and ReplayServer serves them back over HTTP with a
+configurable latency and error profile. benchmark() runs a scraper
+against a ReplayServer under several concurrency and caching modes.
+"""
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import monotonic, process_time, sleep
+from urllib.parse import parse_qsl, urlsplit
+from urllib.request import urlopen
+import pandas as pd
+from collegebaseball import html_archive, http_utils
+
+
+_HOSTS = ('stats.ncaa.org', 'www.boydsworld.com')
+_STATS_PATH = '/__replay__/stats'
+
+
+@contextmanager
+def record(path):
+    """
+    Records every page fetched inside the with block as a fixture
+
+    Args:
+        path (str): fixture directory, an html_archive
+
+    Example:
+        with replay.record('fixtures/d1_2022'):
+            ncaa_team_stats(736, 2022, 'batting')
+    """
+    http_utils.enable_archive(path)
+    try:
+        yield path
+    finally:
+        http_utils.disable_archive()
+
+
+def _load_pages(path):
+    """
+    A helper function to index a fixture's pages by host, path and params
+    """
+    pages = {}
+    for entry in html_archive.entries(path):
+        parts = urlsplit(entry.url)
+        params = json.dumps(entry.params, sort_keys=True)
+        pages[(parts.hostname, parts.path, params)] = entry
+    return pages
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    # keep-alive, so connection pooling behaves as it does live
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        if parts.path == _STATS_PATH:
+            with server.lock:
+                body = json.dumps(server.stats).encode('utf-8')
+            return self._send(200, body, 'application/json')
+        host, _, path = parts.path.lstrip('/').partition('/')
+        params = json.dumps(dict(parse_qsl(parts.query,
+                                           keep_blank_values=True)),
+                            sort_keys=True)
+        with server.lock:
+            server.stats['requests'] += 1
+            delay = max(server.latency + server.rng.uniform(
+                -server.jitter, server.jitter), 0)
+            fail = server.rng.random() < server.error_rate
+        sleep(delay)
+        if fail:
+            with server.lock:
+                server.stats['errors'] += 1
+            return self._send(server.error_status, b'', 'text/html')
+        entry = server.pages.get((host, '/' + path, params))
+        if entry is None:
+            with server.lock:
+                server.stats['misses'] += 1
+            return self._send(404, b'', 'text/html')
+        body = html_archive.read_body(entry, server.path)
+        with server.lock:
+            server.stats['bytes'] += len(body)
+        self._send(200, body, 'text/html; charset=' +
+                   (entry.encoding or 'utf-8'))
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve(path, host, port, latency_ms, jitter_ms, error_rate,
+           error_status, seed, conn):
+    """
+    A helper function run in the server process
+    """
+    server = ThreadingHTTPServer((host, port), _ReplayHandler)
+    server.daemon_threads = True
+    server.path = path
+    server.pages = _load_pages(path)
+    server.latency = latency_ms / 1000
+    server.jitter = jitter_ms / 1000
+    server.error_rate = error_rate
+    server.error_status = error_status
+    server.rng = random.Random(seed)
+    server.lock = threading.Lock()
+    server.stats = {'pages': len(server.pages), 'requests': 0, 'errors': 0,
+                    'misses': 0, 'bytes': 0}
+    conn.send(server.server_address[1])
+    conn.close()
+    server.serve_forever()
+
+
+class ReplayServer:
+    """
+    Serves a fixture's recorded pages over HTTP from its own process, so
+    the server's work doesn't show up in the scraper's timings. Requests
+    are answered by URL path and params, after latency_ms (+/- jitter_ms)
+    and failing with error_status at error_rate. Pages that weren't
+    recorded get a 404.
+
+    Used as a context manager it also points http_utils at itself for
+    stats.ncaa.org and www.boydsworld.com.
+
+    Example:
+        with replay.ReplayServer('fixtures/d1_2022', latency_ms=80):
+            ncaa_team_stats(736, 2022, 'batting')
+    """
+
+    def __init__(self, path, host='127.0.0.1', port=0, latency_ms=0,
+                 jitter_ms=0, error_rate=0.0, error_status=503, seed=None):
+        self.path = path
+        self.host = host
+        self.port = port
+        self.profile = (latency_ms, jitter_ms, error_rate, error_status,
+                        seed)
+        self._process = None
+
+    @property
+    def url(self):
+        return 'http://'+self.host+':'+str(self.port)
+
+    def start(self):
+        parent, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_serve, args=(self.path, self.host, self.port,
+                                 *self.profile, child), daemon=True)
+        self._process.start()
+        self.port = parent.recv()
+        return self
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+        self._process = None
+
+    def install(self, hosts=_HOSTS):
+        for host in hosts:
+            http_utils.set_host_override(host, self.url)
+
+    def uninstall(self, hosts=_HOSTS):
+        for host in hosts:
+            http_utils.set_host_override(host, None)
+
+    def get_stats(self):
+        """
+        Returns:
+            dict of pages loaded, requests, injected errors, misses and
+            bytes served
+        """
+        with urlopen(self.url + _STATS_PATH) as r:
+            return json.loads(r.read())
+
+    def __enter__(self):
+        self.start()
+        self.install()
+        return self
+
+    def __exit__(self, *exc):
+        self.uninstall()
+        self.stop()
+
+
+def _max_rss_mb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 ** 2 if rss > 1024 ** 3 else rss / 1024
+
+
+def benchmark(path, func, units, max_workers=(1, 4, 8), cache=(False, True),
+              latency_ms=50, jitter_ms=10, error_rate=0.0,
+              requests_per_second=None, host='stats.ncaa.org'):
+    """
+    Runs func(*unit) for every unit against a ReplayServer of a fixture,
+    once per concurrency and caching mode, and measures end-to-end
+    throughput. With caching on, a first pass fills a fresh response cache
+    and the second pass is measured.
+
+    Args:
+        path (str): fixture directory, see record
+        func (callable): a scraper, e.g. ncaa_scraper.ncaa_team_stats
+        units (list of tuples): positional arguments for each call
+        max_workers (tuple of ints): concurrency levels to run
+        cache (tuple of bools): caching modes to run
+        latency_ms, jitter_ms, error_rate: the server's profile
+        requests_per_second (float, optional): client rate limit, None for
+         no limit
+        host (str): the host func's requests go to
+
+    Returns:
+        pd.DataFrame with a row per mode: max_workers, cache, pages,
+        errors, requests sent, seconds, pages_per_second, cpu ms per page
+        (fetch and parse work in this process) and max_rss_mb (peak
+        resident memory so far)
+    """
+    # local import, download_utils imports the scrapers
+    from collegebaseball import download_utils
+    rows = []
+    with ReplayServer(path, latency_ms=latency_ms, jitter_ms=jitter_ms,
+                      error_rate=error_rate):
+        for workers in max_workers:
+            for cached in cache:
+                cache_dir = None
+                if cached:
+                    cache_dir = tempfile.mkdtemp()
+                    http_utils.enable_cache(cache_dir)
+                    download_utils._map_concurrently(
+                        func, units, workers, requests_per_second, host,
+                        progress=False)
+                try:
+                    sent = http_utils.get_connection_stats()['requests']
+                    start, cpu_start = monotonic(), process_time()
+                    results = download_utils._map_concurrently(
+                        func, units, workers, requests_per_second, host,
+                        progress=False)
+                    seconds = monotonic() - start
+                    cpu = process_time() - cpu_start
+                    sent = http_utils.get_connection_stats()['requests'] - sent
+                finally:
+                    if cached:
+                        http_utils.disable_cache()
+                        shutil.rmtree(cache_dir, ignore_errors=True)
+                errors = sum(1 for unit, res, e in results if e is not None)
+                pages = len(results) - errors
+                rows.append({'max_workers': workers, 'cache': cached,
+                             'pages': pages, 'errors': errors,
+                             'requests': sent, 'seconds': seconds,
+                             'pages_per_second': pages / max(seconds, 1e-9),
+                             'cpu_ms_per_page': 1000 * cpu / max(pages, 1),
+                             'max_rss_mb': _max_rss_mb()})
+    return pd.DataFrame(rows)
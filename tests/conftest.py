@@ -0,0 +1,63 @@
+"""
+conftest.py
+
+shared fixtures: quick retry policies, replay fixtures built from
+in-memory pages and synthetic stats.ncaa.org pages
+"""
+import pytest
+from collegebaseball import html_archive, http_utils
+
+
+@pytest.fixture
+def fast_retries():
+    """
+    Retries without backoff waits, restoring the policy and every host's
+    throttling state afterwards
+    """
+    policy = (http_utils._MAX_RETRIES, http_utils._BACKOFF_BASE,
+              http_utils._BACKOFF_MAX, http_utils._CIRCUIT_THRESHOLD,
+              http_utils._CIRCUIT_COOLDOWN)
+    http_utils.set_retry_policy(backoff_base=0.001, backoff_max=0.001)
+    http_utils._guards.clear()
+    yield http_utils
+    http_utils.set_retry_policy(*policy)
+    http_utils._guards.clear()
+
+
+@pytest.fixture
+def make_fixture(tmp_path):
+    """
+    Returns a function writing a list of (url, params, html) pages into an
+    html_archive fixture directory for replay.ReplayServer, and returning
+    its path
+    """
+    def make(pages, name='fixture'):
+        path = str(tmp_path / name)
+        html_archive.configure(path)
+        try:
+            for url, params, text in pages:
+                html_archive.append(url, params, text.encode('utf-8'),
+                                    'utf-8')
+        finally:
+            html_archive.close()
+        return path
+    return make
+
+
+@pytest.fixture
+def roster_page():
+    """
+    Returns a function building a stats.ncaa.org roster page from
+    (jersey, stats_player_seq, name) tuples
+    """
+    def make(*players):
+        rows = ''.join(
+            '<tr><td>' + str(jersey) + '</td><td><a href="/player/index'
+            '?id=15860&amp;stats_player_seq=' + str(seq) + '">' + name +
+            '</a></td><td>P</td><td>6-1</td><td>Fr</td><td>3</td>'
+            '<td>1</td></tr>' for jersey, seq, name in players)
+        return ('<html><body><table id="stat_grid"><thead><tr>'
+                '<th>Jersey</th><th>Player</th><th>Pos</th><th>Ht</th>'
+                '<th>Yr</th><th>GP</th><th>GS</th></tr></thead><tbody>' +
+                rows + '</tbody></table></body></html>')
+    return make
@@ -0,0 +1,50 @@
+"""
+test_boydsworld_scraper.py
+
+tests for the boydsworld.com scraper against a replay.ReplayServer
+"""
+import pytest
+from collegebaseball import boydsworld_scraper, http_utils, replay
+
+_URL = 'http://www.boydsworld.com/cgi/scores.pl'
+
+
+def _params(school, season):
+    return {'team1': school, 'firstyear': str(season), 'team2': 'all',
+            'lastyear': str(season), 'format': 'HTML', 'submit': 'Fetch'}
+
+
+_PAGE = '''<html><body>
+<table><tr><td>Scores</td></tr></table>
+<table>
+<tr><td>2/17/2022</td><td>Cornell</td><td>5</td><td>Duke</td><td>3</td>
+<td>@ Durham</td></tr>
+<tr><td>2/18/2022</td><td>Duke</td><td>7</td><td>Cornell</td><td>2</td>
+<td>@ Durham</td></tr>
+</table></body></html>'''
+
+
+@pytest.fixture
+def fixture(make_fixture):
+    return make_fixture([(_URL, _params('Cornell', 2022), _PAGE)])
+
+
+def test_team_results(fast_retries, fixture):
+    with replay.ReplayServer(fixture):
+        df = boydsworld_scraper.boydsworld_team_results('Cornell', 2022)
+    assert df['runs_scored'].tolist() == [5, 2]
+    assert df['opponent'].tolist() == ['Duke', 'Duke']
+
+
+def test_no_results_is_empty(fast_retries, fixture):
+    # pages that weren't recorded get a 404, which isn't retried
+    with replay.ReplayServer(fixture):
+        df = boydsworld_scraper.boydsworld_team_results('Cornell', 2019)
+    assert len(df) == 0
+
+
+def test_throttling_is_raised_not_empty(fast_retries, fixture):
+    http_utils.set_retry_policy(max_retries=1)
+    with replay.ReplayServer(fixture, error_rate=1.0):
+        with pytest.raises(http_utils.ThrottledError):
+            boydsworld_scraper.boydsworld_team_results('Cornell', 2022)
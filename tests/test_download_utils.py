@@ -0,0 +1,279 @@
+"""
+test_download_utils.py
+
+tests for the bulk-download utilities
+"""
+import os
+import pandas as pd
+from collegebaseball import download_utils, http_utils, instrumentation, \
+    ncaa_scraper, replay
+
+
+def _frames(unit):
+    return {'batting': [pd.DataFrame({'unit': [unit[0]], 'H': [unit[1]]})]}
+
+
+def test_checkpoint_resume_keeps_committed_chunks(tmp_path):
+    path = str(tmp_path / 'checkpoint')
+    checkpoint = download_utils._Checkpoint(path)
+    checkpoint.write_chunk([(1, 10), (2, 20)],
+                           {'batting': [_frames((1, 10))['batting'][0],
+                                        _frames((2, 20))['batting'][0]]})
+    checkpoint.record_failure((3, 30), ValueError('bad page'))
+    resumed = download_utils._Checkpoint(path, resume=True)
+    assert resumed.done == {(1, 10), (2, 20)}
+    assert set(resumed.failed) == {(3, 30)}
+    assert resumed.read('batting')['unit'].tolist() == [1, 2]
+    assert len(resumed.read('pitching')) == 0
+
+
+def test_checkpoint_drops_uncommitted_and_torn_writes(tmp_path):
+    path = str(tmp_path / 'checkpoint')
+    checkpoint = download_utils._Checkpoint(path)
+    checkpoint.write_chunk([(1, 10)], _frames((1, 10)))
+    # a chunk written without its manifest line, then a line cut short
+    _frames((2, 20))['batting'][0].to_pickle(
+        os.path.join(path, '00001_batting.pkl'))
+    with open(checkpoint.manifest, 'a') as f:
+        f.write('{"chunk": 1, "units": [[2, 2')
+    resumed = download_utils._Checkpoint(path, resume=True)
+    assert resumed.done == {(1, 10)}
+    assert not os.path.exists(os.path.join(path, '00001_batting.pkl'))
+    assert resumed.read('batting')['unit'].tolist() == [1]
+
+
+def test_checkpoint_restart_only_deletes_its_own_files(tmp_path):
+    path = tmp_path / 'checkpoint'
+    path.mkdir()
+    (path / 'notes.txt').write_text('keep me')
+    (path / 'results.pkl').write_bytes(b'keep me too')
+    (path / 'nested').mkdir()
+    checkpoint = download_utils._Checkpoint(str(path))
+    checkpoint.write_chunk([(1, 10)], _frames((1, 10)))
+    # resuming tolerates the unrelated .pkl, restarting leaves it alone
+    assert download_utils._Checkpoint(str(path), resume=True).done == \
+        {(1, 10)}
+    restarted = download_utils._Checkpoint(str(path))
+    assert restarted.done == set()
+    assert sorted(os.listdir(path)) == ['nested', 'notes.txt', 'results.pkl']
+
+
+def test_game_logs_take_a_numpy_season(tmp_path, monkeypatch):
+    rosters = pd.DataFrame({'stats_player_seq': [2400001], 'season': [2022],
+                            'division': [1]})
+    monkeypatch.setattr(download_utils.guts, 'get_rosters_table',
+                        lambda: rosters)
+
+    def pipeline(fetch, parse, units, *args, **kwargs):
+        for unit in units:
+            yield unit, pd.DataFrame({'stats_player_seq': [unit[0]]}), None
+    monkeypatch.setattr(download_utils, '_pipeline', pipeline)
+    batting, _, _ = download_utils.download_player_game_logs(
+        rosters['season'].iloc[0], save=False,
+        checkpoint_dir=str(tmp_path / 'checkpoint'))
+    assert batting['stats_player_seq'].tolist() == [2400001]
+
+
+def test_throttled_units_are_retried(fast_retries):
+    throttled = set()
+
+    def double(x):
+        if x % 2 == 0 and x not in throttled:
+            throttled.add(x)
+            raise http_utils.ThrottledError('throttled')
+        return 2 * x
+
+    res = download_utils._map_concurrently(
+        double, [(i,) for i in range(6)], 2, 1000, 'example.test',
+        progress=False)
+    assert res == [((i,), 2 * i, None) for i in range(6)]
+    assert throttled == {0, 2, 4}
+
+
+def test_retry_rounds_are_bounded(fast_retries):
+    calls = []
+
+    def always_throttled(x):
+        calls.append(x)
+        raise http_utils.ThrottledError('throttled')
+
+    res = list(download_utils._imap_concurrently(
+        always_throttled, [(1,), (2,)], 2, 1000, 'example.test',
+        progress=False, retry_rounds=2))
+    assert sorted(unit for unit, _, _ in res) == [(1,), (2,)]
+    assert all(isinstance(error, http_utils.ThrottledError)
+               for _, _, error in res)
+    assert len(calls) == 6
+
+
+def test_other_errors_are_not_retried(fast_retries):
+    calls = []
+
+    def broken(x):
+        calls.append(x)
+        raise ValueError('bad page')
+
+    res = download_utils._map_concurrently(
+        broken, [(1,)], 1, 1000, 'example.test', progress=False)
+    assert isinstance(res[0][2], ValueError)
+    assert calls == [1]
+
+
+def _fetch_page(n):
+    if n == 3:
+        return None
+    if n == 4:
+        raise ValueError('no such page')
+    return '<p>' + str(n) + '</p>', (n,)
+
+
+@instrumentation.instrument_parse('other')
+def _parse_page(text, n, scale=1):
+    if n == 5:
+        raise ValueError('unreadable page')
+    return pd.DataFrame({'n': [n * scale], 'length': [len(text)]})
+
+
+def test_pipeline_parses_on_processes(capsys):
+    instrumentation.reset()
+    report = {}
+    res = {unit: (result, error) for unit, result, error in
+           download_utils._pipeline(
+               _fetch_page, _parse_page, [(i,) for i in range(7)], 2, 1000,
+               'example.test', parse_workers=2, parse_kwargs={'scale': 10},
+               progress=False, report=report)}
+    assert sorted(res) == [(i,) for i in range(7)]
+    for i in [0, 1, 2, 6]:
+        result, error = res[(i,)]
+        assert error is None
+        assert result.to_dict('list') == {'n': [10 * i], 'length': [8]}
+    assert len(res[(3,)][0]) == 0 and res[(3,)][1] is None
+    assert isinstance(res[(4,)][1], ValueError)
+    assert isinstance(res[(5,)][1], ValueError)
+    assert report['pages_fetched'] == 5
+    assert report['pages_parsed'] == 4
+    # metrics recorded in the parser processes are merged back
+    parses = [i for i in instrumentation.snapshot()['counters']
+              if i['name'] == 'parses_total']
+    assert sum(i['value'] for i in parses) == 4
+    pages = {i['labels']['stage']: i['value']
+             for i in instrumentation.snapshot()['counters']
+             if i['name'] == 'pipeline_pages_total'}
+    assert pages == {'fetch': 5, 'parse': 4}
+    assert capsys.readouterr().out == ''
+
+
+def test_pipeline_rosters_end_to_end(fast_retries, make_fixture,
+                                     roster_page):
+    fixture = make_fixture([
+        ('https://stats.ncaa.org/team/167/roster/15860', None,
+         roster_page((7, 2400001, 'Doe, Jane'), (8, 2400002, 'Roe, Sam'))),
+        ('https://stats.ncaa.org/team/736/roster/15860', None,
+         roster_page((1, 2400003, 'Poe, Ed')))])
+    http_utils.set_retry_policy(max_retries=20)
+    with replay.ReplayServer(fixture, error_rate=0.3, seed=1):
+        res = {unit: (result, error) for unit, result, error in
+               download_utils._pipeline(
+                   ncaa_scraper._fetch_team_season_roster,
+                   ncaa_scraper._parse_team_season_roster,
+                   [(167, 2022), (736, 2022)], 2, 1000, parse_workers=2,
+                   progress=False)}
+    assert res[(167, 2022)][1] is None and res[(736, 2022)][1] is None
+    assert res[(167, 2022)][0]['name'].tolist() == ['Jane Doe', 'Sam Roe']
+    assert res[(736, 2022)][0]['stats_player_seq'].tolist() == [2400003]
+    assert res[(736, 2022)][0]['school'].tolist() == ['Vanderbilt']
+
+
+def test_downloads_keep_school_order(monkeypatch):
+    schools = pd.DataFrame({'school_id': [167, 736, 6], 'division': 1})
+    monkeypatch.setattr(download_utils.guts, 'get_schools_table',
+                        lambda: schools)
+
+    def finished_backwards(fetch, parse, units, *args, **kwargs):
+        for unit in reversed(units):
+            yield unit, pd.DataFrame({'school_id': [unit[0]]}), None
+    monkeypatch.setattr(download_utils, '_pipeline', finished_backwards)
+    res = download_utils.download_season_rosters(2022, 1, save=False)
+    assert res['school_id'].tolist() == [167, 736, 6]
+    res, failures = download_utils.download_team_results(2022, 1, save=False)
+    assert res['school_id'].tolist() == [167, 736, 6] and failures == []
+
+
+_BOYDSWORLD_URL = 'http://www.boydsworld.com/cgi/scores.pl'
+
+
+def _boydsworld_page(*games):
+    rows = ''.join('<tr>' + ''.join('<td>' + str(i) + '</td>' for i in game)
+                   + '</tr>' for game in games)
+    return ('<html><body><table><tr><td>Scores</td></tr></table><table>' +
+            rows + '</table></body></html>')
+
+
+def _boydsworld_params(team, start, end):
+    return {'team1': team, 'firstyear': str(start), 'team2': 'all',
+            'lastyear': str(end), 'format': 'HTML', 'submit': 'Fetch'}
+
+
+_OPENER = ('2/18/2022', 'Cornell', 5, 'Duke', 3, '@ Durham')
+_LATER = [('3/5/2022', 'Vanderbilt', 4, 'Cornell', 1, '@ Nashville'),
+          ('3/5/2022', 'Vanderbilt', 4, 'Cornell', 1, '@ Nashville')]
+
+
+def test_sync_boydsworld_games_is_incremental(fast_retries, make_fixture,
+                                              tmp_path):
+    path = str(tmp_path / 'games.parquet')
+    first = make_fixture([(_BOYDSWORLD_URL,
+                           _boydsworld_params('all', 2022, 2022),
+                           _boydsworld_page(_OPENER))], 'first')
+    later = make_fixture([(_BOYDSWORLD_URL,
+                           _boydsworld_params('all', 2022, 2022),
+                           _boydsworld_page(_OPENER, *_LATER))], 'later')
+    with replay.ReplayServer(first):
+        res, added = download_utils.sync_boydsworld_games(
+            path, end=2022, start=2022, requests_per_second=1000)
+        assert added == 2
+        assert sorted(res['school'].tolist()) == ['Cornell', 'Duke']
+        # syncing again adds nothing
+        assert download_utils.sync_boydsworld_games(
+            path, end=2022, requests_per_second=1000)[1] == 0
+    with replay.ReplayServer(later):
+        res, added = download_utils.sync_boydsworld_games(
+            path, end=2022, requests_per_second=1000)
+    # both games of the same-score doubleheader, from both sides
+    assert added == 4
+    stored = pd.read_parquet(path)
+    assert len(stored) == 6
+    cornell = stored.loc[stored['school'] == 'Cornell']
+    assert cornell['runs_scored'].tolist() == [5, 1, 1]
+
+
+def test_sync_by_school_keeps_throttled_schools_for_later(
+        fast_retries, make_fixture, tmp_path):
+    http_utils.set_retry_policy(max_retries=0, circuit_cooldown=0.01)
+    path = str(tmp_path / 'games.parquet')
+    fixture = make_fixture([(_BOYDSWORLD_URL,
+                             _boydsworld_params('Cornell', 2022, 2022),
+                             _boydsworld_page(_OPENER, *_LATER))])
+    with replay.ReplayServer(fixture, error_rate=1.0):
+        res, added = download_utils.sync_boydsworld_games(
+            path, end=2022, start=2022, by_school=True, max_workers=8,
+            requests_per_second=1000)
+    assert added == 0 and not os.path.exists(path)
+    # a throttled school isn't stored as having no games, so the next sync
+    # still fetches it
+    with replay.ReplayServer(fixture):
+        res, added = download_utils.sync_boydsworld_games(
+            path, end=2022, start=2022, by_school=True, max_workers=8,
+            requests_per_second=1000)
+    assert added == 3
+    assert res['opponent'].tolist() == ['Duke', 'Vanderbilt', 'Vanderbilt']
+
+
+def test_bulk_jobs_leave_host_limits_as_they_were():
+    host = 'bulk.example.test'
+    res = download_utils._map_concurrently(
+        lambda n: n, [(1,), (2,)], 2, 1000, host, progress=False)
+    assert [result for _, result, _ in res] == [1, 2]
+    assert host not in http_utils._limiters
+    assert http_utils._get_guard(host).max_concurrency == \
+        http_utils._POOL_SIZE
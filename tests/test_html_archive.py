@@ -0,0 +1,66 @@
+"""
+test_html_archive.py
+
+tests for the raw HTML archive: round trips, archiving alongside the
+response cache and rebuilding datasets with reparse
+"""
+import pytest
+from collegebaseball import download_utils, html_archive, http_utils, \
+    replay
+
+_ROSTER_URL = 'https://stats.ncaa.org/team/167/roster/15860'
+
+
+@pytest.fixture
+def archive(tmp_path):
+    path = str(tmp_path / 'archive')
+    html_archive.configure(path)
+    yield path
+    html_archive.close()
+
+
+def test_round_trip(archive):
+    html_archive.append('https://x/page?', {'b': 2, 'a': None}, b'<p>one</p>',
+                        'utf-8')
+    html_archive.append('https://x/page', {'b': '2'}, b'<p>two</p>', 'utf-8')
+    latest = html_archive.entries(archive)
+    assert len(latest) == 1
+    assert latest[0].codec == 'zstd'
+    assert latest[0].params == {'b': '2'}
+    assert html_archive.read(latest[0], archive) == '<p>two</p>'
+    every = html_archive.entries(archive, latest=False)
+    assert [html_archive.read(i, archive) for i in every] == \
+        ['<p>one</p>', '<p>two</p>']
+
+
+def test_cache_hits_are_archived(fast_retries, make_fixture, tmp_path):
+    fixture = make_fixture([(_ROSTER_URL, None, '<p>roster</p>')])
+    http_utils.enable_cache(str(tmp_path / 'cache'), current_season=2030)
+    http_utils.enable_archive(str(tmp_path / 'archive'))
+    try:
+        with replay.ReplayServer(fixture) as server:
+            for _ in range(2):
+                assert http_utils.get(_ROSTER_URL).text == '<p>roster</p>'
+            assert server.get_stats()['requests'] == 1
+    finally:
+        http_utils.disable_archive()
+        http_utils.disable_cache()
+    pages = html_archive.entries(str(tmp_path / 'archive'), latest=False)
+    assert [i.url for i in pages] == [_ROSTER_URL] * 2
+    assert html_archive.read(pages[-1], str(tmp_path / 'archive')) == \
+        '<p>roster</p>'
+
+
+def test_reparse_rebuilds_from_the_archive(fast_retries, make_fixture,
+                                           roster_page, tmp_path):
+    fixture = make_fixture([(_ROSTER_URL, None,
+                             roster_page((7, 2400001, 'Doe, Jane')))])
+    path = str(tmp_path / 'archive')
+    with replay.ReplayServer(fixture), replay.record(path):
+        fetched = download_utils.ncaa.ncaa_team_season_roster(167, 2022)
+    res, failures = download_utils.reparse(
+        'rosters', 2022, division=1, save=False, archive_path=path,
+        parse_workers=1, progress=False)
+    assert failures == []
+    assert res['stats_player_seq'].tolist() == [2400001]
+    assert res['name'].tolist() == fetched['name'].tolist() == ['Jane Doe']
@@ -0,0 +1,61 @@
+"""
+test_http_cache.py
+
+tests for the persistent response cache
+"""
+import os
+import pytest
+from collegebaseball import http_cache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    http_cache.configure(str(tmp_path), max_bytes=250, current_season=2030)
+    http_cache.reset_stats()
+    yield tmp_path
+    http_cache.close()
+    http_cache._state['dir'] = None
+
+
+def _bytes_on_disk(path):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(os.path.join(path, 'blobs'))
+               for name in names)
+
+
+def test_round_trip(cache):
+    http_cache.put('https://stats.ncaa.org/team/736/stats', {'id': 1},
+                   b'<html></html>', 'utf-8')
+    assert http_cache.get('https://stats.ncaa.org/team/736/stats',
+                          {'id': '1'}) == (b'<html></html>', 'utf-8')
+    assert http_cache.get('https://stats.ncaa.org/team/736/stats') is None
+
+
+def test_shared_bodies_count_once(cache):
+    for i in range(3):
+        http_cache.put('https://x/a', {'i': i}, b'A' * 100)
+    http_cache.put('https://x/b', None, b'B' * 100)
+    stats = http_cache.get_stats()
+    assert stats['entries'] == 4
+    assert stats['bytes'] == _bytes_on_disk(cache) == 200
+    assert stats['evictions'] == 0
+
+
+def test_eviction_frees_least_recently_used_body(cache):
+    for i in range(3):
+        http_cache.put('https://x/a', {'i': i}, b'A' * 100)
+    http_cache.put('https://x/b', None, b'B' * 100)
+    http_cache.get('https://x/a', {'i': 0})
+    http_cache.put('https://x/c', None, b'C' * 100)
+    assert http_cache.get('https://x/b') is None
+    assert http_cache.get('https://x/a', {'i': 2}) == (b'A' * 100, None)
+    assert http_cache.get_stats()['bytes'] == _bytes_on_disk(cache) == 200
+
+
+def test_shared_body_kept_while_referenced(cache):
+    http_cache.put('https://x/a', {'i': 0}, b'A' * 100)
+    http_cache.put('https://x/a', {'i': 1}, b'A' * 100)
+    # replacing one entry's body must not delete the other's
+    http_cache.put('https://x/a', {'i': 0}, b'D' * 100)
+    assert http_cache.get('https://x/a', {'i': 1}) == (b'A' * 100, None)
+    assert http_cache.get_stats()['bytes'] == _bytes_on_disk(cache) == 200
@@ -0,0 +1,98 @@
+"""
+test_http_utils.py
+
+tests for the shared HTTP client's retries, adaptive concurrency and
+circuit breaker, against a replay.ReplayServer
+"""
+import pytest
+from requests.exceptions import ChunkedEncodingError
+from collegebaseball import http_utils, replay
+
+_URL = 'https://stats.ncaa.org/team/736/stats'
+_PARAMS = {'id': '15860'}
+
+
+@pytest.fixture
+def fixture(make_fixture):
+    return make_fixture([(_URL, _PARAMS, '<html>ok</html>')])
+
+
+def test_retries_until_a_response_gets_through(fast_retries, fixture):
+    http_utils.set_retry_policy(max_retries=20)
+    with replay.ReplayServer(fixture, error_rate=0.5, seed=3) as server:
+        for _ in range(5):
+            assert http_utils.get(_URL, _PARAMS).text == '<html>ok</html>'
+        stats = server.get_stats()
+    assert stats['errors'] > 0
+    assert stats['requests'] == stats['errors'] + 5
+
+
+def test_persistent_throttling_raises(fast_retries, fixture):
+    http_utils.set_retry_policy(max_retries=2)
+    with replay.ReplayServer(fixture, error_rate=1.0,
+                             error_status=403) as server:
+        with pytest.raises(http_utils.ThrottledError):
+            http_utils.get(_URL, _PARAMS)
+        assert server.get_stats()['requests'] == 3
+    state = http_utils.get_host_state('stats.ncaa.org')
+    assert state['consecutive_failures'] == 3
+    assert state['limit'] < state['max_concurrency']
+
+
+def test_circuit_opens_and_fails_fast(fast_retries, fixture):
+    http_utils.set_retry_policy(max_retries=10, circuit_threshold=3,
+                                circuit_cooldown=60)
+    with replay.ReplayServer(fixture, error_rate=1.0) as server:
+        with pytest.raises(http_utils.CircuitOpenError):
+            http_utils.get(_URL, _PARAMS)
+        with pytest.raises(http_utils.CircuitOpenError):
+            http_utils.get(_URL, _PARAMS)
+        assert server.get_stats()['requests'] == 3
+    assert http_utils.get_host_state('stats.ncaa.org')[
+        'circuit_open_for'] > 0
+
+
+def test_missing_page_is_not_retried(fast_retries, fixture):
+    with replay.ReplayServer(fixture) as server:
+        assert http_utils.get(_URL, {'id': '1'}).status_code == 404
+        assert server.get_stats()['requests'] == 1
+
+
+class _BrokenSession:
+    """
+    A session whose responses are always cut off mid-body
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, *args, **kwargs):
+        self.calls += 1
+        raise ChunkedEncodingError('connection broken')
+
+
+def test_request_errors_count_as_failures(fast_retries):
+    http_utils.set_retry_policy(max_retries=2)
+    session = _BrokenSession()
+    with pytest.raises(http_utils.ThrottledError):
+        http_utils.get('https://example.test/page', session=session)
+    assert session.calls == 3
+    state = http_utils.get_host_state('example.test')
+    assert state['consecutive_failures'] == 3
+    assert state['active'] == 0
+
+
+def test_host_limits_are_put_back():
+    host = 'limits.example.test'
+    http_utils.set_rate_limit(host, 5)
+    before = http_utils._limiters[host]
+    http_utils.set_max_concurrency(host, 3)
+    with http_utils.host_limits(host, 1000, 8):
+        assert http_utils._limiters[host] is not before
+        assert http_utils._get_guard(host).max_concurrency == 8
+    assert http_utils._limiters[host] is before
+    assert http_utils._get_guard(host).max_concurrency == 3
+    with http_utils.host_limits('other.example.test', 1000):
+        pass
+    assert 'other.example.test' not in http_utils._limiters
+    http_utils.set_rate_limit(host, None)
@@ -0,0 +1,37 @@
+"""
+test_ncaa_utils.py
+
+tests for the stats.ncaa.org page parsers
+"""
+import pandas as pd
+from benchmarks import synthetic
+from collegebaseball import ncaa_scraper, ncaa_utils
+
+_HEADERS = ncaa_utils.team_gamelog_headers['batting'][2022][:-13]
+
+
+def _with_row(page, row):
+    return page.replace('<tr id="totals">', row + '\n<tr id="totals">')
+
+
+def test_field_is_missing_without_an_opponent():
+    games = ncaa_utils._decode_game_results(
+        pd.Series(['W 5 - 3', 'L 1 - 2', '-']),
+        pd.Series(['@ Duke', 'Duke @ Omaha, NE', None]))
+    assert games['field'].tolist()[:2] == ['away', 'neutral']
+    assert pd.isna(games['field'].iloc[2])
+
+
+def test_rows_that_are_not_games_are_dropped():
+    page = synthetic.game_by_game_page(_HEADERS, 3, seed=1)
+    cancelled = ('<tr><td>03/05/2022</td><td>Duke</td><td>-</td>' +
+                 '<td data-order="1">1</td>' * len(_HEADERS) + '</tr>')
+    totals = ('<tr><td>Totals</td><td></td><td></td>' +
+              '<td data-order="9">9</td>' * len(_HEADERS) + '</tr>')
+    page = _with_row(_with_row(page, cancelled), totals)
+    res = ncaa_scraper._parse_team_game_logs(
+        page, 2022, 15860, 736, 1, 'batting', include_advanced=False)
+    assert len(res) == 4
+    assert res['result'].tolist()[-1] == 'cancelled'
+    assert res['field'].isin(['away', 'home', 'neutral']).all()
+    assert (res['R'] != 9).all()